@@ -0,0 +1,126 @@
+"""
+Plays games on its own by trying every placement of each piece and keeping the
+one whose board scores best under a weighted sum of simple features.
+
+    python -m src.autoplay --seed 3 --pieces 500
+"""
+import argparse
+import sys
+from dataclasses import astuple, dataclass
+from typing import List, Optional, Tuple
+
+from src.engine import clear_lines, is_game_over, placements
+from src.settings import COLUMNS, ROWS
+from src.shapes import Shapes, shape_generator
+
+# Row 0 is the floor, which pieces only reach by rotating into it
+PLAYABLE_ROW = ((1 << COLUMNS) - 1) & ~(1 | 1 << (COLUMNS - 1))
+PLAYABLE = sum(PLAYABLE_ROW << (row * COLUMNS) for row in range(1, ROWS))
+COLUMN_MASKS = [
+    sum(1 << (row * COLUMNS + column) for row in range(1, ROWS))
+    for column in range(1, COLUMNS - 1)
+]
+
+
+@dataclass
+class Weights:
+    holes: float = -0.36
+    height: float = -0.51
+    bumpiness: float = -0.18
+    lines: float = 0.76
+
+    @classmethod
+    def from_list(cls, values: List[float]) -> "Weights":
+        return cls(*values)
+
+    def as_list(self) -> List[float]:
+        return list(astuple(self))
+
+
+@dataclass
+class GameResult:
+    seed: int
+    lines: int = 0
+    pieces: int = 0
+
+
+def features(board: int) -> Tuple[int, int, int]:
+    """
+    Holes, aggregate height and bumpiness of the board
+    """
+    # Every cell at or below a locked cell of its column
+    covered = board
+    shift = COLUMNS
+    while shift < COLUMNS * ROWS:
+        covered |= covered >> shift
+        shift *= 2
+    covered &= PLAYABLE
+
+    heights = [bin(covered & mask).count("1") for mask in COLUMN_MASKS]
+    holes = bin(covered & ~board).count("1")
+    bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+    return holes, sum(heights), bumpiness
+
+
+def evaluate(board: int, lines: int, weights: Weights) -> float:
+    holes, height, bumpiness = features(board)
+    return (
+        weights.holes * holes
+        + weights.height * height
+        + weights.bumpiness * bumpiness
+        + weights.lines * lines
+    )
+
+
+def best_placement(
+    shape: Shapes, board: int, weights: Weights
+) -> Optional[Tuple[int, int, List[int]]]:
+    """
+    The best placement of the shape, the board after it and the lines it cleared
+    """
+    best = None
+    best_score = float("-inf")
+    for bitboard in placements(shape, board):
+        next_board, lines_cleared = clear_lines(board | bitboard)
+        if is_game_over(next_board):
+            continue
+        score = evaluate(next_board, sum(lines_cleared), weights)
+        if score > best_score:
+            best, best_score = (bitboard, next_board, lines_cleared), score
+    return best
+
+
+def play(weights: Weights, seed: int, max_pieces: int) -> GameResult:
+    result = GameResult(seed)
+    board = 0
+    shapes = shape_generator(seed)
+    while result.pieces < max_pieces:
+        placed = best_placement(next(shapes), board, weights)
+        if placed is None:
+            break
+        _, board, lines_cleared = placed
+        result.lines += sum(lines_cleared)
+        result.pieces += 1
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pieces", type=int, default=500)
+    parser.add_argument(
+        "--weights",
+        type=float,
+        nargs=4,
+        metavar=("HOLES", "HEIGHT", "BUMPINESS", "LINES"),
+    )
+    args = parser.parse_args(argv)
+
+    weights = Weights.from_list(args.weights) if args.weights else Weights()
+    result = play(weights, args.seed, args.pieces)
+    print(f"{result.lines} lines in {result.pieces} pieces")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""
+Storage for the locked cells of a matrix and their colors.
+
+Pieces are always bitboards, and both backends follow the line clearing rules of
+`engine.clear_lines`, so they can be swapped freely:
+
+- `IntBoard` keeps every cell in one integer, which makes collisions a single
+  AND but means every lock and clear builds a new integer of the whole board
+- `RowBoard` keeps a mask per row in an array, so a full row is just
+  `row == FULL_ROW` and clearing it is a slice assignment
+
+    python -m src.perft --board rows
+"""
+from abc import ABC, abstractmethod
+from array import array
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Tuple, Type
+
+from src.engine import LINE_FILTER_HEIGHTS
+from src.settings import COLUMNS, ROWS
+
+from utils.bitboard import bit_indices
+
+# Locked pieces can stick out over the top of the board, so the spawn rows are
+# stored as well
+STORED_ROWS = ROWS + 4
+STORED_CELLS = COLUMNS * STORED_ROWS
+CELLS_MASK = (1 << (COLUMNS * ROWS)) - 1
+STORED_MASK = (1 << STORED_CELLS) - 1
+
+ROW_MASK = (1 << COLUMNS) - 1
+# The outer columns are walls, so a full row is every column between them
+FULL_ROW = ROW_MASK & ~(1 | 1 << (COLUMNS - 1))
+ROW_TYPECODE = "H" if COLUMNS <= 16 else "L" if COLUMNS <= 32 else "Q"
+
+# Pieces rest on the row above the floor row, so garbage goes in from there
+GARBAGE_ROW = 1
+# After the colors of `COLORS`, drawn with the black tile
+GARBAGE_COLOR = 8
+
+
+def garbage_rows(holes: Iterable[int]) -> int:
+    """
+    Full rows with one empty column each, the first hole in the bottom row
+    """
+    garbage = 0
+    for row, column in enumerate(holes):
+        garbage |= (FULL_ROW & ~(1 << column)) << (row * COLUMNS)
+    return garbage
+
+
+@lru_cache(maxsize=1024)
+def row_colors(mask: int, color: int) -> bytes:
+    """
+    The color plane of one row with `color` in every column of `mask`
+    """
+    return bytes(color if mask >> column & 1 else 0 for column in range(COLUMNS))
+
+
+class Board(ABC):
+    @abstractmethod
+    def bitboard(self) -> int:
+        """
+        Every locked cell as a single bitboard
+        """
+
+    @abstractmethod
+    def collides(self, piece: int) -> bool:
+        pass
+
+    @abstractmethod
+    def lock(self, piece: int, color: int):
+        pass
+
+    @abstractmethod
+    def clear_lines(self) -> List[int]:
+        pass
+
+    @abstractmethod
+    def cells(self) -> Iterator[Tuple[int, int]]:
+        """
+        Bit index and color of every locked cell inside the board
+        """
+
+    @abstractmethod
+    def push_garbage(self, garbage: int, rows: int, color: int = GARBAGE_COLOR):
+        """
+        Moves every cell from `GARBAGE_ROW` up by `rows` and fills the gap with
+        the bottom `rows` rows of `garbage`. Cells pushed out of the top are lost
+        """
+
+    @abstractmethod
+    def is_game_over(self) -> bool:
+        pass
+
+    @classmethod
+    def from_cells(cls, cells: Iterable[Tuple[int, int]]) -> "Board":
+        """
+        A board with the given bit indices locked in their colors
+        """
+        by_color: Dict[int, int] = defaultdict(int)
+        for index, color in cells:
+            by_color[color] |= 1 << index
+        board = cls()
+        for color, bitboard in by_color.items():
+            board.lock(bitboard, color)
+        return board
+
+    @abstractmethod
+    def copy(self) -> "Board":
+        pass
+
+    @abstractmethod
+    def key(self) -> Tuple:
+        """
+        Hashable occupancy, for telling boards apart regardless of colors
+        """
+
+
+class IntBoard(Board):
+    def __init__(self):
+        self.board = 0
+        # The color of each cell by bit index, 0 for empty
+        self.colors = bytearray(STORED_CELLS)
+
+    def bitboard(self) -> int:
+        return self.board
+
+    def collides(self, piece: int) -> bool:
+        return self.board & piece > 0
+
+    def lock(self, piece: int, color: int):
+        self.board |= piece
+        for index in bit_indices(piece):
+            self.colors[index] = color
+
+    def clear_lines(self) -> List[int]:
+        lines_cleared = []
+        for height in range(4, 0, -1):
+            line_filter = (1 << (COLUMNS * height)) - 1
+            full_filter = (FULL_ROW * line_filter) // ROW_MASK
+            drop = LINE_FILTER_HEIGHTS[height]
+            row = 0
+            while row + height < ROWS:
+                bottom = row * COLUMNS
+                if (self.board >> bottom) & line_filter != full_filter:
+                    row += 1
+                    continue
+                lines_cleared.append(drop)
+
+                # Cells above the filter drop by `drop` rows and the rest of the
+                # filter is emptied, in the bitboard and the colors alike
+                top = bottom + height * COLUMNS
+                shift = drop * COLUMNS
+                self.board = (self.board & ((1 << bottom) - 1)) | (
+                    self.board >> top << (top - shift)
+                )
+                colors = self.colors
+                colors[top - shift : STORED_CELLS - shift] = colors[top:]
+                colors[bottom : top - shift] = bytes(top - shift - bottom)
+                colors[STORED_CELLS - shift :] = bytes(shift)
+        return lines_cleared
+
+    def cells(self) -> Iterator[Tuple[int, int]]:
+        colors = self.colors
+        for index in bit_indices(self.board & CELLS_MASK):
+            yield index, colors[index]
+
+    def push_garbage(self, garbage: int, rows: int, color: int = GARBAGE_COLOR):
+        bottom = GARBAGE_ROW * COLUMNS
+        shift = rows * COLUMNS
+        garbage &= (1 << shift) - 1
+        self.board = (
+            (self.board & ((1 << bottom) - 1))
+            | (self.board >> bottom << (bottom + shift))
+            | (garbage << bottom)
+        ) & STORED_MASK
+
+        colors = self.colors
+        colors[bottom + shift :] = colors[bottom : STORED_CELLS - shift]
+        colors[bottom : bottom + shift] = b"".join(
+            row_colors((garbage >> (row * COLUMNS)) & ROW_MASK, color)
+            for row in range(rows)
+        )
+
+    def is_game_over(self) -> bool:
+        return self.board >> (COLUMNS * (ROWS - 1)) & ROW_MASK > 0
+
+    def copy(self) -> "IntBoard":
+        board = IntBoard()
+        board.board = self.board
+        board.colors[:] = self.colors
+        return board
+
+    def key(self) -> Tuple:
+        return (self.board,)
+
+
+class RowBoard(Board):
+    EMPTY_ROWS = array(ROW_TYPECODE, [0] * 4)
+
+    def __init__(self):
+        # Row 0 is the bottom row, with bit 0 the rightmost column
+        self.rows = array(ROW_TYPECODE, [0] * STORED_ROWS)
+        self.colors = [bytearray(COLUMNS) for _ in range(STORED_ROWS)]
+
+    def bitboard(self) -> int:
+        board = 0
+        for row in reversed(self.rows):
+            board = board << COLUMNS | row
+        return board
+
+    def collides(self, piece: int) -> bool:
+        rows = self.rows
+        row = ((piece & -piece).bit_length() - 1) // COLUMNS
+        piece >>= row * COLUMNS
+        while piece:
+            if row >= STORED_ROWS:
+                return False
+            if rows[row] & piece & ROW_MASK:
+                return True
+            piece >>= COLUMNS
+            row += 1
+        return False
+
+    def lock(self, piece: int, color: int):
+        for index in bit_indices(piece):
+            row, column = divmod(index, COLUMNS)
+            self.rows[row] |= 1 << column
+            self.colors[row][column] = color
+
+    def clear_lines(self) -> List[int]:
+        rows = self.rows
+        lines_cleared = []
+        for height in range(4, 0, -1):
+            drop = LINE_FILTER_HEIGHTS[height]
+            row = 0
+            while row + height < ROWS:
+                if any(rows[r] != FULL_ROW for r in range(row, row + height)):
+                    row += 1
+                    continue
+                lines_cleared.append(drop)
+
+                # `height` rows go, and rows that the rows above do not drop
+                # into are left empty
+                kept = height - drop
+                rows[row : row + height] = self.EMPTY_ROWS[:kept]
+                rows.extend(self.EMPTY_ROWS[:drop])
+                self.colors[row : row + height] = [
+                    bytearray(COLUMNS) for _ in range(kept)
+                ]
+                self.colors.extend(bytearray(COLUMNS) for _ in range(drop))
+        return lines_cleared
+
+    def cells(self) -> Iterator[Tuple[int, int]]:
+        for row in range(ROWS):
+            bits = self.rows[row]
+            if not bits:
+                continue
+            colors = self.colors[row]
+            for column in bit_indices(bits):
+                yield row * COLUMNS + column, colors[column]
+
+    def push_garbage(self, garbage: int, rows: int, color: int = GARBAGE_COLOR):
+        inserted = array(ROW_TYPECODE)
+        inserted_colors = []
+        for _ in range(rows):
+            row = garbage & ROW_MASK
+            inserted.append(row)
+            inserted_colors.append(bytearray(row_colors(row, color)))
+            garbage >>= COLUMNS
+
+        self.rows[GARBAGE_ROW:GARBAGE_ROW] = inserted
+        del self.rows[STORED_ROWS:]
+        self.colors[GARBAGE_ROW:GARBAGE_ROW] = inserted_colors
+        del self.colors[STORED_ROWS:]
+
+    def is_game_over(self) -> bool:
+        return self.rows[ROWS - 1] > 0
+
+    def copy(self) -> "RowBoard":
+        board = RowBoard()
+        board.rows[:] = self.rows
+        board.colors = [bytearray(colors) for colors in self.colors]
+        return board
+
+    def key(self) -> Tuple:
+        return tuple(self.rows)
+
+
+BOARDS: Dict[str, Type[Board]] = {
+    "int": IntBoard,
+    "rows": RowBoard,
+}
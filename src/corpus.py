@@ -0,0 +1,346 @@
+"""
+An append-only corpus of finished games, one fixed width record per piece
+placed, stored a column per file so it can be memory mapped and scanned
+without loading it.
+
+Each field of `PIECE` is appended to `<field>.bin` in the corpus directory, and
+each field of `GAME` to `games_<field>.bin`. `corpus.json` holds the number of
+rows that are complete, and is only rewritten after the columns are flushed,
+so a writer that dies halfway through a game leaves the corpus as it was. A
+query only maps the columns it needs and goes through them in chunks.
+
+    python -m src.corpus record games/ --games 1000 --workers 8 --mode guideline
+    python -m src.corpus stats games/
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.autoplay import Weights, best_placement
+from src.engine import full_rows, orientations
+from src.levels import MODES
+from src.settings import COLUMNS
+from src.shapes import Shapes, shape_generator
+
+from utils.bitboard import lowest_bit_index
+
+VERSION = 2
+MANIFEST = "corpus.json"
+CHUNK_ROWS = 1 << 20
+
+SHAPES = list(Shapes)
+
+PIECE = np.dtype(
+    [
+        ("game", "<u4"),
+        # Index of the piece within its game, so at most `MAX_PIECES` a game
+        ("piece", "<u2"),
+        ("shape", "u1"),
+        ("rotation", "u1"),
+        # Bit index of the lowest cell of the placement
+        ("position", "<u2"),
+        # Rows cleared by the piece
+        ("lines", "u1"),
+        ("level", "u1"),
+        # Row of the highest locked cell after lines are cleared
+        ("height", "u1"),
+        # Points for the piece under the rules of the corpus's mode
+        ("score", "<u4"),
+    ]
+)
+MAX_PIECES = int(np.iinfo(PIECE["piece"]).max) + 1
+
+GAME = np.dtype(
+    [
+        ("seed", "<u8"),
+        # Row of the first piece of the game in the piece columns
+        ("first_piece", "<u8"),
+        ("pieces", "<u4"),
+        ("lines", "<u4"),
+        ("score", "<u8"),
+    ]
+)
+
+COLUMN_FILES = {
+    **{name: f"{name}.bin" for name in PIECE.names},
+    **{f"games_{name}": f"games_{name}.bin" for name in GAME.names},
+}
+
+
+def encode_placement(shape: Shapes, placement: int) -> Tuple[int, int]:
+    """
+    The rotation and lowest bit index that `decode_placement` turns back into
+    the placement
+    """
+    position = lowest_bit_index(placement)
+    for rotation, orientation in enumerate(orientations(shape)):
+        if orientation >> lowest_bit_index(orientation) << position == placement:
+            return rotation, position
+    raise ValueError(f"{placement:#x} is not a placement of {shape}")
+
+
+def decode_placement(shape: Shapes, rotation: int, position: int) -> int:
+    orientation = orientations(shape)[rotation]
+    return orientation >> lowest_bit_index(orientation) << position
+
+
+def record_game(task: Tuple[int, int, List[float], str]) -> np.ndarray:
+    """
+    Plays a game with the autoplayer and returns a record per piece, scored
+    under the rules of the mode, with the game column left for the writer
+    """
+    seed, max_pieces, weights, mode = task
+    if max_pieces > MAX_PIECES:
+        raise ValueError(f"games of more than {MAX_PIECES} pieces cannot be recorded")
+    rules = MODES[mode]
+    autoplayer = Weights.from_list(weights)
+    records = np.zeros(max_pieces, dtype=PIECE)
+    board = 0
+    total_lines = 0
+    shapes = shape_generator(seed)
+    for index in range(max_pieces):
+        shape = next(shapes)
+        placed = best_placement(shape, board, autoplayer)
+        if placed is None:
+            return records[:index]
+
+        placement, next_board, _ = placed
+        level = rules.level(total_lines)
+        lines = full_rows(board | placement)
+        board = next_board
+        total_lines += lines
+
+        record = records[index]
+        record["piece"] = index
+        record["shape"] = SHAPES.index(shape)
+        record["rotation"], record["position"] = encode_placement(shape, placement)
+        record["lines"] = lines
+        record["level"] = min(level, 255)
+        record["height"] = max(0, (board.bit_length() - 1) // COLUMNS)
+        record["score"] = rules.score(lines, 0, level) if lines else 0
+    return records
+
+
+class Corpus:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest["version"] != VERSION:
+            raise ValueError(f"corpus version {manifest['version']} is not {VERSION}")
+        self.pieces = manifest["pieces"]
+        self.games = manifest["games"]
+        self.mode = manifest["mode"]
+
+    def __len__(self) -> int:
+        return self.pieces
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        A read only memory map of a column, `games_` prefixed for game columns
+        """
+        if name.startswith("games_"):
+            dtype, rows = GAME.fields[name[len("games_") :]][0], self.games
+        else:
+            dtype, rows = PIECE.fields[name][0], self.pieces
+        if not rows:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(
+            os.path.join(self.path, COLUMN_FILES[name]),
+            dtype=dtype,
+            mode="r",
+            shape=(rows,),
+        )
+
+    def chunks(
+        self, *names: str, rows: int = CHUNK_ROWS
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        The piece columns in slices of at most `rows`, so only one slice of each
+        is paged in at a time
+        """
+        columns = {name: self.column(name) for name in names}
+        for start in range(0, self.pieces, rows):
+            yield {
+                name: column[start : start + rows] for name, column in columns.items()
+            }
+
+    def line_clears_by_level(self) -> np.ndarray:
+        """
+        Pieces placed at each level by the rows they cleared, as [level, lines]
+        """
+        counts = np.zeros((256, 5), dtype=np.int64)
+        for chunk in self.chunks("level", "lines"):
+            keys = chunk["level"].astype(np.int64) * 5 + np.minimum(chunk["lines"], 4)
+            counts += np.bincount(keys, minlength=256 * 5).reshape(256, 5)
+        levels = np.flatnonzero(counts.any(axis=1))
+        return counts[: levels[-1] + 1 if len(levels) else 0]
+
+    def mean_height_by_piece(self) -> np.ndarray:
+        """
+        Stack height averaged over every game that got that far, by piece index
+        """
+        totals = np.zeros(1 << 16, dtype=np.float64)
+        counts = np.zeros(1 << 16, dtype=np.int64)
+        for chunk in self.chunks("piece", "height"):
+            piece = chunk["piece"]
+            totals[: piece.max() + 1] += np.bincount(piece, weights=chunk["height"])
+            counts[: piece.max() + 1] += np.bincount(piece)
+        reached = np.flatnonzero(counts)
+        end = reached[-1] + 1 if len(reached) else 0
+        return totals[:end] / np.maximum(counts[:end], 1)
+
+    def game_pieces(self, game: int) -> Dict[str, np.ndarray]:
+        """
+        Every piece column of one game
+        """
+        first = int(self.column("games_first_piece")[game])
+        count = int(self.column("games_pieces")[game])
+        return {name: self.column(name)[first : first + count] for name in PIECE.names}
+
+
+class CorpusWriter:
+    """
+    Appends games to a corpus, creating it if needed. Rows past the manifest,
+    left by a writer that did not finish, are cut off on open. Every game of a
+    corpus is scored under the same mode
+    """
+
+    def __init__(self, path: str, mode: str = "snes"):
+        self.path = path
+        self.mode = mode
+        os.makedirs(path, exist_ok=True)
+        manifest_path = os.path.join(path, MANIFEST)
+        if os.path.exists(manifest_path):
+            corpus = Corpus(path)
+            if corpus.mode != mode:
+                raise ValueError(f"corpus is scored as {corpus.mode}, not {mode}")
+            self.pieces, self.games = corpus.pieces, corpus.games
+        else:
+            self.pieces, self.games = 0, 0
+
+        self.files = {}
+        for name, file_name in COLUMN_FILES.items():
+            if name.startswith("games_"):
+                dtype, rows = GAME.fields[name[len("games_") :]][0], self.games
+            else:
+                dtype, rows = PIECE.fields[name][0], self.pieces
+            f = open(os.path.join(path, file_name), "ab")
+            f.truncate(rows * dtype.itemsize)
+            self.files[name] = f
+        self.write_manifest()
+
+    def __enter__(self) -> "CorpusWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_game(self, seed: int, records: np.ndarray):
+        records = records.copy()
+        records["game"] = self.games
+        game = np.zeros(1, dtype=GAME)
+        game["seed"] = seed
+        game["first_piece"] = self.pieces
+        game["pieces"] = len(records)
+        game["lines"] = records["lines"].sum()
+        game["score"] = records["score"].sum()
+
+        for name in PIECE.names:
+            self.files[name].write(np.ascontiguousarray(records[name]).tobytes())
+        for name in GAME.names:
+            self.files[f"games_{name}"].write(game[name].tobytes())
+        self.pieces += len(records)
+        self.games += 1
+
+    def flush(self):
+        """
+        Makes every added game visible to readers
+        """
+        for f in self.files.values():
+            f.flush()
+            os.fsync(f.fileno())
+        self.write_manifest()
+
+    def write_manifest(self):
+        manifest = {
+            "version": VERSION,
+            "pieces": self.pieces,
+            "games": self.games,
+            "mode": self.mode,
+            "piece_fields": {name: PIECE.fields[name][0].str for name in PIECE.names},
+            "game_fields": {name: GAME.fields[name][0].str for name in GAME.names},
+        }
+        manifest_path = os.path.join(self.path, MANIFEST)
+        with open(f"{manifest_path}.tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+
+def record(args):
+    seeds = [args.seed + game for game in range(args.games)]
+    tasks = [(seed, args.pieces, Weights().as_list(), args.mode) for seed in seeds]
+    with CorpusWriter(args.path, args.mode) as writer, ProcessPoolExecutor(
+        args.workers
+    ) as pool:
+        for seed, records in zip(seeds, pool.map(record_game, tasks)):
+            writer.add_game(seed, records)
+            if writer.games % 100 == 0:
+                writer.flush()
+        print(f"{writer.games} games, {writer.pieces} pieces")
+
+
+def stats(args):
+    corpus = Corpus(args.path)
+    print(f"{corpus.games} games, {len(corpus)} pieces")
+    print("level  pieces by rows cleared (0, 1, 2, 3, 4)")
+    for level, counts in enumerate(corpus.line_clears_by_level()):
+        print(f"{level:5}  {' '.join(f'{count:10}' for count in counts)}")
+
+    heights = corpus.mean_height_by_piece()
+    print("piece  mean stack height")
+    for piece in range(0, len(heights), max(1, len(heights) // 10)):
+        print(f"{piece:5}  {heights[piece]:.2f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="play games and append them")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--games", type=int, default=100)
+    record_parser.add_argument(
+        "--pieces",
+        type=int,
+        default=1000,
+        help=f"most pieces per game, up to {MAX_PIECES}",
+    )
+    record_parser.add_argument("--mode", choices=sorted(MODES), default="snes")
+    record_parser.add_argument("--seed", type=int, default=0)
+    record_parser.add_argument("--workers", type=int, default=os.cpu_count())
+    record_parser.set_defaults(run=record)
+
+    stats_parser = commands.add_parser("stats", help="print aggregates of a corpus")
+    stats_parser.add_argument("path")
+    stats_parser.set_defaults(run=stats)
+
+    args = parser.parse_args(argv)
+    if args.command == "record" and not 0 < args.pieces <= MAX_PIECES:
+        parser.error(f"--pieces must be between 1 and {MAX_PIECES}")
+    args.run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Boards for practice drills and bot evaluation: garbage to dig through, and set
+ups loaded from text or from a compact binary form.
+
+Text boards list rows from the top down to the row pieces rest on, one
+character per column from left to right, with `.` for an empty cell, `1` to `7`
+for the colors of pieces and `X` for garbage:
+
+    ..........
+    XXXX.XXXXX
+    XXXXX.XXXX
+
+Binary boards are `b"TB"`, a version byte and a row count, then a little endian
+16 bit mask per row from the bottom up, then a 4 bit color for every occupied
+cell in bit order.
+
+    python -m src.drills bench --drills 10000
+    python -m src.drills dig --rows 9 --games 20
+"""
+import argparse
+import random
+import struct
+import sys
+import time
+from typing import List, Optional, Type
+
+from src.autoplay import Weights, best_placement
+from src.boards import BOARDS, GARBAGE_COLOR, GARBAGE_ROW, ROW_MASK, Board, IntBoard
+from src.boards import garbage_rows
+from src.settings import COLUMNS
+from src.shapes import shape_generator
+
+from utils.bitboard import bit_indices
+
+MAGIC = b"TB"
+VERSION = 1
+# Columns from left to right, leaving out the walls
+TEXT_COLUMNS = range(COLUMNS - 2, 0, -1)
+
+
+def random_holes(rows: int, rng: random.Random, messiness: float = 1.0) -> List[int]:
+    """
+    A hole column per garbage row, bottom row first. With a messiness of 0 every
+    row shares a hole, as in a dig race, and with 1 every row gets a new one,
+    as in a cheese race
+    """
+    holes = []
+    column = rng.randint(1, COLUMNS - 2)
+    for _ in range(rows):
+        if holes and rng.random() < messiness:
+            column = rng.choice([c for c in range(1, COLUMNS - 1) if c != column])
+        holes.append(column)
+    return holes
+
+
+def cheese(
+    rows: int,
+    rng: random.Random,
+    messiness: float = 1.0,
+    board_type: Type[Board] = IntBoard,
+) -> Board:
+    board = board_type()
+    board.push_garbage(garbage_rows(random_holes(rows, rng, messiness)), rows)
+    return board
+
+
+def parse_board(text: str, board_type: Type[Board] = IntBoard) -> Board:
+    lines = [line.strip() for line in text.strip().splitlines()]
+    cells = []
+    for row, line in enumerate(reversed(lines), GARBAGE_ROW):
+        if len(line) != len(TEXT_COLUMNS):
+            raise ValueError(f"row {line!r} is not {len(TEXT_COLUMNS)} cells wide")
+        for column, char in zip(TEXT_COLUMNS, line):
+            if char == ".":
+                continue
+            if char == "X":
+                color = GARBAGE_COLOR
+            elif char in "1234567":
+                color = int(char)
+            else:
+                raise ValueError(f"unknown cell {char!r} in row {line!r}")
+            cells.append((row * COLUMNS + column, color))
+    return board_type.from_cells(cells)
+
+
+def format_board(board: Board) -> str:
+    colors = dict(board.cells())
+    top = max((index // COLUMNS for index in colors), default=GARBAGE_ROW)
+    lines = []
+    for row in range(top, GARBAGE_ROW - 1, -1):
+        line = ""
+        for column in TEXT_COLUMNS:
+            color = colors.get(row * COLUMNS + column, 0)
+            line += "." if not color else "X" if color == GARBAGE_COLOR else str(color)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def pack_board(board: Board) -> bytes:
+    bitboard = board.bitboard()
+    rows = max(0, (bitboard.bit_length() + COLUMNS - 1) // COLUMNS)
+    masks = [(bitboard >> (row * COLUMNS)) & ROW_MASK for row in range(rows)]
+
+    colors = dict(board.cells())
+    nibbles = [colors.get(index, 0) for index in bit_indices(bitboard)]
+    if len(nibbles) % 2:
+        nibbles.append(0)
+    packed_colors = bytes(
+        low | high << 4 for low, high in zip(nibbles[::2], nibbles[1::2])
+    )
+    return struct.pack(f"<2sBB{rows}H", MAGIC, VERSION, rows, *masks) + packed_colors
+
+
+def unpack_board(data: bytes, board_type: Type[Board] = IntBoard) -> Board:
+    magic, version, rows = struct.unpack_from("<2sBB", data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a packed board")
+    masks = struct.unpack_from(f"<{rows}H", data, 4)
+
+    bitboard = 0
+    for mask in reversed(masks):
+        bitboard = bitboard << COLUMNS | mask
+    colors = data[4 + 2 * rows :]
+    cells = [
+        (index, colors[i // 2] >> (4 * (i % 2)) & 0xF)
+        for i, index in enumerate(bit_indices(bitboard))
+    ]
+    return board_type.from_cells(cells)
+
+
+def garbage_left(board: Board) -> int:
+    return sum(1 for _, color in board.cells() if color == GARBAGE_COLOR)
+
+
+def dig(
+    board: Board, seed: int, weights: Weights, max_pieces: int = 200
+) -> Optional[int]:
+    """
+    Pieces the autoplayer needs to clear every garbage cell, or None if it
+    runs out of pieces or tops out first
+    """
+    shapes = shape_generator(seed)
+    for pieces in range(1, max_pieces + 1):
+        placed = best_placement(next(shapes), board.bitboard(), weights)
+        if placed is None:
+            return None
+        placement, _, _ = placed
+        board.lock(placement, 1)
+        board.clear_lines()
+        if not garbage_left(board):
+            return pieces
+    return None
+
+
+def bench(args):
+    rng = random.Random(args.seed)
+    board_type = BOARDS[args.board]
+    boards = []
+    start = time.perf_counter()
+    for _ in range(args.drills):
+        board = cheese(args.rows, rng, args.messiness, board_type)
+        board.push_garbage(garbage_rows(random_holes(2, rng)), 2)
+        boards.append(board)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.drills} drills set up in {elapsed:.3f}s, {args.drills / elapsed:.0f}/s"
+    )
+
+    start = time.perf_counter()
+    for board in boards:
+        unpack_board(pack_board(board), board_type)
+    elapsed = time.perf_counter() - start
+    print(f"packed and unpacked in {elapsed:.3f}s, {args.drills / elapsed:.0f}/s")
+
+
+def dig_race(args):
+    rng = random.Random(args.seed)
+    results = []
+    for game in range(args.games):
+        board = cheese(args.rows, rng, args.messiness, BOARDS[args.board])
+        results.append(dig(board, args.seed + game, Weights(), args.pieces))
+    finished = [pieces for pieces in results if pieces is not None]
+    print(f"{len(finished)}/{len(results)} dug out")
+    if finished:
+        print(f"{sum(finished) / len(finished):.1f} pieces on average")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, run, help in (
+        ("bench", bench, "time setting up drills"),
+        ("dig", dig_race, "count the pieces the autoplayer needs to dig out"),
+    ):
+        command = commands.add_parser(name, help=help)
+        command.add_argument("--rows", type=int, default=9)
+        command.add_argument("--messiness", type=float, default=1.0)
+        command.add_argument("--board", choices=sorted(BOARDS), default="int")
+        command.add_argument("--seed", type=int, default=0)
+        command.set_defaults(run=run)
+        if name == "bench":
+            command.add_argument("--drills", type=int, default=10000)
+        else:
+            command.add_argument("--games", type=int, default=20)
+            command.add_argument("--pieces", type=int, default=200)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Particles for line clears, kept in NumPy arrays allocated once.
+
+Live particles are packed at the front of the arrays. Every step moves all of
+them at once with in place array operations, then packs the survivors down
+again, so a burst of hundreds of particles costs a few array operations a frame
+rather than an object per particle. Positions are in base layout coordinates
+and are only mapped to the window when drawing, where every particle becomes one
+entry of the frame's single `blits` call.
+
+    particles = ParticleSystem(capacity=2048, seed=seed)
+    particles.burst(matrix.cell_centers(cells), colors)
+    particles.step(1 / FPS)
+    screen.blits(matrix.blits() + particles.blits(), doreturn=False)
+"""
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pygame
+from pygame.surface import Surface
+
+from src.layout import layout
+from src.tetriminos import COLORS, black_image, tile_images
+
+from utils.metrics import metrics
+
+PARTICLE_SIZE = 10
+GRAVITY = 1800.0
+# Particles fade out through this many alpha levels
+FADE_LEVELS = 8
+
+
+@lru_cache(maxsize=16)
+def particle_sprites(size: int) -> List[List[Optional[Surface]]]:
+    """
+    A shrunken tile of each color and of garbage at every fade level, indexed
+    like the color plane of a board and then by fade level
+    """
+    sprites: List[List[Optional[Surface]]] = [[None] * FADE_LEVELS]
+    images = [tile_images[color] for color in COLORS] + [black_image]
+    for image in images:
+        tile = pygame.transform.scale(image, (size, size))
+        levels = []
+        for level in range(FADE_LEVELS):
+            sprite = tile.copy()
+            sprite.set_alpha(round(255 * (level + 1) / FADE_LEVELS))
+            levels.append(sprite)
+        sprites.append(levels)
+    if metrics.enabled:
+        metrics.count("surfaces_allocated", len(images) * (FADE_LEVELS + 1))
+    return sprites
+
+
+class ParticleSystem:
+    def __init__(self, capacity: int = 2048, seed: Optional[int] = None):
+        self.capacity = capacity
+        self.count = 0
+        self.position = np.zeros((capacity, 2), dtype=np.float32)
+        self.velocity = np.zeros((capacity, 2), dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float32)
+        self.lifetime = np.ones(capacity, dtype=np.float32)
+        self.color = np.zeros(capacity, dtype=np.uint8)
+        # Scratch space for a step, so moving particles allocates nothing
+        self.moved = np.zeros((capacity, 2), dtype=np.float32)
+        self.random = np.random.default_rng(seed)
+
+    def burst(
+        self,
+        centers: Sequence[Tuple[float, float]],
+        colors: Sequence[int],
+        per_cell: int = 6,
+        speed: float = 500.0,
+        lifetime: float = 0.8,
+    ):
+        """
+        Throws `per_cell` particles out of every cell, in the color of the cell.
+        Particles that do not fit in the pool are dropped
+        """
+        start = self.count
+        total = min(len(centers) * per_cell, self.capacity - start)
+        if total <= 0:
+            return
+        end = start + total
+
+        random = self.random
+        self.position[start:end] = np.repeat(
+            np.asarray(centers, dtype=np.float32), per_cell, axis=0
+        )[:total]
+        self.color[start:end] = np.repeat(np.asarray(colors, dtype=np.uint8), per_cell)[
+            :total
+        ]
+        angle = random.uniform(0, 2 * np.pi, total)
+        magnitude = random.uniform(0.3, 1.0, total) * speed
+        self.velocity[start:end, 0] = np.cos(angle) * magnitude
+        # Mostly upwards, so gravity gives them an arc
+        self.velocity[start:end, 1] = np.sin(angle) * magnitude - speed * 0.5
+        self.lifetime[start:end] = random.uniform(0.5, 1.0, total) * lifetime
+        self.life[start:end] = self.lifetime[start:end]
+        self.count = end
+
+    def step(self, dt: float):
+        count = self.count
+        if not count:
+            return
+
+        velocity = self.velocity[:count]
+        velocity[:, 1] += GRAVITY * dt
+        moved = self.moved[:count]
+        np.multiply(velocity, dt, out=moved)
+        self.position[:count] += moved
+        life = self.life[:count]
+        life -= dt
+
+        alive = life > 0
+        survivors = int(np.count_nonzero(alive))
+        if survivors == count:
+            return
+        for array in (
+            self.position,
+            self.velocity,
+            self.life,
+            self.lifetime,
+            self.color,
+        ):
+            array[:survivors] = array[:count][alive]
+        self.count = survivors
+
+    def clear(self):
+        self.count = 0
+
+    def blits(self) -> List[Tuple[Surface, Tuple[int, int]]]:
+        count = self.count
+        if not count:
+            return []
+
+        size = max(1, round(PARTICLE_SIZE * layout.scale))
+        sprites = particle_sprites(size)
+        # Top left corners on the window, centred on each particle
+        corners = self.position[:count] * layout.scale - size / 2
+        corners += layout.origin
+        levels = np.ceil(self.life[:count] / self.lifetime[:count] * FADE_LEVELS) - 1
+        levels = levels.clip(0, FADE_LEVELS - 1).astype(np.intp)
+
+        sequence = [
+            (sprites[color][level], (x, y))
+            for color, level, (x, y) in zip(
+                self.color[:count].tolist(),
+                levels.tolist(),
+                corners.astype(np.int32).tolist(),
+            )
+        ]
+        if metrics.enabled:
+            metrics.count("tiles_rendered", len(sequence))
+        return sequence
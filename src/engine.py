@@ -0,0 +1,251 @@
+"""
+Headless version of the movement rules implemented by `Matrix` and `Tetrimino`.
+
+Pieces and boards are plain integers laid out exactly like the bitboards used
+by the widgets, so results from here can be compared bit for bit with a game
+running in the window.
+"""
+from enum import Enum
+from functools import lru_cache
+from typing import List, Optional, Set, Tuple
+
+from src.settings import COLUMNS, ROWS
+from src.shapes import Shapes, tetriminos, tetriminos_widths
+
+from utils.bitboard import (
+    arrangement_to_bit,
+    bit_indices,
+    bitboard_height,
+    bottom_border,
+    left_border,
+    lowest_bit_index,
+    right_border,
+    rotate_bitboard,
+    top_border,
+    widen_bitboard_width,
+)
+
+FLOOR = bottom_border(COLUMNS)
+CEILING = top_border(COLUMNS, ROWS)
+# Carried up over the spawn area, so a piece above the visible rows cannot slide
+# sideways round into the next row. `Matrix` collides with the same walls.
+WALL_ROWS = ROWS + 4
+WALLS = left_border(COLUMNS, WALL_ROWS) | right_border(COLUMNS, WALL_ROWS)
+SPAWN_SHIFT = COLUMNS * (ROWS - 1) - COLUMNS // 2 - 2
+
+Piece = Tuple[int, int]  # bitboard, rotation
+
+
+class Inputs(Enum):
+    left = "left"
+    right = "right"
+    down = "down"
+    rotate = "rotate"
+    rotate_back = "rotate_back"
+    drop = "drop"
+    stash = "stash"
+    # Moves down like `down`, but from the timer rather than a key
+    gravity = "gravity"
+
+
+class TSpin(Enum):
+    none = "none"
+    mini = "mini"
+    full = "full"
+
+
+# `Matrix.clear_lines` measures its line filters with rows and columns swapped,
+# so blocks of 3 and 4 full rows are reported, and drop the rows above them, as
+# 2 and 3. Kept identical here so that counts line up with the game.
+LINE_FILTER_HEIGHTS = {
+    height: bitboard_height((1 << (COLUMNS * height)) - 1, COLUMNS, ROWS)
+    for height in range(1, 5)
+}
+
+
+@lru_cache(maxsize=None)
+def orientations(shape: Shapes) -> Tuple[int, int, int, int]:
+    """
+    The four clockwise orientations of a shape, widened to the board width
+    """
+    arrangement = tetriminos[shape]
+    width = tetriminos_widths[shape]
+    small_bitboard = arrangement_to_bit(arrangement, width)
+
+    rotated = []
+    for _ in range(4):
+        rotated.append(widen_bitboard_width(small_bitboard, width, COLUMNS))
+        small_bitboard = rotate_bitboard(small_bitboard, width)
+    return tuple(rotated)  # type: ignore
+
+
+def spawn(shape: Shapes) -> Piece:
+    return orientations(shape)[0] << SPAWN_SHIFT, 0
+
+
+def can_move_down(bitboard: int, board: int) -> bool:
+    # A piece sitting on the floor row can only get there through a rotation,
+    # and has nowhere left to fall.
+    if bitboard & FLOOR:
+        return False
+    return (bitboard >> COLUMNS) & (board | FLOOR) == 0
+
+
+def move_down(bitboard: int, board: int) -> Optional[int]:
+    if not can_move_down(bitboard, board):
+        return None
+    return bitboard >> COLUMNS
+
+
+def move_left(bitboard: int, board: int) -> Optional[int]:
+    moved = bitboard << 1
+    if moved & (board | WALLS):
+        return None
+    return moved
+
+
+def move_right(bitboard: int, board: int) -> Optional[int]:
+    moved = bitboard >> 1
+    if moved & (board | WALLS):
+        return None
+    return moved
+
+
+def rotate(shape: Shapes, piece: Piece, board: int) -> Optional[Piece]:
+    """
+    Mirrors `Matrix.rotate`: always clockwise, with a single column kick to the
+    right and then to the left when the rotated piece collides.
+    """
+    bitboard, rotation = piece
+    rotated_orientations = orientations(shape)
+    shift = lowest_bit_index(bitboard) - lowest_bit_index(
+        rotated_orientations[rotation]
+    )
+    if shift < 0:
+        return None
+
+    rotation = (rotation + 1) % 4
+    rotated = rotated_orientations[rotation] << shift
+    occupied = board | WALLS
+    if rotated & occupied:
+        if not (rotated >> 1) & occupied:
+            rotated >>= 1
+        elif not (rotated << 1) & occupied:
+            rotated <<= 1
+        else:
+            return None
+    return rotated, rotation
+
+
+def hard_drop(bitboard: int, board: int) -> int:
+    while can_move_down(bitboard, board):
+        bitboard >>= COLUMNS
+    return bitboard
+
+
+def clear_lines(board: int) -> Tuple[int, List[int]]:
+    """
+    Mirrors `Matrix.clear_lines`, removing blocks of 4, 3, 2 and then single
+    full rows from the bottom up
+    """
+    lines_cleared = []
+    full_board = board | WALLS
+    for height in range(4, 0, -1):
+        line_filter = (1 << (COLUMNS * height)) - 1
+        row = 0
+        while row + height < ROWS:
+            shifted_filter = line_filter << (COLUMNS * row)
+            if full_board & shifted_filter != shifted_filter:
+                row += 1
+                continue
+            drop = LINE_FILTER_HEIGHTS[height]
+            lines_cleared.append(drop)
+            below = board & ((1 << (COLUMNS * row)) - 1)
+            above = board >> (COLUMNS * (row + height))
+            board = below | (above << (COLUMNS * (row + height - drop)))
+            full_board = board | WALLS
+    return board, lines_cleared
+
+
+def full_rows(board: int) -> int:
+    """
+    Rows that `clear_lines` removes from the board. The drops it returns are
+    one short for blocks of three and four rows, so they do not count rows
+    """
+    row_mask = (1 << COLUMNS) - 1
+    full_row = row_mask & ~WALLS
+    return sum(
+        1 for row in range(ROWS) if (board >> (row * COLUMNS)) & row_mask == full_row
+    )
+
+
+def t_spin(piece: int, board: int) -> TSpin:
+    """
+    The three corner rule for a T locked at `piece` after a rotation: three of
+    the four cells diagonal to its centre must be filled, and it is a full
+    T-spin when both of those on the side it points to are. `board` should
+    include the walls and the floor
+    """
+    for index in bit_indices(piece):
+        center = 1 << index
+        # Up, left, down and right, as bit 0 is the bottom right cell
+        sides = (center << COLUMNS, center << 1, center >> COLUMNS, center >> 1)
+        if sum(1 for side in sides if side & piece) == 3:
+            break
+    else:
+        return TSpin.none
+
+    up_left, up_right = center << (COLUMNS + 1), center << (COLUMNS - 1)
+    down_left, down_right = center >> (COLUMNS - 1), center >> (COLUMNS + 1)
+    filled = [
+        corner & board > 0 for corner in (up_left, up_right, down_left, down_right)
+    ]
+    if sum(filled) < 3:
+        return TSpin.none
+
+    # The flat side of the T is the one without a cell, and it points away
+    back = next(i for i, side in enumerate(sides) if not side & piece)
+    front_corners = ((0, 1), (0, 2), (2, 3), (1, 3))[(back + 2) % 4]
+    if all(filled[corner] for corner in front_corners):
+        return TSpin.full
+    return TSpin.mini
+
+
+def is_game_over(board: int) -> bool:
+    return board & CEILING > 0
+
+
+def placements(shape: Shapes, board: int) -> Set[int]:
+    """
+    Every distinct position the piece can lock in, reached from its spawn
+    position by moving left, right, down and rotating
+    """
+    start = spawn(shape)
+    seen = {start}
+    frontier = [start]
+    locked: Set[int] = set()
+    while frontier:
+        piece = frontier.pop()
+        bitboard, rotation = piece
+
+        candidates = []
+        down = move_down(bitboard, board)
+        if down is None:
+            locked.add(bitboard)
+        else:
+            candidates.append((down, rotation))
+        left = move_left(bitboard, board)
+        if left is not None:
+            candidates.append((left, rotation))
+        right = move_right(bitboard, board)
+        if right is not None:
+            candidates.append((right, rotation))
+        rotated = rotate(shape, piece, board)
+        if rotated is not None:
+            candidates.append(rotated)
+
+        for candidate in candidates:
+            if candidate not in seen:
+                seen.add(candidate)
+                frontier.append(candidate)
+    return locked
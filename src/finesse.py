@@ -0,0 +1,112 @@
+"""
+Shortest key sequences to every position a piece can lock in.
+
+The search is a breadth first search over piece states using the same rules as
+`Matrix`: sideways moves, clockwise rotation with its single column kicks, soft
+drops and hard drops. Every input takes one frame, and with `frames_per_row`
+set, gravity pulls the piece down a row (or locks it) every that many frames.
+"""
+from array import array
+from collections import deque
+from typing import Dict, List, Optional
+
+from src.engine import (
+    Inputs,
+    Piece,
+    can_move_down,
+    hard_drop,
+    move_left,
+    move_right,
+    rotate,
+    spawn,
+)
+from src.settings import COLUMNS, ROWS
+from src.shapes import Shapes
+
+from utils.bitboard import lowest_bit_index
+
+MOVES = [Inputs.left, Inputs.right, Inputs.rotate, Inputs.down]
+# Pieces spawn partly above the board and can be kicked one column over
+STATE_CELLS = COLUMNS * (ROWS + 4)
+
+
+def finesse(
+    shape: Shapes,
+    board: int,
+    frames_per_row: Optional[int] = None,
+    start: Optional[Piece] = None,
+) -> Dict[int, List[Inputs]]:
+    """
+    Maps every reachable lock position to the shortest sequence of inputs that
+    locks the piece there
+    """
+    phases = frames_per_row or 1
+    # A state is fully described by where its lowest bit is, its rotation and
+    # how many frames have passed since gravity last pulled it down
+    def key(bitboard: int, rotation: int, phase: int) -> int:
+        return (lowest_bit_index(bitboard) * 4 + rotation) * phases + phase
+
+    visited = bytearray(STATE_CELLS * 4 * phases)
+    parents = array("l", [-1]) * len(visited)
+    moves = bytearray(len(visited))
+
+    def path(state: int, last: Inputs) -> List[Inputs]:
+        inputs = [last]
+        while parents[state] != -1:
+            inputs.append(MOVES[moves[state]])
+            state = parents[state]
+        inputs.reverse()
+        return inputs
+
+    bitboard, rotation = start or spawn(shape)
+    start_key = key(bitboard, rotation, 0)
+    visited[start_key] = 1
+    frontier = deque([(bitboard, rotation, 0, start_key)])
+
+    locked: Dict[int, List[Inputs]] = {}
+    while frontier:
+        bitboard, rotation, phase, state = frontier.popleft()
+
+        dropped = hard_drop(bitboard, board)
+        if dropped not in locked:
+            locked[dropped] = path(state, Inputs.drop)
+
+        for move_index, move in enumerate(MOVES):
+            moved: Optional[int] = None
+            moved_rotation = rotation
+            if move is Inputs.left:
+                moved = move_left(bitboard, board)
+            elif move is Inputs.right:
+                moved = move_right(bitboard, board)
+            elif move is Inputs.rotate:
+                rotated = rotate(shape, (bitboard, rotation), board)
+                if rotated:
+                    moved, moved_rotation = rotated
+            elif can_move_down(bitboard, board):
+                moved = bitboard >> COLUMNS
+            elif bitboard not in locked:
+                # Soft dropping a resting piece locks it
+                locked[bitboard] = path(state, move)
+
+            if moved is None:
+                continue
+
+            next_phase = phase + 1
+            if next_phase == phases:
+                next_phase = 0
+                if frames_per_row:
+                    if not can_move_down(moved, board):
+                        if moved not in locked:
+                            locked[moved] = path(state, move)
+                        continue
+                    moved >>= COLUMNS
+
+            next_key = key(moved, moved_rotation, next_phase)
+            if visited[next_key]:
+                continue
+            visited[next_key] = 1
+            parents[next_key] = state
+            moves[next_key] = move_index
+            frontier.append((moved, moved_rotation, next_phase, next_key))
+
+    return locked
@@ -0,0 +1,481 @@
+"""
+Differential fuzzing of the movement rules: random boards, pieces and inputs
+run through the widget code the game plays with, as the reference, and through
+faster implementations that must agree with it bit for bit.
+
+Each check turns a seeded `random.Random` into a case and compares what the
+reference and every candidate return for it. Case `n` of a run always comes
+from the same seed, so a divergence is reported with everything needed to play
+it again on its own:
+
+    python -m src.fuzz --cases 1000000 --workers 8
+    python -m src.fuzz --check play --seed 3 --case 81234
+    python -m src.fuzz --check clear_lines --candidate clear_lines=fast:clear_lines
+
+A rewrite is checked by adding it as a candidate, a function taking the case of
+the check and returning what the reference returns.
+"""
+import argparse
+import importlib
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src import engine
+from src.boards import FULL_ROW, RowBoard
+from src.engine import FLOOR, WALL_ROWS, WALLS, Inputs, orientations
+from src.settings import COLUMNS, ROWS
+from src.shapes import Shapes, tetriminos, tetriminos_widths
+from src.tetriminos import COLORS, Ghost, Matrix, Tetrimino
+
+from utils.bitboard import arrangement_to_bit, rotate_bitboard, widen_bitboard_width
+
+SHAPES = list(Shapes)
+# Most inputs played on one piece before the case ends
+MAX_ACTIONS = 40
+ACTIONS = [Inputs.left, Inputs.right, Inputs.down, Inputs.rotate]
+
+# board, shape, rotation, piece bitboard
+PieceCase = Tuple[int, Shapes, int, int]
+
+
+@dataclass
+class Check:
+    generate: Callable[[random.Random], Any]
+    reference: Callable[[Any], Any]
+    candidates: Dict[str, Callable[[Any], Any]]
+    # States a case covers, for throughput
+    states: Callable[[Any], int] = lambda case: 1
+
+
+@dataclass
+class Divergence:
+    check: str
+    seed: int
+    case_index: int
+    case: Any
+    candidate: str
+    expected: Any
+    actual: Any
+
+    def report(self) -> str:
+        replay = (
+            f"python -m src.fuzz --check {self.check} --seed {self.seed} "
+            f"--case {self.case_index}"
+        )
+        # Candidates loaded from the command line are named by where they live
+        if ":" in self.candidate:
+            replay += f" --candidate {self.check}={self.candidate}"
+        lines = [
+            f"{self.check}: {self.candidate} diverges at case {self.case_index} "
+            f"of seed {self.seed}",
+            f"  replay with: {replay}",
+            f"  case:      {describe(self.case)}",
+            f"  reference: {describe(self.expected)}",
+            f"  {self.candidate + ':':<10} {describe(self.actual)}",
+        ]
+        board = self.case[0] if isinstance(self.case, tuple) else None
+        if isinstance(board, int):
+            lines.append(format_bitboard(board))
+        return "\n".join(lines)
+
+
+def describe(value: Any) -> str:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return hex(value)
+    if isinstance(value, (tuple, list)):
+        inner = ", ".join(describe(item) for item in value)
+        return f"({inner})" if isinstance(value, tuple) else f"[{inner}]"
+    if isinstance(value, (Shapes, Inputs)):
+        return value.name
+    return repr(value)
+
+
+def format_bitboard(board: int) -> str:
+    """
+    The board from the top row down, walls included, `#` for a filled cell
+    """
+    top = max(1, (board.bit_length() + COLUMNS - 1) // COLUMNS)
+    return "\n".join(
+        "  "
+        + "".join(
+            "#" if board >> (row * COLUMNS + column) & 1 else "."
+            for column in range(COLUMNS - 1, -1, -1)
+        )
+        for row in range(top - 1, -1, -1)
+    )
+
+
+def random_board(rng: random.Random) -> int:
+    """
+    A stack of random rows, about a quarter of them full, resting on the floor
+    row and as high as the top of the board
+    """
+    board = 0
+    height = rng.randint(0, ROWS - 1)
+    getrandbits = rng.getrandbits
+    random_float = rng.random
+    for row in range(1, height + 1):
+        mask = FULL_ROW if random_float() < 0.25 else getrandbits(COLUMNS) & FULL_ROW
+        board |= mask << (row * COLUMNS)
+    return board
+
+
+def random_piece(rng: random.Random) -> PieceCase:
+    """
+    A piece that fits on a random board anywhere between the walls, the spawn
+    rows above the board included, not necessarily where it could have got to
+    by falling
+    """
+    board = random_board(rng)
+    blocked = board | WALLS | FLOOR
+    while True:
+        shape = rng.choice(SHAPES)
+        rotation = rng.randrange(4)
+        orientation = orientations(shape)[rotation]
+        row = rng.randrange(1, WALL_ROWS)
+        bitboard = orientation << (row * COLUMNS + rng.randrange(COLUMNS - 1))
+        # Shifting can wrap cells round into the next row, through the walls
+        if not bitboard & blocked and bitboard >> (COLUMNS * WALL_ROWS) == 0:
+            return board, shape, rotation, bitboard
+
+
+def reference_matrix(board: int, shape: Shapes, rotation: int, bitboard: int) -> Matrix:
+    """
+    A matrix with `board` locked and the piece active, never drawn
+    """
+    matrix = Matrix(None, (0, 0), iter(()))
+    if board:
+        matrix.board.lock(board, 1)
+    color = COLORS[SHAPES.index(shape)]
+    tetrimino = Tetrimino(None, (0, 0), shape, color, tetriminos[shape])
+    tetrimino.bitboard, tetrimino.rotation = bitboard, rotation
+    matrix.tetrimino = tetrimino
+    matrix.ghost = Ghost(
+        None, (0, 0), shape, color, tetriminos[shape], parent=tetrimino
+    )
+    matrix.ghost.update(matrix.get_full_board())
+    return matrix
+
+
+# rotate_bitboard: every orientation of every shape, turned by the widget code
+# and looked up in the engine's table
+
+
+def generate_rotation(rng: random.Random) -> Tuple[Shapes, int]:
+    return rng.choice(SHAPES), rng.randrange(4)
+
+
+def reference_rotation(case: Tuple[Shapes, int]) -> int:
+    shape, rotation = case
+    width = tetriminos_widths[shape]
+    small_bitboard = arrangement_to_bit(tetriminos[shape], width)
+    for _ in range(rotation):
+        small_bitboard = rotate_bitboard(small_bitboard, width)
+    return widen_bitboard_width(small_bitboard, width, COLUMNS)
+
+
+def engine_rotation(case: Tuple[Shapes, int]) -> int:
+    shape, rotation = case
+    return orientations(shape)[rotation]
+
+
+# clear_lines
+
+
+def generate_clear(rng: random.Random) -> Tuple[int]:
+    return (random_board(rng),)
+
+
+def reference_clear(case: Tuple[int]) -> Tuple[int, List[int]]:
+    matrix = Matrix(None, (0, 0), iter(()))
+    matrix.board.lock(case[0], 1)
+    lines_cleared = matrix.clear_lines()
+    return matrix.get_full_board(), lines_cleared
+
+
+def board_clear(board_type) -> Callable[[Tuple[int]], Tuple[int, List[int]]]:
+    def clear(case: Tuple[int]) -> Tuple[int, List[int]]:
+        board = board_type()
+        board.lock(case[0], 1)
+        lines_cleared = board.clear_lines()
+        return board.bitboard(), lines_cleared
+
+    return clear
+
+
+def engine_clear(case: Tuple[int]) -> Tuple[int, List[int]]:
+    return engine.clear_lines(case[0])
+
+
+# collisions: a move left, right and down from the same state, with None for a
+# move that is blocked or that locks the piece
+
+
+def reference_moves(case: PieceCase) -> Tuple[Optional[int], ...]:
+    results = []
+    for move in (Matrix.move_left, Matrix.move_right, Matrix.move_down):
+        matrix = reference_matrix(*case)
+        move(matrix)
+        tetrimino = matrix.tetrimino
+        moved = tetrimino.bitboard != case[3] and not tetrimino.placed
+        results.append(tetrimino.bitboard if moved else None)
+    return tuple(results)
+
+
+def engine_moves(case: PieceCase) -> Tuple[Optional[int], ...]:
+    board, _, _, bitboard = case
+    return (
+        engine.move_left(bitboard, board),
+        engine.move_right(bitboard, board),
+        engine.move_down(bitboard, board),
+    )
+
+
+# rotate
+
+
+def reference_rotate(case: PieceCase) -> Optional[Tuple[int, int]]:
+    matrix = reference_matrix(*case)
+    matrix.rotate()
+    tetrimino = matrix.tetrimino
+    if tetrimino.rotation == case[2]:
+        return None
+    return tetrimino.bitboard, tetrimino.rotation
+
+
+def engine_rotate(case: PieceCase) -> Optional[Tuple[int, int]]:
+    board, shape, rotation, bitboard = case
+    return engine.rotate(shape, (bitboard, rotation), board)
+
+
+# ghost
+
+
+def reference_ghost(case: PieceCase) -> int:
+    matrix = reference_matrix(*case)
+    matrix.ghost.update(matrix.get_full_board())
+    return matrix.ghost.bitboard
+
+
+def engine_ghost(case: PieceCase) -> int:
+    board, _, _, bitboard = case
+    return engine.hard_drop(bitboard, board)
+
+
+# play: a sequence of inputs on one piece, compared after every input and once
+# the piece locks and its lines are cleared
+
+PlayCase = Tuple[int, Shapes, int, int, Tuple[Inputs, ...]]
+
+
+def generate_play(rng: random.Random) -> PlayCase:
+    actions = tuple(rng.choices(ACTIONS, k=rng.randint(1, MAX_ACTIONS)))
+    return (*random_piece(rng), actions)
+
+
+def reference_play(case: PlayCase) -> List[Any]:
+    board, shape, rotation, bitboard, actions = case
+    matrix = reference_matrix(board, shape, rotation, bitboard)
+    tetrimino, ghost = matrix.tetrimino, matrix.ghost
+    trace: List[Any] = []
+    for action in actions:
+        if action is Inputs.left:
+            matrix.move_left()
+        elif action is Inputs.right:
+            matrix.move_right()
+        elif action is Inputs.down:
+            matrix.move_down()
+        else:
+            matrix.rotate()
+        if tetrimino.placed:
+            lines_cleared = matrix.clear_lines()
+            trace.append((matrix.get_full_board(), lines_cleared))
+            break
+        trace.append((tetrimino.bitboard, tetrimino.rotation, ghost.bitboard))
+    return trace
+
+
+def engine_play(case: PlayCase) -> List[Any]:
+    board, shape, rotation, bitboard, actions = case
+    trace: List[Any] = []
+    for action in actions:
+        if action is Inputs.rotate:
+            rotated = engine.rotate(shape, (bitboard, rotation), board)
+            if rotated is not None:
+                bitboard, rotation = rotated
+        else:
+            move = (
+                engine.move_left
+                if action is Inputs.left
+                else engine.move_right
+                if action is Inputs.right
+                else engine.move_down
+            )
+            moved = move(bitboard, board)
+            if moved is not None:
+                bitboard = moved
+            elif action is Inputs.down:
+                trace.append(engine.clear_lines(board | bitboard))
+                break
+        trace.append((bitboard, rotation, engine.hard_drop(bitboard, board)))
+    return trace
+
+
+CHECKS: Dict[str, Check] = {
+    "rotate_bitboard": Check(
+        generate_rotation, reference_rotation, {"engine": engine_rotation}
+    ),
+    "clear_lines": Check(
+        generate_clear,
+        reference_clear,
+        {"engine": engine_clear, "rows": board_clear(RowBoard)},
+    ),
+    "collisions": Check(
+        random_piece, reference_moves, {"engine": engine_moves}, lambda case: 3
+    ),
+    "rotate": Check(random_piece, reference_rotate, {"engine": engine_rotate}),
+    "ghost": Check(random_piece, reference_ghost, {"engine": engine_ghost}),
+    "play": Check(
+        generate_play,
+        reference_play,
+        {"engine": engine_play},
+        lambda case: len(case[4]),
+    ),
+}
+
+
+def case_rng(seed: int, index: int) -> random.Random:
+    # Seeding from a string keeps the case streams of different seeds apart
+    return random.Random(f"{seed}:{index}")
+
+
+def run_check(
+    name: str, seed: int, start: int, end: int, check: Optional[Check] = None
+) -> Tuple[int, Optional[Divergence]]:
+    """
+    Cases [start, end) of a check, stopping at the first divergence. Returns
+    the number of states compared and the divergence, if any
+    """
+    check = check or CHECKS[name]
+    states = 0
+    for index in range(start, end):
+        case = check.generate(case_rng(seed, index))
+        expected = outcome(check.reference, case)
+        for candidate, function in check.candidates.items():
+            actual = outcome(function, case)
+            if actual != expected:
+                return states, Divergence(
+                    name, seed, index, case, candidate, expected, actual
+                )
+        states += check.states(case)
+    return states, None
+
+
+def outcome(function: Callable[[Any], Any], case: Any) -> Any:
+    """
+    What a function returns, or the exception it raises, so that raising is a
+    divergence like any other
+    """
+    try:
+        return function(case)
+    except Exception as error:
+        return f"raised {error!r}"
+
+
+def load_candidate(spec: str) -> Tuple[str, str, Callable[[Any], Any]]:
+    """
+    A `check=module:function` argument, as the check and the function
+    """
+    check, target = spec.split("=", 1)
+    module, function = target.split(":", 1)
+    return check, target, getattr(importlib.import_module(module), function)
+
+
+def fuzz_task(
+    task: Tuple[str, int, int, int, List[str]]
+) -> Tuple[int, Optional[Divergence]]:
+    name, seed, start, end, specs = task
+    check = CHECKS[name]
+    extra = {
+        target: function
+        for key, target, function in map(load_candidate, specs)
+        if key == name
+    }
+    if extra:
+        check = Check(
+            check.generate, check.reference, {**check.candidates, **extra}, check.states
+        )
+    return run_check(name, seed, start, end, check)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--check", choices=sorted(CHECKS), action="append")
+    parser.add_argument("--cases", type=int, default=100000, help="cases per check")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--case", type=int, help="run only this case, printing it")
+    parser.add_argument(
+        "--candidate",
+        action="append",
+        default=[],
+        metavar="CHECK=MODULE:FUNCTION",
+        help="also compare this function with the reference",
+    )
+    parser.add_argument("--chunk", type=int, default=5000, help="cases per task")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+    names = args.check or sorted(CHECKS)
+
+    if args.case is not None:
+        for name in names:
+            _, divergence = fuzz_task(
+                (name, args.seed, args.case, args.case + 1, args.candidate)
+            )
+            if divergence:
+                print(divergence.report())
+                return 1
+            case = CHECKS[name].generate(case_rng(args.seed, args.case))
+            print(f"{name}: case {args.case} agrees: {describe(case)}")
+        return 0
+
+    failed = False
+    with ProcessPoolExecutor(args.workers) as pool:
+        for name in names:
+            tasks = [
+                (
+                    name,
+                    args.seed,
+                    start,
+                    min(start + args.chunk, args.cases),
+                    args.candidate,
+                )
+                for start in range(0, args.cases, args.chunk)
+            ]
+            start = time.perf_counter()
+            total = 0
+            divergence = None
+            # Results come back in case order, so the first divergence seen is
+            # the first in the run
+            for states, divergence in pool.map(fuzz_task, tasks):
+                total += states
+                if divergence:
+                    break
+            elapsed = time.perf_counter() - start
+            if divergence:
+                failed = True
+                print(divergence.report())
+            else:
+                print(
+                    f"{name}: {args.cases} cases, {total} states agree "
+                    f"in {elapsed:.2f}s, {total / elapsed:.0f} states/s"
+                )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
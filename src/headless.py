@@ -0,0 +1,144 @@
+"""
+Renders a replay without a window, splitting it into segments across a pool of
+worker processes. Each worker plays the replay on from where its last segment
+ended up to the start of the next one without drawing, then draws its frames
+on an off-screen surface.
+
+    python -m src.headless replay.json --out frames/
+    python -m src.headless replay.json --raw | ffmpeg -f rawvideo -pix_fmt rgb24 \\
+        -s 1280x1280 -r 60 -i - clip.mp4
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+# The banner would end up in the middle of raw frames on stdout
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import pygame
+
+from src.engine import Inputs
+from src.layout import BASE_SIZE
+from src.replay import Replay
+from src.scenes import GameScene
+
+SCREEN_SIZE = BASE_SIZE
+
+Segment = Tuple[int, int, Optional[str]]  # start, end, out
+
+# Each worker process loads the replay once and keeps the scene it last drew
+# on. Segments are handed out in order, so a worker's next segment is almost
+# always ahead of its scene and the frames in between are all it has to play.
+worker_replay: Optional[Replay] = None
+worker_scene: Optional[Tuple[Replay, GameScene, int]] = None
+
+
+def init_worker(replay: Replay):
+    global worker_replay
+    worker_replay = replay
+
+
+def scene_at(replay: Replay, frame: int) -> GameScene:
+    """
+    A scene that has played the replay up to `frame`, going on from the one
+    this process last used when it is not past `frame` already
+    """
+    global worker_scene
+    if worker_scene and worker_scene[0] is replay and worker_scene[2] <= frame:
+        _, scene, played = worker_scene
+    else:
+        pygame.font.init()
+        scene = GameScene(
+            pygame.Surface(SCREEN_SIZE),
+            seed=replay.seed,
+            randomizer=replay.randomizer,
+            mode=replay.mode,
+        )
+        played = 0
+    for actions in replay.frames[played:frame]:
+        scene.step([Inputs(action) for action in actions])
+    worker_scene = replay, scene, frame
+    return scene
+
+
+def render_frames(
+    replay: Replay, start: int, end: int, out: Optional[str]
+) -> List[bytes]:
+    """
+    Draws frames [start, end) of the replay, saving them as PNGs into `out`, or
+    returning them as raw RGB when `out` is None
+    """
+    global worker_scene
+    scene = scene_at(replay, start)
+    surface = scene.screen
+    frames = []
+    for index in range(start, end):
+        scene.step([Inputs(action) for action in replay.frames[index]])
+        scene.render()
+        if out:
+            pygame.image.save(surface, os.path.join(out, f"frame_{index:06d}.png"))
+        else:
+            frames.append(pygame.image.tostring(surface, "RGB"))
+    worker_scene = replay, scene, end
+    return frames
+
+
+def render_segment(segment: Segment) -> List[bytes]:
+    return render_frames(worker_replay, *segment)
+
+
+def segments(replay: Replay, segment_frames: int, out: Optional[str]) -> List[Segment]:
+    return [
+        (start, min(start + segment_frames, len(replay.frames)), out)
+        for start in range(0, len(replay.frames), segment_frames)
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("replay")
+    parser.add_argument("--out", help="directory to write PNG frames to")
+    parser.add_argument(
+        "--raw", action="store_true", help="write raw RGB frames to stdout"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--segment-frames",
+        type=int,
+        help="frames per worker task, defaults to 120 for PNGs and 16 for raw output",
+    )
+    args = parser.parse_args(argv)
+    if bool(args.out) == args.raw:
+        parser.error("pass exactly one of --out and --raw")
+
+    replay = Replay.load(args.replay)
+    segment_frames = args.segment_frames or (16 if args.raw else 120)
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        args.workers, initializer=init_worker, initargs=(replay,)
+    ) as pool:
+        for frames in pool.map(
+            render_segment, segments(replay, segment_frames, args.out)
+        ):
+            for frame in frames:
+                sys.stdout.buffer.write(frame)
+    elapsed = time.perf_counter() - start
+
+    total = len(replay.frames)
+    print(
+        f"{total} frames in {elapsed:.2f}s, {total / elapsed:.1f} frames/s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Maps the fixed coordinates widgets are laid out in onto a window of any size.
+
+Offsets and tile sizes are all given for a window of `BASE_SIZE`. When the
+window is resized the layout picks the largest scale that fits and centres the
+content, and drawing code asks it for screen positions and tile sizes. Anything
+built from those, such as rescaled tiles or cell rects, is cached per size.
+"""
+from dataclasses import dataclass
+from typing import Tuple
+
+from pygame.rect import Rect
+
+from src.settings import HEIGHT, WIDTH
+
+BASE_SIZE = (WIDTH + 800, HEIGHT + 400)
+
+
+@dataclass
+class Layout:
+    scale: float = 1.0
+    origin: Tuple[int, int] = (0, 0)
+
+    def resize(self, window_size: Tuple[int, int]):
+        width, height = window_size
+        # A minimised window has no size, and nothing drawn to it shows anyway
+        if width <= 0 or height <= 0:
+            return
+        base_width, base_height = BASE_SIZE
+        self.scale = min(width / base_width, height / base_height)
+        self.origin = (
+            (width - round(base_width * self.scale)) // 2,
+            (height - round(base_height * self.scale)) // 2,
+        )
+
+    def point(self, point: Tuple[float, float]) -> Tuple[int, int]:
+        x, y = point
+        return (
+            self.origin[0] + round(x * self.scale),
+            self.origin[1] + round(y * self.scale),
+        )
+
+    def size(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        width, height = size
+        return max(1, round(width * self.scale)), max(1, round(height * self.scale))
+
+    def rect(self, rect: Rect) -> Rect:
+        return Rect(self.point(rect.topleft), self.size(rect.size))
+
+    def to_base(self, point: Tuple[int, int]) -> Tuple[int, int]:
+        """
+        Window position back in base coordinates, for hit testing
+        """
+        x, y = point
+        return (
+            int((x - self.origin[0]) // self.scale),
+            int((y - self.origin[1]) // self.scale),
+        )
+
+
+layout = Layout()
@@ -1,27 +1,126 @@
-from typing import List
-from abc import ABC, abstractmethod
+"""
+Game modes: how fast pieces fall at each level and how clears are scored.
 
+A mode is plain data, a table of gravity by the level it starts at and a table
+of points by rows cleared, which is expanded into a dense list per level when
+the mode is built. Looking up the speed of a level every frame is then a single
+index:
+
+    mode = MODES["guideline"]
+    level = mode.level(lines_cleared)
+    if elapsed > mode.ticks(level):
+        ...
+    score += mode.score(rows, soft_drops, level, tspin=TSpin.full, combo=2)
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from src.engine import TSpin
 from src.settings import FPS
 
+# Levels with a dense row in the score table, higher levels are scored as needed
+SCORED_LEVELS = 256
+
+
+@dataclass
+class Mode:
+    name: str
+    # Frames a piece takes to fall one row, from each listed level onwards
+    gravity: Dict[int, float]
+    # Points for the rows cleared by one piece, before the level multiplier
+    line_scores: Dict[int, int]
+    # Frame rate of the original hardware, which the gravity frames count in
+    fps: float = FPS
+    first_level: int = 0
+    lines_per_level: int = 10
+    # Points per row a piece is pushed down
+    soft_drop_points: int = 0
+    hard_drop_points: int = 0
+    # Points for a T-spin by its kind and rows cleared, in place of `line_scores`
+    tspin_scores: Dict[Tuple[TSpin, int], int] = field(default_factory=dict)
+    # Points per clear in a row after the first, before the level multiplier
+    combo_points: int = 0
+    # Multiplier for a difficult clear that follows another difficult clear
+    back_to_back: float = 1.0
+
+    def __post_init__(self):
+        self.max_level = max(self.gravity)
+        speed = self.gravity[min(self.gravity)]
+        self.tick_table: List[float] = []
+        for level in range(self.max_level + 1):
+            speed = self.gravity.get(level, speed)
+            self.tick_table.append(speed / self.fps * 1000)
+
+        self.max_lines = max(self.line_scores)
+        self.score_table: List[List[int]] = [
+            self.line_points(level) for level in range(SCORED_LEVELS)
+        ]
 
-class Mode(ABC):
-    @staticmethod
-    @abstractmethod
-    def ticks(level: int):
-        pass
+    def multiplier(self, level: int) -> int:
+        return level + 1 - self.first_level
 
-    @staticmethod
-    @abstractmethod
-    def score(lines_cleared: List[int], soft_drops: int):
-        pass
+    def line_points(self, level: int) -> List[int]:
+        """
+        Points at `level` for clearing each number of rows, up to `max_lines`
+        """
+        multiplier = self.multiplier(level)
+        return [
+            self.line_scores.get(lines, 0) * multiplier
+            for lines in range(self.max_lines + 1)
+        ]
 
+    def level(self, total_lines_cleared: int) -> int:
+        return self.first_level + total_lines_cleared // self.lines_per_level
 
-class GameBoy(Mode):
-    pass
+    def ticks(self, level: int) -> float:
+        """
+        Milliseconds a piece takes to fall one row at `level`
+        """
+        return self.tick_table[min(level, self.max_level)]
 
+    def is_difficult(self, lines: int, tspin: TSpin = TSpin.none) -> bool:
+        """
+        Whether a clear keeps a back to back streak going
+        """
+        return lines >= 4 or (lines > 0 and tspin is not TSpin.none)
 
-class SNES(Mode):
-    LEVELS_AND_FRAME_RATE = {
+    def score(
+        self,
+        lines: int,
+        soft_drops: int,
+        level: int,
+        tspin: TSpin = TSpin.none,
+        combo: int = 0,
+        back_to_back: bool = False,
+        hard_drops: int = 0,
+    ) -> int:
+        """
+        Points for locking a piece that cleared `lines` rows, where `combo`
+        counts the clears in a row before this one and `back_to_back` says
+        whether the last difficult clear was followed by no easy one
+        """
+        lines = min(lines, self.max_lines)
+        if level < SCORED_LEVELS:
+            points = self.score_table[level][lines]
+        else:
+            points = self.line_points(level)[lines]
+
+        if tspin is not TSpin.none and (tspin, lines) in self.tspin_scores:
+            points = self.tspin_scores[tspin, lines] * self.multiplier(level)
+        if back_to_back and self.is_difficult(lines, tspin):
+            points = int(points * self.back_to_back)
+        if lines and combo:
+            points += self.combo_points * combo * self.multiplier(level)
+        return (
+            points
+            + soft_drops * self.soft_drop_points
+            + hard_drops * self.hard_drop_points
+        )
+
+
+SNES = Mode(
+    "snes",
+    gravity={
         0: 48,
         1: 43,
         2: 38,
@@ -37,28 +136,60 @@ class SNES(Mode):
         16: 3,
         19: 2,
         29: 1,
-    }
-
-    LINES_CLEAR_SCORE = {
-        1: 40,
-        2: 100,
-        3: 300,
-        4: 1200,
-    }
-
-    @staticmethod
-    def level(total_lines_cleared: int) -> int:
-        return total_lines_cleared // 10
-
-    @staticmethod
-    def ticks(level: int):
-        level = min([level, max(SNES.LEVELS_AND_FRAME_RATE)])
-        while not SNES.LEVELS_AND_FRAME_RATE.get(level):
-            level -= 1
-        return SNES.LEVELS_AND_FRAME_RATE[level] / FPS * 1000
-
-    @staticmethod
-    def score(lines_cleared: List[int], soft_drops: int, level: int) -> int:
-        total_lines_cleared = sum(lines_cleared)
-        score = SNES.LINES_CLEAR_SCORE[total_lines_cleared] * (level + 1)
-        return score
+    },
+    line_scores={1: 40, 2: 100, 3: 300, 4: 1200},
+    soft_drop_points=1,
+)
+
+GAME_BOY = Mode(
+    "gameboy",
+    gravity={
+        0: 53,
+        1: 49,
+        2: 45,
+        3: 41,
+        4: 37,
+        5: 33,
+        6: 28,
+        7: 22,
+        8: 17,
+        9: 11,
+        10: 10,
+        11: 9,
+        12: 8,
+        13: 7,
+        14: 6,
+        16: 5,
+        18: 4,
+        20: 3,
+    },
+    line_scores={1: 40, 2: 100, 3: 300, 4: 1200},
+    fps=59.73,
+    soft_drop_points=1,
+)
+
+GUIDELINE = Mode(
+    "guideline",
+    # Seconds per row of (0.8 - (level - 1) * 0.007) ** (level - 1), in frames
+    gravity={
+        level: (0.8 - (level - 1) * 0.007) ** (level - 1) * FPS
+        for level in range(1, 21)
+    },
+    line_scores={1: 100, 2: 300, 3: 500, 4: 800},
+    first_level=1,
+    soft_drop_points=1,
+    hard_drop_points=2,
+    tspin_scores={
+        (TSpin.mini, 0): 100,
+        (TSpin.mini, 1): 200,
+        (TSpin.mini, 2): 400,
+        (TSpin.full, 0): 400,
+        (TSpin.full, 1): 800,
+        (TSpin.full, 2): 1200,
+        (TSpin.full, 3): 1600,
+    },
+    combo_points=50,
+    back_to_back=1.5,
+)
+
+MODES: Dict[str, Mode] = {mode.name: mode for mode in (SNES, GAME_BOY, GUIDELINE)}
@@ -0,0 +1,102 @@
+"""
+The board as NumPy arrays, for training and evaluating agents.
+
+Every buffer is allocated once, for a fixed number of games. Boards are copied
+in as the little endian bytes of their bitboards and unpacked through a lookup
+table straight into the planes, since `np.unpackbits` can only return a new
+array. Bit 0 of a bitboard is the bottom right cell, so the planes are a
+reversed view of the unpacked bits, which puts row 0 at the top and column 0 on
+the left like the window does.
+
+    observation = Observation(games=64)
+    for game, (board, piece, next_shape) in enumerate(games):
+        observation.set(game, board, piece, next_shape)
+    observation.update()
+    model(observation.planes, observation.heights)
+"""
+from typing import Optional
+
+import numpy as np
+
+from src.engine import orientations
+from src.settings import COLUMNS, ROWS
+from src.shapes import Shapes
+
+CELLS = COLUMNS * ROWS
+BOARD_BYTES = (CELLS + 7) // 8
+CELLS_MASK = (1 << CELLS) - 1
+
+BOARD, PIECE, PREVIEW = range(3)
+PLANES = 3
+
+# Next shapes are drawn in their spawn orientation across the top four rows
+PREVIEW_SHIFT = COLUMNS * (ROWS - 4) + COLUMNS // 2 - 2
+PREVIEWS = {shape: orientations(shape)[0] << PREVIEW_SHIFT for shape in Shapes}
+
+# Row `byte` holds the bits of `byte`, lowest bit first
+UNPACK_TABLE = np.unpackbits(
+    np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder="little"
+)
+
+
+class Observation:
+    def __init__(self, games: int = 1):
+        self.games = games
+        self.packed = np.zeros((games, PLANES, BOARD_BYTES), dtype=np.uint8)
+        self.packed_bytes = memoryview(self.packed.reshape(-1))
+
+        # A full row in front of the unpacked bits becomes a floor under every
+        # plane, so the first filled cell of each column is always found
+        self.cells = np.ones((games, PLANES, COLUMNS + BOARD_BYTES * 8), np.uint8)
+        self.unpacked = self.cells[:, :, COLUMNS:].reshape(
+            games, PLANES, BOARD_BYTES, 8
+        )
+        floored = self.cells[:, :, CELLS + COLUMNS - 1 :: -1].reshape(
+            games, PLANES, ROWS + 1, COLUMNS
+        )
+
+        self.planes = floored[:, :, :ROWS]
+        self.board = self.planes[:, BOARD]
+        self.piece = self.planes[:, PIECE]
+        self.preview = self.planes[:, PREVIEW]
+
+        self.floored_board = floored[:, BOARD]
+        self.tops = np.zeros((games, COLUMNS), dtype=np.intp)
+        self.heights = np.zeros((games, COLUMNS), dtype=np.intp)
+
+    def set(
+        self,
+        game: int,
+        board: int,
+        piece: int = 0,
+        preview: Optional[Shapes] = None,
+    ):
+        """
+        Copies the bitboards of one game into its slot, ready for `update`
+        """
+        start = (game * PLANES) * BOARD_BYTES
+        for plane, bitboard in enumerate(
+            (board, piece & CELLS_MASK, PREVIEWS[preview] if preview else 0)
+        ):
+            offset = start + plane * BOARD_BYTES
+            self.packed_bytes[offset : offset + BOARD_BYTES] = bitboard.to_bytes(
+                BOARD_BYTES, "little"
+            )
+
+    def update(self):
+        """
+        Unpacks every game into the planes and measures the column heights
+        """
+        np.take(UNPACK_TABLE, self.packed, axis=0, out=self.unpacked)
+        np.argmax(self.floored_board, axis=1, out=self.tops)
+        np.subtract(ROWS, self.tops, out=self.heights)
+
+    def observe(
+        self, board: int, piece: int = 0, preview: Optional[Shapes] = None
+    ) -> np.ndarray:
+        """
+        Planes of a single game, in the first slot
+        """
+        self.set(0, board, piece, preview)
+        self.update()
+        return self.planes[0]
@@ -0,0 +1,484 @@
+"""
+Finds a sequence of placements that empties the board, using the pieces that
+are known ahead of time: the current piece, the preview queue and the stash.
+
+Every cell below the target height has to be filled before it can be cleared,
+so the search only places pieces inside that region, and a board is dropped
+before it is searched when the pieces left cannot finish it:
+
+- Pieces fill four cells each, and clearing a row removes as many cells as it
+  had to have filled, so the empty cells have to come in fours. A column that
+  is full all the way up splits the region for good, so this holds on either
+  side of it too.
+- Columns are coloured alternately, and a full row always has as many cells of
+  each colour, so the difference between the colours of the empty cells has to
+  be made up by pieces that cover more of one colour than the other.
+- Empty cells that are closed off from the top of the region are given up on.
+
+Blocks of three or four rows clear with the rows above dropping one row short
+(see `engine.LINE_FILTER_HEIGHTS`), which leaves an empty row behind and breaks
+the counting, so those clears are only taken when they empty the board. Giving
+up on them and on closed off cells can miss a rare solution, never return a
+wrong one.
+
+Placements that fill the lowest empty cell are tried first. On a board without
+overhangs every supported position can be dropped into, so placements come
+from a table of positions and only boards with overhangs search for the moves
+that reach them.
+
+Boards that cannot be cleared are remembered along with the pieces that were
+left, which stays valid as the queue advances, so a solver kept for a whole
+game gets faster over time. A search that runs out of budget is kept, and
+carries on where it stopped when it is asked about the same position again:
+
+    solver = PerfectClearSolver(height=4)
+    steps = solver.solve_matrix(matrix, budget=1 / FPS)
+    if steps is None and solver.timed_out:
+        ...  # ask again next frame
+"""
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Generator, List, Optional, Sequence, Set, Tuple
+
+from src.engine import (
+    FLOOR,
+    WALLS,
+    Piece,
+    clear_lines,
+    move_down,
+    move_left,
+    move_right,
+)
+from src.engine import orientations, rotate
+from src.settings import COLUMNS, ROWS
+from src.shapes import Shapes
+
+from utils.bitboard import lowest_bit_index
+
+if TYPE_CHECKING:
+    from src.tetriminos import Matrix
+
+EVEN_COLUMNS = sum(
+    1 << (row * COLUMNS + column)
+    for row in range(ROWS)
+    for column in range(0, COLUMNS, 2)
+)
+PLAYABLE_ROW = ((1 << COLUMNS) - 1) & ~(1 | 1 << (COLUMNS - 1))
+ROW_MASK = (1 << COLUMNS) - 1
+
+# The most a shape can change the difference between colours, in any rotation
+COLUMN_PARITY = {
+    Shapes.i: 4,
+    Shapes.j: 2,
+    Shapes.l: 2,
+    Shapes.t: 2,
+    Shapes.o: 0,
+    Shapes.s: 0,
+    Shapes.z: 0,
+}
+
+# Nodes searched between looks at the clock
+CLOCK_INTERVAL = 32
+
+# board, region height, stashed shape, shapes still to come
+SearchKey = Tuple[int, int, Optional[Shapes], Tuple[Shapes, ...]]
+Search = Generator[None, None, Optional[List["Step"]]]
+# Moving down, left, right and the rotations to try, without the board
+PieceMoves = Tuple[Optional[int], Optional[int], Optional[int], Tuple[Piece, ...]]
+
+
+@dataclass
+class Step:
+    shape: Shapes
+    rotation: int
+    placement: int
+    # Whether the stash is used to get the shape, before it is placed
+    stash: bool = False
+
+
+@lru_cache(maxsize=None)
+def region_mask(height: int) -> int:
+    """
+    The `height` rows that pieces rest on, above the floor row
+    """
+    mask = 0
+    for row in range(1, height + 1):
+        mask |= PLAYABLE_ROW << (row * COLUMNS)
+    return mask
+
+
+@lru_cache(maxsize=None)
+def region_columns(height: int) -> Tuple[int, ...]:
+    """
+    Each column of the region from right to left, as a mask
+    """
+    return tuple(
+        sum(1 << (row * COLUMNS + column) for row in range(1, height + 1))
+        for column in range(1, COLUMNS - 1)
+    )
+
+
+def has_overhang(board: int, height: int) -> bool:
+    """
+    Whether any empty cell of the region has a filled cell above it
+    """
+    covered = board
+    for _ in range(height):
+        covered |= covered >> COLUMNS
+    return covered & region_mask(height) & ~board > 0
+
+
+def enclosed(empty: int, height: int) -> bool:
+    """
+    Whether some empty cells cannot be reached from the top row of the region
+    without crossing filled cells
+    """
+    reached = empty & (PLAYABLE_ROW << (height * COLUMNS))
+    while True:
+        grown = (
+            reached
+            | reached >> COLUMNS
+            | reached << COLUMNS
+            | reached >> 1
+            | reached << 1
+        ) & empty
+        if grown == reached:
+            return reached != empty
+        reached = grown
+
+
+def uneven_sections(empty: int, height: int) -> bool:
+    """
+    Whether a full column splits off a part of the region whose empty cells
+    do not come in fours
+    """
+    cells = 0
+    for column in region_columns(height):
+        column_cells = empty & column
+        if not column_cells and cells:
+            if cells % 4:
+                return True
+            cells = 0
+        cells += bin(column_cells).count("1")
+    return cells % 4 > 0
+
+
+@lru_cache(maxsize=None)
+def region_positions(shape: Shapes, height: int) -> Tuple[Piece, ...]:
+    """
+    Every position of the shape that lies inside the bottom `height` rows,
+    whether or not anything holds it up
+    """
+    region = region_mask(height)
+    positions: Dict[int, int] = {}
+    for rotation, orientation in enumerate(orientations(shape)):
+        bottom = orientation >> (lowest_bit_index(orientation) // COLUMNS * COLUMNS)
+        for row in range(1, height + 1):
+            for column in range(COLUMNS):
+                # Positions that wrap round a row end up in the walls
+                piece = bottom << (row * COLUMNS + column)
+                if piece & region == piece:
+                    positions.setdefault(piece, rotation)
+    return tuple(sorted(positions.items()))
+
+
+@lru_cache(maxsize=65536)
+def region_placements(shape: Shapes, board: int, height: int) -> Tuple[Piece, ...]:
+    """
+    Every position the piece can lock in without sticking out of the bottom
+    `height` rows, lowest first.
+
+    Pieces start over the region in every rotation and column rather than at
+    the spawn position, which gives the same positions as long as nothing is
+    stacked above the region.
+    """
+    frontier: List[Piece] = []
+    for rotation, orientation in enumerate(orientations(shape)):
+        # Lowest cell on the row just above the region
+        shift = (height + 1 - lowest_bit_index(orientation) // COLUMNS) * COLUMNS
+        piece = orientation << shift if shift >= 0 else orientation >> -shift
+        for column in range(COLUMNS):
+            shifted = piece << column
+            if not shifted & (WALLS | board):
+                frontier.append((shifted, rotation))
+
+    seen = set(frontier)
+    locked: Dict[int, int] = {}
+    region = region_mask(height)
+    graph = move_graph(shape)
+    while frontier:
+        piece = frontier.pop()
+        moves = graph.get(piece)
+        if moves is None:
+            moves = graph[piece] = piece_moves(shape, piece)
+        down, left, right, turns = moves
+
+        bitboard, rotation = piece
+        candidates = []
+        if down is None or down & board:
+            if bitboard & region == bitboard:
+                locked.setdefault(bitboard, rotation)
+        else:
+            candidates.append((down, rotation))
+        if left is not None and not left & board:
+            candidates.append((left, rotation))
+        if right is not None and not right & board:
+            candidates.append((right, rotation))
+        for turned in turns:
+            if not turned[0] & board:
+                candidates.append(turned)
+                break
+
+        for candidate in candidates:
+            if candidate not in seen:
+                seen.add(candidate)
+                frontier.append(candidate)
+    return tuple(sorted((bitboard, rotation) for bitboard, rotation in locked.items()))
+
+
+@lru_cache(maxsize=None)
+def move_graph(shape: Shapes) -> Dict[Piece, PieceMoves]:
+    """
+    The moves out of each position of the shape that has been reached so far,
+    filled in by `region_placements` as it goes
+    """
+    return {}
+
+
+def piece_moves(shape: Shapes, piece: Piece) -> PieceMoves:
+    """
+    Where the engine moves a piece down, left, right and when rotating, on a
+    board with nothing but the walls and the floor. Rotations list the kicks in
+    the order they are tried, and the first one the board leaves free is taken
+    """
+    bitboard, rotation = piece
+    down = move_down(bitboard, 0)
+    left = move_left(bitboard, 0)
+    right = move_right(bitboard, 0)
+
+    turns: Tuple[Piece, ...] = ()
+    rotated = rotate(shape, piece, 0)
+    if rotated is not None:
+        turned, next_rotation = rotated
+        # Without a collision the engine never kicks, so the unkicked position
+        # is the first to try
+        unkicked = orientations(shape)[next_rotation] << (
+            lowest_bit_index(bitboard) - lowest_bit_index(orientations(shape)[rotation])
+        )
+        kicks = (unkicked, unkicked >> 1, unkicked << 1)
+        turns = tuple((kick, next_rotation) for kick in kicks if not kick & WALLS)
+    return down, left, right, turns
+
+
+def fast_placements(shape: Shapes, board: int, height: int) -> Tuple[Piece, ...]:
+    """
+    The same positions as `region_placements`. Without overhangs every empty
+    cell is open to the sky, so any position that is held up can be dropped into
+    """
+    if has_overhang(board, height):
+        return region_placements(shape, board, height)
+    below = board | FLOOR
+    return tuple(
+        (piece, rotation)
+        for piece, rotation in region_positions(shape, height)
+        if not piece & board and (piece >> COLUMNS) & below
+    )
+
+
+def full_rows(board: int, height: int) -> List[int]:
+    return [
+        row
+        for row in range(1, height + 1)
+        if (board >> (row * COLUMNS)) & ROW_MASK == PLAYABLE_ROW
+    ]
+
+
+class PerfectClearSolver:
+    def __init__(
+        self, height: int = 4, use_stash: bool = True, max_failed: int = 500_000
+    ):
+        self.height = height
+        self.use_stash = use_stash
+        self.max_failed = max_failed
+        self.failed: Set[SearchKey] = set()
+        self.nodes = 0
+        self.timed_out = False
+        # A search that ran out of budget, and the position it started from
+        self.paused: Optional[Search] = None
+        self.paused_key: Optional[SearchKey] = None
+
+    def solve(
+        self,
+        board: int,
+        shapes: Sequence[Shapes],
+        stashed: Optional[Shapes] = None,
+        budget: Optional[float] = None,
+    ) -> Optional[List[Step]]:
+        """
+        The placements that clear the board with `shapes` played in order, the
+        current piece first, or None when there are none. With a `budget` in
+        seconds the search may stop early, leaving `timed_out` set, and picks up
+        from there when asked about the same position again.
+        """
+        key = (board, self.height, stashed, tuple(shapes))
+        if key != self.paused_key:
+            self.discard()
+            self.nodes = 0
+            if board & ~region_mask(self.height):
+                self.timed_out = False
+                return None
+            if len(self.failed) > self.max_failed:
+                self.failed.clear()
+            self.paused = self.start(board, self.height, stashed, tuple(shapes))
+            self.paused_key = key
+
+        search = self.paused
+        deadline = time.perf_counter() + budget if budget else None
+        self.timed_out = False
+        try:
+            while True:
+                next(search)
+                if deadline and time.perf_counter() > deadline:
+                    self.timed_out = True
+                    return None
+        except StopIteration as done:
+            self.paused = self.paused_key = None
+            return done.value
+
+    def discard(self):
+        """
+        Drops a paused search
+        """
+        if self.paused:
+            self.paused.close()
+        self.paused = self.paused_key = None
+
+    def solve_matrix(
+        self, matrix: "Matrix", budget: Optional[float] = None
+    ) -> Optional[List[Step]]:
+        """
+        Solves from a game in progress, with its current piece, preview and stash
+        """
+        shapes = []
+        if matrix.tetrimino and not matrix.tetrimino.placed:
+            shapes.append(matrix.tetrimino.shape)
+        shapes.extend(matrix.shape_generator.preview())
+        stashed = matrix.stashed[0] if matrix.stashed else None
+        return self.solve(matrix.board.bitboard(), shapes, stashed, budget)
+
+    def options(
+        self, stashed: Optional[Shapes], shapes: Tuple[Shapes, ...]
+    ) -> List[Tuple[Shapes, Optional[Shapes], Tuple[Shapes, ...], bool]]:
+        """
+        The shapes that can be played next, with the stash and shapes left after
+        """
+        choices = []
+        if shapes:
+            choices.append((shapes[0], stashed, shapes[1:], False))
+        if not self.use_stash:
+            return choices
+        if stashed is None and len(shapes) > 1:
+            choices.append((shapes[1], shapes[0], shapes[2:], True))
+        elif stashed is not None and shapes and stashed != shapes[0]:
+            choices.append((stashed, shapes[0], shapes[1:], True))
+        elif stashed is not None and not shapes:
+            choices.append((stashed, None, (), True))
+        return choices
+
+    def start(
+        self,
+        board: int,
+        height: int,
+        stashed: Optional[Shapes],
+        shapes: Tuple[Shapes, ...],
+    ) -> Search:
+        if self.dead_end(board, height, stashed, shapes):
+            return None
+        return (yield from self.search(board, height, stashed, shapes))
+
+    def dead_end(
+        self,
+        board: int,
+        height: int,
+        stashed: Optional[Shapes],
+        shapes: Tuple[Shapes, ...],
+    ) -> bool:
+        """
+        Whether the board is known not to clear, or is seen not to before
+        searching it
+        """
+        self.nodes += 1
+        key = (board, height, stashed, shapes)
+        if key in self.failed:
+            return True
+
+        # Rows that clear only ever add cells to fill, so these hold for good
+        empty = region_mask(height) & ~board
+        cells = bin(empty).count("1")
+        pieces = len(shapes) + (stashed is not None)
+        even = bin(empty & EVEN_COLUMNS).count("1")
+        parity = sum(COLUMN_PARITY[shape] for shape in shapes)
+        if stashed is not None:
+            parity += COLUMN_PARITY[stashed]
+        if (
+            cells % 4
+            or cells > 4 * pieces
+            or abs(2 * even - cells) > parity
+            or uneven_sections(empty, height)
+            or enclosed(empty, height)
+        ):
+            self.failed.add(key)
+            return True
+        return False
+
+    def search(
+        self,
+        board: int,
+        height: int,
+        stashed: Optional[Shapes],
+        shapes: Tuple[Shapes, ...],
+    ) -> Search:
+        """
+        Searches a board that `dead_end` let through, yielding now and then so
+        the caller can stop and carry on later
+        """
+        if self.nodes % CLOCK_INTERVAL == 0:
+            yield
+
+        # The lowest empty cell has to be filled by some piece, so placements
+        # that fill it come first, then the ones lowest down
+        empty = region_mask(height) & ~board
+        lowest = empty & -empty
+        for shape, next_stashed, next_shapes, used_stash in self.options(
+            stashed, shapes
+        ):
+            placements = sorted(
+                fast_placements(shape, board, height),
+                key=lambda placed: (not placed[0] & lowest, placed[0].bit_length()),
+            )
+            for placement, rotation in placements:
+                step = Step(shape, rotation, placement, used_stash)
+                next_board = board | placement
+                cleared = full_rows(next_board, height)
+                next_height = height
+                if cleared:
+                    if len(cleared) == height:
+                        return [step]
+                    next_board, _ = clear_lines(next_board)
+                    # Three rows in a row clear short, see the module docstring
+                    if any(row + 2 in cleared for row in cleared if row + 1 in cleared):
+                        if next_board:
+                            continue
+                        return [step]
+                    next_height -= len(cleared)
+                if self.dead_end(next_board, next_height, next_stashed, next_shapes):
+                    continue
+                steps = yield from self.search(
+                    next_board, next_height, next_stashed, next_shapes
+                )
+                if steps is not None:
+                    return [step] + steps
+
+        self.failed.add((board, height, stashed, shapes))
+        return None
@@ -0,0 +1,177 @@
+"""
+Perft for the bitboard engine: counts every distinct board reachable after
+placing `depth` pieces from a seeded piece sequence.
+
+Locking and clearing runs on plain integers by default, or on one of the board
+backends that `Matrix` can use, to compare them on the same work.
+
+    python -m src.perft --seed 0 --depth 2 --stash
+    python -m src.perft --seed 0 --depth 2 --board rows
+"""
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Dict, List, Optional, Set, Tuple, Type
+
+from src.boards import BOARDS, Board
+from src.engine import clear_lines, is_game_over, placements
+from src.shapes import Shapes, shape_generator
+
+# board, stashed shape, index of the next shape in the sequence
+State = Tuple[int, Optional[Shapes], int]
+BoardState = Tuple[Board, Optional[Shapes], int]
+
+
+@dataclass
+class PerftResult:
+    seed: int
+    stash: bool
+    nodes: List[int] = field(default_factory=list)
+    states: List[int] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def nodes_per_second(self) -> float:
+        if not self.seconds:
+            return 0.0
+        return sum(self.nodes) / self.seconds
+
+    def counts(self) -> dict:
+        return {
+            "seed": self.seed,
+            "stash": self.stash,
+            "nodes": self.nodes,
+            "states": self.states,
+        }
+
+
+def options(
+    shapes: List[Shapes], stashed: Optional[Shapes], index: int, stash: bool
+) -> List[Tuple[Shapes, Optional[Shapes], int]]:
+    """
+    The shapes that can be played next, with the stash and queue position after
+    """
+    choices = [(shapes[index], stashed, index + 1)]
+    # Using the stash on an empty stash pulls one extra shape from the queue
+    if stash and stashed is None:
+        choices.append((shapes[index + 1], shapes[index], index + 2))
+    elif stash and stashed != shapes[index]:
+        choices.append((stashed, shapes[index], index + 1))
+    return choices
+
+
+def perft(
+    seed: int,
+    depth: int,
+    stash: bool = False,
+    board_type: Optional[Type[Board]] = None,
+) -> PerftResult:
+    if board_type:
+        return board_perft(seed, depth, stash, board_type)
+
+    shapes = list(islice(shape_generator(seed), depth * 2 + 1))
+    result = PerftResult(seed, stash)
+
+    states: Set[State] = {(0, None, 0)}
+    start = time.perf_counter()
+    for _ in range(depth):
+        nodes = 0
+        next_states: Set[State] = set()
+        for board, stashed, index in states:
+            for shape, next_stashed, next_index in options(
+                shapes, stashed, index, stash
+            ):
+                for bitboard in placements(shape, board):
+                    nodes += 1
+                    next_board, _ = clear_lines(board | bitboard)
+                    if is_game_over(next_board):
+                        continue
+                    next_states.add((next_board, next_stashed, next_index))
+
+        result.nodes.append(nodes)
+        result.states.append(len(next_states))
+        states = next_states
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def board_perft(
+    seed: int, depth: int, stash: bool, board_type: Type[Board]
+) -> PerftResult:
+    """
+    Same counts as `perft`, locking and clearing through a board backend
+    """
+    shapes = list(islice(shape_generator(seed), depth * 2 + 1))
+    result = PerftResult(seed, stash)
+
+    states: Dict[tuple, BoardState] = {(): (board_type(), None, 0)}
+    start = time.perf_counter()
+    for _ in range(depth):
+        nodes = 0
+        next_states: Dict[tuple, BoardState] = {}
+        for board, stashed, index in states.values():
+            occupied = board.bitboard()
+            for shape, next_stashed, next_index in options(
+                shapes, stashed, index, stash
+            ):
+                for bitboard in placements(shape, occupied):
+                    nodes += 1
+                    next_board = board.copy()
+                    next_board.lock(bitboard, 1)
+                    next_board.clear_lines()
+                    if next_board.is_game_over():
+                        continue
+                    key = (next_board.key(), next_stashed, next_index)
+                    if key not in next_states:
+                        next_states[key] = (next_board, next_stashed, next_index)
+
+        result.nodes.append(nodes)
+        result.states.append(len(next_states))
+        states = next_states
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--stash", action="store_true")
+    parser.add_argument(
+        "--board",
+        choices=sorted(BOARDS),
+        help="lock and clear through this board backend instead of plain integers",
+    )
+    parser.add_argument("--save", help="write the counts to a reference file")
+    parser.add_argument("--check", help="compare the counts to a reference file")
+    args = parser.parse_args(argv)
+
+    result = perft(
+        args.seed, args.depth, args.stash, BOARDS[args.board] if args.board else None
+    )
+    for depth, (nodes, states) in enumerate(zip(result.nodes, result.states), 1):
+        print(f"depth {depth}: {nodes} nodes, {states} distinct states")
+    print(f"{sum(result.nodes)} nodes in {result.seconds:.3f}s")
+    print(f"{result.nodes_per_second:.0f} nodes/s")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result.counts(), f, indent=2)
+
+    if args.check:
+        with open(args.check) as f:
+            reference = json.load(f)
+        if reference != result.counts():
+            print(f"counts differ from {args.check}: {reference}")
+            return 1
+        print(f"counts match {args.check}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
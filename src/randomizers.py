@@ -0,0 +1,204 @@
+"""
+Piece randomizers and the queue that previews their pieces.
+
+Every randomizer draws from its own `random.Random`, and `snapshot` captures
+that state along with whatever the randomizer remembers, such as the rest of
+the current bag, so a sequence can be rewound and played again:
+
+    randomizer = RANDOMIZERS["tgm"](seed=3)
+    snapshot = randomizer.snapshot()
+    first = randomizer.take(1000)
+    randomizer.restore(snapshot)
+    assert randomizer.take(1000) == first
+
+`ShapeQueue` keeps upcoming shapes in a ring buffer, so peeking at any of the
+next pieces is a single index and drawing one never shifts the rest.
+"""
+import random
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from src.shapes import Shapes
+
+SHAPES = list(Shapes)
+
+Snapshot = Tuple[Any, Any]  # state of the random generator, state of the randomizer
+
+
+class Randomizer(ABC):
+    def __init__(self, seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+
+    @abstractmethod
+    def take(self, count: int) -> List[Shapes]:
+        """
+        The next `count` shapes
+        """
+
+    @abstractmethod
+    def get_state(self) -> Any:
+        pass
+
+    @abstractmethod
+    def set_state(self, state: Any):
+        pass
+
+    def snapshot(self) -> Snapshot:
+        return self.rng.getstate(), self.get_state()
+
+    def restore(self, snapshot: Snapshot):
+        rng_state, state = snapshot
+        self.rng.setstate(rng_state)
+        self.set_state(state)
+
+
+class BagRandomizer(Randomizer):
+    """
+    Deals every shape `copies` times in a shuffled bag before starting the next
+    """
+
+    copies = 1
+
+    def __init__(self, seed: Optional[int] = None):
+        super().__init__(seed)
+        self.bag: List[Shapes] = []
+        self.position = 0
+
+    def take(self, count: int) -> List[Shapes]:
+        shapes: List[Shapes] = []
+        while len(shapes) < count:
+            if self.position == len(self.bag):
+                self.bag = SHAPES * self.copies
+                self.rng.shuffle(self.bag)
+                self.position = 0
+            end = min(len(self.bag), self.position + count - len(shapes))
+            shapes += self.bag[self.position : end]
+            self.position = end
+        return shapes
+
+    def get_state(self) -> Any:
+        return list(self.bag), self.position
+
+    def set_state(self, state: Any):
+        bag, self.position = state
+        self.bag = list(bag)
+
+
+class DoubleBagRandomizer(BagRandomizer):
+    copies = 2
+
+
+class HistoryRandomizer(Randomizer):
+    """
+    The Grand Master randomizer: rolls up to `rolls` times for a shape that is
+    not among the last four dealt. The history starts as four Zs, and the first
+    piece is never an S, Z or O
+    """
+
+    rolls = 4
+
+    def __init__(self, seed: Optional[int] = None):
+        super().__init__(seed)
+        self.history = [Shapes.z] * 4
+        self.first = True
+
+    def take(self, count: int) -> List[Shapes]:
+        shapes = []
+        choice = self.rng.choice
+        for _ in range(count):
+            if self.first:
+                shape = choice([Shapes.i, Shapes.j, Shapes.l, Shapes.t])
+                self.first = False
+            else:
+                for _ in range(self.rolls):
+                    shape = choice(SHAPES)
+                    if shape not in self.history:
+                        break
+            self.history = self.history[1:] + [shape]
+            shapes.append(shape)
+        return shapes
+
+    def get_state(self) -> Any:
+        return list(self.history), self.first
+
+    def set_state(self, state: Any):
+        history, self.first = state
+        self.history = list(history)
+
+
+RANDOMIZERS: Dict[str, Type[Randomizer]] = {
+    "7-bag": BagRandomizer,
+    "14-bag": DoubleBagRandomizer,
+    "tgm": HistoryRandomizer,
+}
+
+
+class ShapeQueue:
+    """
+    The next `preview` shapes, and more once asked for, in a ring buffer that
+    refills from the randomizer a bag at a time
+    """
+
+    def __init__(self, randomizer: Randomizer, preview: int = 7, refill: int = 7):
+        self.randomizer = randomizer
+        self.refill = refill
+        capacity = 1
+        while capacity < preview + refill:
+            capacity *= 2
+        self.buffer: List[Optional[Shapes]] = [None] * capacity
+        self.mask = capacity - 1
+        self.head = 0
+        self.count = 0
+        self.fill(preview)
+
+    def fill(self, count: int):
+        """
+        Makes sure at least `count` shapes are buffered, growing the buffer if
+        they would not fit
+        """
+        if count <= self.count:
+            return
+        needed = max(count - self.count, self.refill)
+        if self.count + needed > len(self.buffer):
+            self.grow(self.count + needed)
+        mask = self.mask
+        tail = self.head + self.count
+        for offset, shape in enumerate(self.randomizer.take(needed)):
+            self.buffer[(tail + offset) & mask] = shape
+        self.count += needed
+
+    def grow(self, count: int):
+        capacity = len(self.buffer)
+        while capacity < count:
+            capacity *= 2
+        self.buffer = self.preview(self.count) + [None] * (capacity - self.count)
+        self.mask = capacity - 1
+        self.head = 0
+
+    def peek(self, index: int = 0) -> Shapes:
+        """
+        The shape `index` places down the queue, 0 being the next one
+        """
+        self.fill(index + 1)
+        return self.buffer[(self.head + index) & self.mask]  # type: ignore
+
+    def preview(self, count: int) -> List[Shapes]:
+        self.fill(count)
+        start = self.head
+        end = start + count
+        if end <= len(self.buffer):
+            return self.buffer[start:end]  # type: ignore
+        return self.buffer[start:] + self.buffer[: end & self.mask]  # type: ignore
+
+    def pop(self) -> Shapes:
+        self.fill(1)
+        shape = self.buffer[self.head]
+        self.head = (self.head + 1) & self.mask
+        self.count -= 1
+        return shape  # type: ignore
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Shapes:
+        return self.pop()
@@ -0,0 +1,41 @@
+import json
+from dataclasses import dataclass, field
+from typing import List
+
+
+@dataclass
+class Replay:
+    """
+    The seed of a game and the inputs played on every frame, which is enough to
+    play the game back exactly
+    """
+
+    seed: int
+    frames: List[List[str]] = field(default_factory=list)
+    randomizer: str = "7-bag"
+    mode: str = "snes"
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "seed": self.seed,
+                    "randomizer": self.randomizer,
+                    "mode": self.mode,
+                    "frames": self.frames,
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "Replay":
+        with open(path) as f:
+            data = json.load(f)
+        # Replays saved before randomizers and modes could be picked all used
+        # bags of 7 and SNES scoring
+        return cls(
+            data["seed"],
+            data["frames"],
+            data.get("randomizer", "7-bag"),
+            data.get("mode", "snes"),
+        )
@@ -0,0 +1,420 @@
+import getpass
+import random
+
+import pygame
+
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, ClassVar, List, Tuple, Type, Dict, Any, Optional
+from dataclasses import dataclass
+from abc import ABC, abstractmethod
+
+from src.engine import FLOOR, WALLS, Inputs, TSpin, t_spin
+from src.layout import layout
+from src.levels import MODES
+from src.replay import Replay
+from src.shapes import Shapes
+
+from src.tetriminos import (
+    Matrix,
+    TetriminoDisplay,
+    TetriminoQueue,
+    Text,
+    ReactiveText,
+    WidgetRegistry,
+)
+
+from src.settings import (
+    COLUMNS,
+    FPS,
+    SCORES_PATH,
+)
+
+from utils.animation import animator
+from utils.assets import AssetCache, AssetKey
+from utils.fonts import build_font, read_font
+from utils.metrics import metrics
+
+if TYPE_CHECKING:
+    # Imported once they are used, so starting a game does not wait on them:
+    # spectating pulls in asyncio, particles NumPy and scores sqlite3
+    from src.effects import ParticleSystem
+    from src.scores import Score
+    from src.spectate import BackgroundBroadcast
+
+
+# Shared by every scene, so a font loaded for one scene is there for the next
+assets = AssetCache({"font": read_font}, {"font": build_font})
+
+
+def calculate_score(lines_cleared: List[int]) -> int:
+    total_score = 0
+    for i in lines_cleared:
+        total_score += int(2 ** (i - 1) * 1000)
+    return total_score
+
+
+@dataclass
+class Scene(ABC):
+    screen: pygame.display
+
+    # Attributes set from the shared asset cache by `init_assets`
+    required_assets: ClassVar[Dict[str, AssetKey]] = {}
+    # Keys of the scenes that can follow this one, preloaded while it runs
+    next_scenes: ClassVar[Tuple[str, ...]] = ()
+
+    def __post_init__(self):
+        self.mouse = WidgetRegistry()
+        self.init_assets()
+        self.init_state()
+        self.init_widgets()
+        self.clock = pygame.time.Clock()
+        self.running = True
+
+    def run(self):
+        while self.running:
+            next_scene, params = self.update()
+            if next_scene:
+                return next_scene, params
+            animator.update(pygame.time.get_ticks())
+            self.render()
+            pygame.display.flip()
+            self.clock.tick(FPS)
+        return None, None
+
+    def init_widgets(self):
+        pass
+
+    def init_state(self):
+        pass
+
+    def init_assets(self):
+        for name, key in self.required_assets.items():
+            setattr(self, name, assets.get(key))
+
+    def handle_event(self, event):
+        self.mouse.dispatch(event)
+        if event.type == pygame.VIDEORESIZE:
+            layout.resize(event.size)
+
+    def update(self) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        for event in pygame.event.get():
+            self.handle_event(event)
+            if event.type == pygame.KEYDOWN:
+                if event.key in {pygame.K_ESCAPE, ord("q")}:
+                    self.running = False
+        return None, None
+
+    @abstractmethod
+    def render(self):
+        pass
+
+
+KEY_BINDINGS = {
+    pygame.K_LEFT: Inputs.left,
+    pygame.K_RIGHT: Inputs.right,
+    pygame.K_DOWN: Inputs.down,
+    pygame.K_SPACE: Inputs.drop,
+    pygame.K_UP: Inputs.rotate,
+    ord("a"): Inputs.rotate_back,
+    pygame.K_RETURN: Inputs.stash,
+}
+
+
+@dataclass
+class GameScene(Scene):
+    spectators: Optional["BackgroundBroadcast"] = None
+    seed: Optional[int] = None
+    randomizer: str = "7-bag"
+    mode: str = "snes"
+
+    required_assets = {"font": ("font", "monospace", 34)}
+    next_scenes = ("game_over",)
+
+    def init_widgets(self):
+        if self.seed is None:
+            self.seed = random.randrange(2 ** 32)
+        self.replay = Replay(self.seed, randomizer=self.randomizer, mode=self.mode)
+        self.shape_generator = TetriminoQueue(self.seed, self.randomizer)
+        self.stashed_tetrimino = TetriminoDisplay(self.screen, (400, 100))
+        self.matrix = Matrix(self.screen, (400, 260), self.shape_generator)
+        # Made at the first line clear, which is the first time it draws anything
+        self.particles: Optional["ParticleSystem"] = None
+        self.next_tetrimino = TetriminoDisplay(self.screen, (720, 100))
+        self.score_text = ReactiveText(
+            self.screen, (560, 100), (160, 60), self.font, "0"
+        )
+        self.level_text = Text(
+            self.screen, (560, 160), (160, 60), self.font, f"Level {self.level}"
+        )
+
+        self.mouse.register(self.score_text)
+
+    def init_state(self):
+        self.running = True
+        self.can_stash = True
+        self.locked = False
+        self.total_score = 0
+        self.lines_cleared = 0
+        self.rules = MODES[self.mode]
+        # Whether the last move of the active piece was a rotation, for T-spins
+        self.rotated = False
+        self.soft_drops = 0
+        self.hard_drops = 0
+        # Clears in a row so far, -1 once a piece clears nothing
+        self.combo = -1
+        self.back_to_back = False
+
+        self.start_time = pygame.time.get_ticks()
+
+    @property
+    def level(self) -> int:
+        return self.rules.level(self.lines_cleared)
+
+    def update(self):
+        actions: List[Inputs] = []
+        if not self.locked:
+            for event in pygame.event.get():
+                self.handle_event(event)
+                if event.type == pygame.KEYDOWN:
+                    if event.key in {pygame.K_ESCAPE, ord("q")}:
+                        self.running = False
+                    if event.key in KEY_BINDINGS:
+                        actions.append(KEY_BINDINGS[event.key])
+
+            if pygame.time.get_ticks() - self.start_time > self.rules.ticks(self.level):
+                actions.append(Inputs.gravity)
+                self.start_time = pygame.time.get_ticks()
+
+        else:
+            actions.append(Inputs.down)
+
+        return self.step(actions)
+
+    def step(self, actions: List[Inputs]):
+        """
+        Plays one frame worth of inputs, which is all a replay needs to record
+        """
+        self.replay.frames.append([action.value for action in actions])
+        self.next_tetrimino.set_tetrimino(*self.shape_generator.peek())
+
+        active_tetrimino = self.matrix.get_tetrimino()
+        for action in actions:
+            before = active_tetrimino.bitboard
+            if action is Inputs.left:
+                self.matrix.move_left()
+            elif action is Inputs.right:
+                self.matrix.move_right()
+            elif action in (Inputs.down, Inputs.gravity):
+                self.matrix.move_down()
+            elif action is Inputs.drop:
+                self.locked = True
+            elif action is Inputs.rotate:
+                self.matrix.rotate()
+            elif action is Inputs.rotate_back:
+                self.matrix.rotate(-1)
+            elif action is Inputs.stash and self.can_stash:
+                self.can_stash = False
+                stash = self.matrix.stash()
+                self.stashed_tetrimino.set_tetrimino(*stash)
+            if active_tetrimino.bitboard != before:
+                self.rotated = action in (Inputs.rotate, Inputs.rotate_back)
+                if self.locked and action is Inputs.down:
+                    self.hard_drops += 1
+                elif action is Inputs.down:
+                    self.soft_drops += 1
+
+        if active_tetrimino.placed:
+            self.locked = False
+            self.can_stash = True
+            tspin = TSpin.none
+            if active_tetrimino.shape is Shapes.t and self.rotated:
+                board = self.matrix.get_full_board() | WALLS | FLOOR
+                tspin = t_spin(active_tetrimino.bitboard, board)
+            cleared = self.matrix.full_row_cells()
+            self.matrix.clear_lines()
+            # `clear_lines` returns how far the rows above dropped, which is one
+            # short for blocks of three and four rows
+            self.score_piece(len(cleared) // (COLUMNS - 2), tspin)
+            if cleared:
+                if self.particles is None:
+                    from src.effects import ParticleSystem
+
+                    self.particles = ParticleSystem(seed=self.seed)
+                indices, colors = zip(*cleared)
+                self.particles.burst(self.matrix.cell_centers(indices), colors)
+        # A fixed step keeps replays drawn headless identical to the game
+        if self.particles is not None:
+            self.particles.step(1 / FPS)
+
+        if self.spectators:
+            self.publish()
+
+        if self.matrix.is_game_over():
+            self.running = False
+            if metrics.enabled:
+                metrics.end_game()
+            return "game_over", {
+                "score": self.total_score,
+                "lines": self.lines_cleared,
+                "level": self.level,
+                "mode": self.mode,
+            }
+
+        return None, None
+
+    def score_piece(self, lines: int, tspin: TSpin):
+        """
+        Adds the points for the piece that just locked and cleared `lines` rows
+        """
+        self.lines_cleared += lines
+        self.combo = self.combo + 1 if lines else -1
+        points = self.rules.score(
+            lines,
+            self.soft_drops,
+            self.level,
+            tspin=tspin,
+            combo=max(self.combo, 0),
+            back_to_back=self.back_to_back,
+            hard_drops=self.hard_drops,
+        )
+        if lines:
+            self.back_to_back = self.rules.is_difficult(lines, tspin)
+        self.rotated = False
+        self.soft_drops = 0
+        self.hard_drops = 0
+
+        if points:
+            self.total_score += points
+            self.score_text.set_text(self.total_score)
+        if lines:
+            self.level_text.set_text(f"Level {self.level}")
+
+    def publish(self):
+        from src.spectate import GameState
+
+        tetrimino = self.matrix.tetrimino
+        state = GameState(
+            self.matrix.get_full_board(),
+            score=self.total_score,
+            level=self.level,
+        )
+        if tetrimino and not tetrimino.placed:
+            state.shape = tetrimino.shape
+            state.rotation = tetrimino.rotation
+            state.piece = tetrimino.bitboard
+        self.spectators.publish(state)
+
+    def render(self):
+        self.screen.fill((0, 0, 0))
+
+        self.screen.blits(
+            self.matrix.blits()
+            + self.stashed_tetrimino.blits()
+            + self.next_tetrimino.blits()
+            + (self.particles.blits() if self.particles is not None else []),
+            doreturn=False,
+        )
+        self.score_text.render()
+        self.level_text.render()
+        if metrics.enabled:
+            metrics.end_frame(stack_height=self.matrix.stack_height(), level=self.level)
+
+
+@dataclass
+class GameOverScene(Scene):
+    score: int
+    lines: int = 0
+    level: int = 0
+    mode: str = "snes"
+
+    required_assets = {
+        "font": ("font", "monospace", 50),
+        "small_font": ("font", "monospace", 24),
+    }
+
+    def init_state(self):
+        # Saving goes to disk, so it runs on the asset worker and the scores
+        # show up once it is done instead of holding up the first frame
+        self.saved: Future = assets.submit(self.save_score)
+        self.rank_text: Optional[Text] = None
+        self.high_score_texts: List[Text] = []
+
+    def save_score(self) -> Tuple[int, List["Score"]]:
+        from src.scores import Score, ScoreStore
+
+        with ScoreStore(SCORES_PATH) as store:
+            store.add(
+                Score(getpass.getuser(), self.mode, self.score, self.lines, self.level)
+            )
+            store.flush()
+            return store.rank(self.mode, self.score), store.top(self.mode, 5)
+
+    def init_widgets(self):
+        self.game_over = ReactiveText(
+            self.screen, (500, 500), (160, 120), self.font, "GAME OVER"
+        )
+        self.score_text = Text(
+            self.screen, (500, 700), (160, 120), self.font, str(self.score)
+        )
+        self.mouse.register(self.game_over)
+
+    def show_scores(self):
+        try:
+            rank, high_scores = self.saved.result()
+        except Exception:
+            # A score that could not be saved is no reason to stop the game
+            self.rank_text = Text(
+                self.screen,
+                (500, 820),
+                (160, 60),
+                self.small_font,
+                "scores unavailable",
+            )
+            return
+        self.rank_text = Text(
+            self.screen, (500, 820), (160, 60), self.small_font, f"Rank {rank}"
+        )
+        self.high_score_texts = [
+            Text(
+                self.screen,
+                (900, 500 + i * 60),
+                (300, 60),
+                self.small_font,
+                f"{high_score.player[:10]:<10} {high_score.score:>8}",
+            )
+            for i, high_score in enumerate(high_scores)
+        ]
+
+    def update(self):
+        if not self.rank_text and self.saved.done():
+            self.show_scores()
+        return super().update()
+
+    def render(self):
+        self.game_over.render()
+        self.score_text.render()
+        if self.rank_text:
+            self.rank_text.render()
+        for high_score_text in self.high_score_texts:
+            high_score_text.render()
+
+
+class SceneManager:
+    """
+    Builds scenes by key. While a scene runs, the assets of every scene that
+    can follow it are loaded on the asset worker, so switching to the next one
+    only has to lay out its widgets
+    """
+
+    def __init__(self, screen: pygame.Surface, scenes: Dict[str, Type[Scene]]):
+        self.screen = screen
+        self.scenes = scenes
+
+    def preload(self, key: str) -> List[Future]:
+        return assets.preload(*self.scenes[key].required_assets.values())
+
+    def switch(self, key: str, params: Optional[Dict[str, Any]] = None) -> Scene:
+        scene = self.scenes[key](self.screen, **(params or {}))
+        for next_key in scene.next_scenes:
+            self.preload(next_key)
+        return scene
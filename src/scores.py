@@ -0,0 +1,150 @@
+"""
+Persistent high scores on SQLite.
+
+Scores are written in batches inside a single transaction, which also bumps
+per-mode counts of scores in buckets of `BUCKET_SIZE` points, so a rank only
+needs to add up the buckets above a score instead of counting every better game.
+"""
+import os
+import sqlite3
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+BUCKET_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    lines INTEGER NOT NULL DEFAULT 0,
+    level INTEGER NOT NULL DEFAULT 0,
+    date REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_mode_score ON scores (mode, score DESC);
+CREATE INDEX IF NOT EXISTS scores_player_date ON scores (player, date DESC);
+CREATE INDEX IF NOT EXISTS scores_player_mode_score
+    ON scores (player, mode, score DESC);
+
+CREATE TABLE IF NOT EXISTS score_buckets (
+    mode TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (mode, bucket)
+) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class Score:
+    player: str
+    mode: str
+    score: int
+    lines: int = 0
+    level: int = 0
+    date: float = 0.0
+
+
+class ScoreStore:
+    def __init__(self, path: str, batch_size: int = 1000):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.batch_size = batch_size
+        self.pending: List[Tuple] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def add(self, score: Score):
+        """
+        Queues a score, writing the queue out once it reaches `batch_size`
+        """
+        self.pending.append(
+            (
+                score.player,
+                score.mode,
+                score.score,
+                score.lines,
+                score.level,
+                score.date or time.time(),
+            )
+        )
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, scores: Iterable[Score]):
+        for score in scores:
+            self.add(score)
+        self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        buckets = Counter((row[1], row[2] // BUCKET_SIZE) for row in self.pending)
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO scores (player, mode, score, lines, level, date) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                self.pending,
+            )
+            self.connection.executemany(
+                "INSERT INTO score_buckets (mode, bucket, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (mode, bucket) "
+                "DO UPDATE SET count = count + excluded.count",
+                [(mode, bucket, count) for (mode, bucket), count in buckets.items()],
+            )
+        self.pending = []
+
+    def top(self, mode: str, n: int = 10) -> List[Score]:
+        rows = self.connection.execute(
+            "SELECT player, mode, score, lines, level, date FROM scores "
+            "WHERE mode = ? ORDER BY score DESC LIMIT ?",
+            (mode, n),
+        )
+        return [Score(*row) for row in rows]
+
+    def rank(self, mode: str, score: int) -> int:
+        """
+        1 + the number of games in this mode that scored strictly higher
+        """
+        bucket = score // BUCKET_SIZE
+        (above,) = self.connection.execute(
+            "SELECT COALESCE(SUM(count), 0) FROM score_buckets "
+            "WHERE mode = ? AND bucket > ?",
+            (mode, bucket),
+        ).fetchone()
+        (within,) = self.connection.execute(
+            "SELECT COUNT(*) FROM scores WHERE mode = ? AND score > ? AND score < ?",
+            (mode, score, (bucket + 1) * BUCKET_SIZE),
+        ).fetchone()
+        return above + within + 1
+
+    def personal_best(self, player: str, mode: str) -> Optional[Score]:
+        row = self.connection.execute(
+            "SELECT player, mode, score, lines, level, date FROM scores "
+            "WHERE player = ? AND mode = ? ORDER BY score DESC LIMIT 1",
+            (player, mode),
+        ).fetchone()
+        return Score(*row) if row else None
+
+    def recent(self, player: str, n: int = 10) -> List[Score]:
+        rows = self.connection.execute(
+            "SELECT player, mode, score, lines, level, date FROM scores "
+            "WHERE player = ? ORDER BY date DESC LIMIT ?",
+            (player, n),
+        )
+        return [Score(*row) for row in rows]
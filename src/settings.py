@@ -7,4 +7,6 @@ SMALL_TILE_SIZE = SMALL_TILE_WIDTH, SMALL_TILE_HEIGHT = 20, 20
 SIZE = WIDTH, HEIGHT = COLUMNS * TILE_WIDTH, ROWS * TILE_HEIGHT
 FPS = 60
 
+SCORES_PATH = os.path.join(os.path.expanduser("~"), ".tetris.py", "scores.sqlite3")
+
 DEBUG = False
@@ -0,0 +1,72 @@
+import random
+from enum import Enum
+from typing import Dict, Iterator, List, Optional
+
+
+class Shapes(Enum):
+    i = "i"
+    j = "j"
+    l = "l"
+    o = "o"
+    s = "s"
+    t = "t"
+    z = "z"
+
+
+tetriminos: Dict[Shapes, List[List[int]]] = {
+    Shapes.i: [
+        [0, 0, 0, 0],
+        [1, 1, 1, 1],
+        [0, 0, 0, 0],
+        [0, 0, 0, 0],
+    ],
+    Shapes.j: [
+        [0, 0, 1],
+        [1, 1, 1],
+        [0, 0, 0],
+    ],
+    Shapes.l: [
+        [1, 0, 0],
+        [1, 1, 1],
+        [0, 0, 0],
+    ],
+    Shapes.o: [
+        [1, 1],
+        [1, 1],
+    ],
+    Shapes.s: [
+        [0, 1, 1],
+        [1, 1, 0],
+        [0, 0, 0],
+    ],
+    Shapes.t: [
+        [0, 1, 0],
+        [1, 1, 1],
+        [0, 0, 0],
+    ],
+    Shapes.z: [
+        [1, 1, 0],
+        [0, 1, 1],
+        [0, 0, 0],
+    ],
+}
+
+trimmed_tetriminos: Dict[Shapes, List[List[int]]] = {}
+for key, arrangement in tetriminos.items():
+    trimmed_tetriminos[key] = [row for row in arrangement if sum(row) > 0]
+
+tetriminos_widths: Dict[Shapes, int] = {}
+for key, arrangement in tetriminos.items():
+    tetriminos_widths[key] = len(arrangement[0])
+
+tetriminos_height: Dict[Shapes, int] = {}
+for key, arrangement in trimmed_tetriminos.items():
+    tetriminos_height[key] = len(arrangement)
+
+
+def shape_generator(seed: Optional[int] = None) -> Iterator[Shapes]:
+    rng = random.Random(seed)
+    while True:
+        bag = list(Shapes)
+        rng.shuffle(bag)
+        yield from bag
@@ -0,0 +1,201 @@
+"""
+Broadcasts a running game to any number of spectators.
+
+Every tick is encoded once into a small binary frame, either a keyframe with
+the whole board or a delta with the board XORed against the previous tick, and
+the same bytes object is queued for every subscriber. Each subscriber only
+holds the latest unsent frame: a consumer that falls behind has its stale frame
+replaced with a keyframe, so it catches up without breaking the delta chain.
+"""
+import asyncio
+import struct
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from src.engine import orientations
+from src.settings import COLUMNS, ROWS
+from src.shapes import Shapes
+
+from utils.bitboard import lowest_bit_index
+
+KEYFRAME = 1
+DELTA = 2
+
+LENGTH = struct.Struct("!H")
+HEADER = struct.Struct("!BIIHBBH")  # kind, tick, score, level, shape, rotation, piece
+BOARD_BYTES = (COLUMNS * ROWS + 7) // 8
+SHAPES = list(Shapes)
+NO_PIECE = 255
+
+
+@dataclass
+class GameState:
+    board: int = 0
+    shape: Optional[Shapes] = None
+    rotation: int = 0
+    piece: int = 0
+    score: int = 0
+    level: int = 0
+
+
+def encode(kind: int, tick: int, state: GameState, previous_board: int) -> bytes:
+    shape = SHAPES.index(state.shape) if state.shape else NO_PIECE
+    piece = lowest_bit_index(state.piece) if state.piece else 0
+    header = HEADER.pack(
+        kind, tick, state.score, state.level, shape, state.rotation, piece
+    )
+    if kind == KEYFRAME:
+        board = state.board.to_bytes(BOARD_BYTES, "little")
+    else:
+        changed = state.board ^ previous_board
+        changed_bytes = changed.to_bytes((changed.bit_length() + 7) // 8, "little")
+        board = bytes([len(changed_bytes)]) + changed_bytes
+    frame = header + board
+    return LENGTH.pack(len(frame)) + frame
+
+
+class Subscriber:
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.pending: Optional[bytes] = None
+        self.needs_keyframe = True
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def offer(self, delta: bytes, keyframe: bytes):
+        if self.pending is not None:
+            # The previous frame never went out, so the chain is broken
+            self.dropped += 1
+            self.needs_keyframe = True
+        self.pending = keyframe if self.needs_keyframe else delta
+        self.needs_keyframe = False
+        self.ready.set()
+
+    async def run(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            frame, self.pending = self.pending, None
+            self.writer.write(frame)
+            await self.writer.drain()
+
+
+class SpectatorBroadcast:
+    def __init__(self, keyframe_interval: int = 120):
+        self.keyframe_interval = keyframe_interval
+        self.subscribers: List[Subscriber] = []
+        self.tick = 0
+        self.board = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        tasks = [subscriber.task for subscriber in self.subscribers]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        subscriber = Subscriber(writer)
+        subscriber.task = asyncio.current_task()
+        self.subscribers.append(subscriber)
+        try:
+            await subscriber.run()
+        except ConnectionError:
+            pass
+        finally:
+            self.subscribers.remove(subscriber)
+            writer.close()
+
+    def publish(self, state: GameState):
+        """
+        Encodes the tick once and hands the same buffer to every subscriber
+        """
+        self.tick += 1
+        keyframe = b""
+        if self.tick % self.keyframe_interval == 0 or any(
+            subscriber.needs_keyframe or subscriber.pending is not None
+            for subscriber in self.subscribers
+        ):
+            keyframe = encode(KEYFRAME, self.tick, state, self.board)
+        if self.tick % self.keyframe_interval == 0:
+            delta = keyframe
+        else:
+            delta = encode(DELTA, self.tick, state, self.board)
+        self.board = state.board
+
+        for subscriber in self.subscribers:
+            subscriber.offer(delta, keyframe)
+
+
+class BackgroundBroadcast:
+    """
+    Runs a `SpectatorBroadcast` on its own event loop thread so that the
+    synchronous game loop can publish to it
+    """
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 0, **kwargs):
+        self.broadcast = SpectatorBroadcast(**kwargs)
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def serve():
+            asyncio.set_event_loop(self.loop)
+            self.port = self.loop.run_until_complete(self.broadcast.start(host, port))
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=serve, daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def publish(self, state: GameState):
+        self.loop.call_soon_threadsafe(self.broadcast.publish, state)
+
+    def close(self):
+        future = asyncio.run_coroutine_threadsafe(self.broadcast.close(), self.loop)
+        future.result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class SpectatorView:
+    """
+    Rebuilds the game state from a stream of frames
+    """
+
+    def __init__(self):
+        self.tick = 0
+        self.state = GameState()
+        self.synced = False
+
+    def apply(self, frame: bytes):
+        kind, tick, score, level, shape, rotation, piece = HEADER.unpack_from(frame)
+        body = frame[HEADER.size :]
+        if kind == KEYFRAME:
+            board = int.from_bytes(body, "little")
+            self.synced = True
+        elif self.synced:
+            board = self.state.board ^ int.from_bytes(body[1 : 1 + body[0]], "little")
+        else:
+            return
+
+        self.tick = tick
+        self.state = GameState(board, score=score, level=level)
+        if shape != NO_PIECE:
+            orientation = orientations(SHAPES[shape])[rotation]
+            self.state.shape = SHAPES[shape]
+            self.state.rotation = rotation
+            self.state.piece = orientation << (piece - lowest_bit_index(orientation))
+
+    async def follow(self, reader: asyncio.StreamReader) -> Tuple[int, GameState]:
+        (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+        self.apply(await reader.readexactly(length))
+        return self.tick, self.state
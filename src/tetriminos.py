@@ -1,16 +1,28 @@
-import random
+from functools import lru_cache
 from itertools import cycle
-from typing import List, Optional, Dict, Tuple, Callable
+from typing import Iterable, List, Optional, Dict, Sequence, Tuple, Type, Callable
 from dataclasses import dataclass
 from abc import abstractmethod, ABC
 import logging
-from enum import Enum
 
 import pygame
+from pygame.rect import Rect
 from pygame.surface import Surface
 
+from src.boards import FULL_ROW, GARBAGE_COLOR, ROW_MASK, Board, IntBoard, garbage_rows
+from src.engine import WALLS, orientations
+
+from src.randomizers import RANDOMIZERS, ShapeQueue
+from src.shapes import (
+    Shapes,
+    tetriminos,
+    tetriminos_height,
+    tetriminos_widths,
+)
+
+from src.layout import layout
+
 from src.settings import (
-    SIZE,
     COLUMNS,
     ROWS,
     TILE_SIZE,
@@ -27,165 +39,196 @@ from utils.draw import (
 
 from utils.bitboard import (
     arrangement_to_bit,
-    bitboard_height,
-    bitboard_to_coords,
     bottom_border,
+    bit_indices,
     decompose_bits,
-    left_border,
-    right_border,
+    lowest_bit_index,
     rotate_bitboard,
-    top_border,
     widen_bitboard_width,
 )
 
-from utils.interpolation import (
-    clamp,
-    incomplete_perimeter_points,
+from utils.animation import (
+    PerimeterPath,
+    Tween,
+    animator,
+    easing_table,
 )
 
-from utils.easing import ease_in_sine
+from utils.metrics import metrics
+
+from utils.interpolation import clamp
+from utils.spatial import SpatialHash
 
-# Load assets
-background_path = asset_resource_path("Board.png")
-background = pygame.image.load(background_path)
-background = pygame.transform.scale(background, SIZE)
+from utils.easing import ease_in_sine
 
+# Load assets, at their original size
 COLORS = ["Blue", "Green", "LightBlue", "Orange", "Purple", "Red", "Yellow"]
-tiles = {}
-ghost_tiles = {}
-small_tiles = {}
-for color in COLORS:
-    tile_path = asset_resource_path(f"{color}.png")
-    tile = pygame.image.load(tile_path)
-    tile = pygame.transform.scale(tile, TILE_SIZE)
-    tiles[color] = tile
-
-    ghost_tiles[color] = tile.copy()
-    ghost_tiles[color].set_alpha(128)
-
-    small_tile = tile.copy()
-    small_tile = pygame.transform.scale(small_tile, SMALL_TILE_SIZE)
-    small_tiles[color] = small_tile
-
-colors = cycle(COLORS)
-
-black_tile_path = asset_resource_path("Black.png")
-black_tile = pygame.image.load(black_tile_path)
-black_tile = pygame.transform.scale(black_tile, SMALL_TILE_SIZE)
-
-
-class Shapes(Enum):
-    i = "i"
-    j = "j"
-    l = "l"
-    o = "o"
-    s = "s"
-    t = "t"
-    z = "z"
-
-
-tetriminos: Dict[Shapes, List[List[int]]] = {
-    Shapes.i: [
-        [0, 0, 0, 0],
-        [1, 1, 1, 1],
-        [0, 0, 0, 0],
-        [0, 0, 0, 0],
-    ],
-    Shapes.j: [
-        [0, 0, 1],
-        [1, 1, 1],
-        [0, 0, 0],
-    ],
-    Shapes.l: [
-        [1, 0, 0],
-        [1, 1, 1],
-        [0, 0, 0],
-    ],
-    Shapes.o: [
-        [1, 1],
-        [1, 1],
-    ],
-    Shapes.s: [
-        [0, 1, 1],
-        [1, 1, 0],
-        [0, 0, 0],
-    ],
-    Shapes.t: [
-        [0, 1, 0],
-        [1, 1, 1],
-        [0, 0, 0],
-    ],
-    Shapes.z: [
-        [1, 1, 0],
-        [0, 1, 1],
-        [0, 0, 0],
-    ],
+board_image = pygame.image.load(asset_resource_path("Board.png"))
+tile_images = {
+    color: pygame.image.load(asset_resource_path(f"{color}.png")) for color in COLORS
 }
+black_image = pygame.image.load(asset_resource_path("Black.png"))
 
-trimmed_tetriminos: Dict[Shapes, List[List[int]]] = {}
-for key, arrangement in tetriminos.items():
-    trimmed_tetriminos[key] = [row for row in arrangement if sum(row) > 0]
-
-tetriminos_widths: Dict[Shapes, int] = {}
-for key, arrangement in tetriminos.items():
-    tetriminos_widths[key] = len(arrangement[0])
+COLOR_INDICES = {color: index + 1 for index, color in enumerate(COLORS)}
 
-tetriminos_height: Dict[Shapes, int] = {}
-for key, arrangement in trimmed_tetriminos.items():
-    tetriminos_height[key] = len(arrangement)
 
+@dataclass
+class Atlas:
+    tiles: Dict[str, Surface]
+    ghost_tiles: Dict[str, Surface]
+    # Tiles by color index, as stored by the boards of `Matrix`, then garbage
+    palette: List[Optional[Surface]]
+    black_tile: Surface
+    # The board background for a matrix of these tiles
+    background: Surface
+
+
+@lru_cache(maxsize=8)
+def atlas(tile_size: Tuple[int, int]) -> Atlas:
+    """
+    Every image scaled once for tiles of this size
+    """
+    tiles = {
+        color: pygame.transform.scale(image, tile_size)
+        for color, image in tile_images.items()
+    }
+    ghost_tiles = {}
+    for color, tile in tiles.items():
+        ghost_tiles[color] = tile.copy()
+        ghost_tiles[color].set_alpha(128)
+
+    tile_width, tile_height = tile_size
+    black_tile = pygame.transform.scale(black_image, tile_size)
+    if metrics.enabled:
+        metrics.count("surfaces_allocated", 2 * len(tiles) + 2)
+    return Atlas(
+        tiles,
+        ghost_tiles,
+        # Garbage, as `GARBAGE_COLOR`, comes after the colors of pieces
+        [None] + [tiles[color] for color in COLORS] + [black_tile],
+        black_tile,
+        pygame.transform.scale(board_image, (COLUMNS * tile_width, ROWS * tile_height)),
+    )
+
+
+@lru_cache(maxsize=64)
+def cell_rects(
+    offset: Tuple[int, int],
+    rows: int = ROWS,
+    columns: int = COLUMNS,
+    tile_size: Tuple[int, int] = TILE_SIZE,
+) -> Tuple[Rect, ...]:
+    """
+    Screen rect of every cell of a rows * columns bitboard, indexed by bit position
+    """
+    tile_width, tile_height = tile_size
+    offset_x, offset_y = offset
+    rects = []
+    for index in range(rows * columns):
+        # Same coordinates as `bitboard_to_coords(1 << index, ...)`
+        row, column = divmod(index, columns)
+        x = (columns - 1 - column) * tile_width
+        y = (rows - 1 - row) * tile_height
+        rects.append(Rect((x + offset_x, y + offset_y), tile_size))
+    return tuple(rects)
+
+
+@lru_cache(maxsize=1024)
+def piece_sprite(
+    shape: Shapes,
+    rotation: int,
+    color: str,
+    tile_size: Tuple[int, int] = TILE_SIZE,
+    ghost: bool = False,
+) -> Tuple[Surface, Tuple[int, int]]:
+    """
+    A piece composited into a single surface, along with the pixel offset of its
+    top left corner from the cell of the piece's lowest bit
+    """
+    tile = atlas(tile_size).tiles[color]
+    tile_width, tile_height = tile_size
+
+    bitboard = orientations(shape)[rotation]
+    lowest_bit = lowest_bit_index(bitboard)
+    lowest_row, lowest_column = divmod(lowest_bit, COLUMNS)
+    positions = []
+    for bit in decompose_bits(bitboard):
+        row, column = divmod(bit.bit_length() - 1, COLUMNS)
+        positions.append(
+            ((lowest_column - column) * tile_width, (lowest_row - row) * tile_height)
+        )
 
-def render(
-    screen: pygame.display,
-    bits_and_tiles: Dict[int, Surface],
+    left = min(x for x, _ in positions)
+    top = min(y for _, y in positions)
+    width = max(x for x, _ in positions) - left + tile_width
+    height = max(y for _, y in positions) - top + tile_height
+
+    sprite = Surface((width, height), pygame.SRCALPHA)
+    if metrics.enabled:
+        metrics.count("surfaces_allocated")
+    for x, y in positions:
+        # Tiles never overlap, so taking the max copies them over unblended
+        sprite.blit(tile, (x - left, y - top), special_flags=pygame.BLEND_RGBA_MAX)
+    if ghost:
+        sprite.set_alpha(128)
+    return sprite, (left, top)
+
+
+def sprite_sequence(
+    sprite: Surface,
+    sprite_offset: Tuple[int, int],
+    bitboard: int,
     offset,
     rows: int = ROWS,
     columns: int = COLUMNS,
     tile_size: Tuple[int, int] = TILE_SIZE,
-):
-    for bit, tile in bits_and_tiles.items():
-        rect = tile.get_rect()
-
-        tile_width, tile_height = tile_size
-        x, y = bitboard_to_coords(bit, rows, columns, tile_width, tile_height)
-        if x < 0 or y < 0:
-            continue
-        offset_x, offset_y = offset
-        x += offset_x
-        y += offset_y
-
-        rect.update((x, y), tile_size)
-        screen.blit(tile, rect)
-
-
-def shape_generator():
-    bag = []
-    while True:
-        if not bag:
-            bag = list(Shapes)
-            random.shuffle(bag)
-        yield bag.pop(0)
+) -> List[tuple]:
+    rects = cell_rects(tuple(offset), rows, columns, tile_size)
+    index = lowest_bit_index(bitboard)
+    if index >= len(rects):
+        return []
+
+    x = rects[index].x + sprite_offset[0]
+    y = rects[index].y + sprite_offset[1]
+    top = offset[1]
+    if y >= top:
+        return [(sprite, (x, y))]
+
+    # Crop the rows that are still above the board
+    hidden = top - y
+    width, height = sprite.get_size()
+    if hidden >= height:
+        return []
+    return [(sprite, (x, top), Rect(0, hidden, width, height - hidden))]
 
 
 class TetriminoQueue:
-    def __init__(self):
-        self.shape_generator = shape_generator()
-        self.queue = [next(self.shape_generator) for _ in range(7)]
-        self.color = next(colors)
+    def __init__(
+        self, seed: Optional[int] = None, randomizer: str = "7-bag", preview: int = 7
+    ):
+        self.shapes = ShapeQueue(RANDOMIZERS[randomizer](seed), preview)
+        self.preview_depth = preview
+        self.colors = cycle(COLORS)
+        self.color = next(self.colors)
 
     def __iter__(self):
         return self
 
     def __next__(self) -> Tuple[Shapes, str]:
-        self.queue.append(next(self.shape_generator))
         color = self.color
-        self.color = next(colors)
+        self.color = next(self.colors)
 
-        self.current = self.queue.pop(0), color
+        self.current = self.shapes.pop(), color
         return self.current
 
     def peek(self) -> Tuple[Shapes, str]:
-        return self.queue[0], self.color
+        return self.shapes.peek(), self.color
+
+    def preview(self, count: Optional[int] = None) -> List[Shapes]:
+        """
+        The next shapes, as many as the preview shows unless asked for more
+        """
+        return self.shapes.preview(self.preview_depth if count is None else count)
 
 
 class TetriminoStash:
@@ -206,6 +249,13 @@ class Widget(ABC):
     def render(self):
         pass
 
+    def blits(self) -> List[Tuple[Surface, Rect]]:
+        """
+        Tiles to draw this frame, so that a scene can batch several widgets into
+        a single `Surface.blits` call
+        """
+        return []
+
 
 @dataclass
 class Text(Widget):
@@ -216,18 +266,34 @@ class Text(Widget):
 
     def __post_init__(self):
         self.rect = pygame.rect.Rect(self.offset, self.size)
+        self.rendered: Optional[Tuple[str, float, Surface]] = None
 
     def set_text(self, text):
         self.text = str(text)
 
-    def render(self):
+    def rendered_text(self) -> Surface:
+        """
+        The text drawn at the current scale, kept until the text or scale changes
+        """
+        if self.rendered and self.rendered[:2] == (self.text, layout.scale):
+            return self.rendered[2]
+
         text = self.font.render(self.text, 1, (255, 255, 255))
+        if layout.scale != 1:
+            text = pygame.transform.smoothscale(text, layout.size(text.get_size()))
+        if metrics.enabled:
+            metrics.count("surfaces_allocated", 1 if layout.scale == 1 else 2)
+        self.rendered = self.text, layout.scale, text
+        return text
+
+    def render(self):
+        text = self.rendered_text()
         x, y = self.offset
         if self.centered:
             x += self.rect.width / 2
             y += self.rect.height / 2
-        draw_scaffold(self.screen, self.rect)
-        self.screen.blit(text, text.get_rect(center=(x, y)))
+        draw_scaffold(self.screen, layout.rect(self.rect))
+        self.screen.blit(text, text.get_rect(center=layout.point((x, y))))
 
 
 class MouseInteraction(ABC):
@@ -251,6 +317,51 @@ class MouseInteraction(ABC):
     def on_release(self, event):
         pass
 
+    def on_enter(self, event):
+        pass
+
+    def on_leave(self, event):
+        pass
+
+
+class WidgetRegistry:
+    """
+    Routes pointer events only to the widgets under the cursor, tracking which
+    ones the cursor has entered and left
+    """
+
+    MOUSE_EVENTS = {pygame.MOUSEMOTION, pygame.MOUSEBUTTONUP, pygame.MOUSEBUTTONDOWN}
+
+    def __init__(self, cell_size: int = 64):
+        self.grid: SpatialHash[MouseInteraction] = SpatialHash(cell_size)
+        self.hovered: List[MouseInteraction] = []
+
+    def register(self, widget: MouseInteraction):
+        self.grid.insert(widget, widget.rect)
+
+    def unregister(self, widget: MouseInteraction):
+        self.grid.remove(widget)
+        if widget in self.hovered:
+            self.hovered.remove(widget)
+
+    def dispatch(self, event):
+        if event.type not in self.MOUSE_EVENTS:
+            return
+
+        # Widgets are registered with their rects at the base window size
+        under_cursor = self.grid.query(layout.to_base(event.pos))
+        if event.type == pygame.MOUSEMOTION:
+            for widget in self.hovered:
+                if widget not in under_cursor:
+                    widget.on_leave(event)
+            for widget in under_cursor:
+                if widget not in self.hovered:
+                    widget.on_enter(event)
+            self.hovered = under_cursor
+
+        for widget in under_cursor:
+            widget.push(event)
+
 
 @dataclass
 class ReactiveText(Text, MouseInteraction):
@@ -259,9 +370,18 @@ class ReactiveText(Text, MouseInteraction):
 
     def __post_init__(self):
         super().__post_init__()
-        self.start = self.end = None
         self.duration = 200
-        self.active = False
+        self.perimeter = PerimeterPath(
+            [
+                self.rect.topleft,
+                self.rect.topright,
+                self.rect.bottomright,
+                self.rect.bottomleft,
+            ]
+        )
+        self.enter_tween = Tween(easing_table(self.active_function), self.duration)
+        self.leave_tween = Tween(easing_table(self.inactive_function), self.duration)
+        self.tween: Optional[Tween] = None
 
     def on_click(self, event):
         print("down")
@@ -270,50 +390,30 @@ class ReactiveText(Text, MouseInteraction):
         print("up")
 
     def on_move(self, event):
-        collide = self.rect.collidepoint(event.pos) == 1
-        if collide:
-            if self.start:
-                return
-            self.start = pygame.time.get_ticks()
-            self.end = None
-            self.active = True
-            return
-        else:
-            if self.start:
-                self.start = None
-                self.end = pygame.time.get_ticks()
+        pass
 
-            if self.end and pygame.time.get_ticks() - self.end >= self.duration:
-                self.active = False
+    def on_enter(self, event):
+        self.tween = self.enter_tween
+        animator.play(self.tween, pygame.time.get_ticks())
+
+    def on_leave(self, event):
+        self.tween = self.leave_tween
+        animator.play(self.tween, pygame.time.get_ticks())
 
     def render(self):
         super().render()
-        if not self.active:
+        if not self.tween or not self.tween.value:
             return
-
-        now = pygame.time.get_ticks()
-        weight = 0
-        if self.start:
-            time_passed = clamp((now - self.start) / self.duration, 0, 1)
-            weight = self.active_function(time_passed)
-        elif self.end:
-            time_passed = clamp((now - self.end) / self.duration, 0, 1)
-            weight = self.inactive_function(time_passed)
-
-        if not weight:
+        if self.tween is self.leave_tween and self.tween.finished:
             return
 
-        points = [
-            self.rect.topleft,
-            self.rect.topright,
-            self.rect.bottomright,
-            self.rect.bottomleft,
-        ]
-
-        draw_points = incomplete_perimeter_points(points, weight)
-
-        for p1, p2 in zip(draw_points, draw_points[1:]):
-            pygame.draw.line(self.screen, (255, 255, 255), p1, p2)
+        draw_points = self.perimeter.partial(self.tween.value)
+        pygame.draw.lines(
+            self.screen,
+            (255, 255, 255),
+            False,
+            [layout.point(point) for point in draw_points],
+        )
 
 
 @dataclass
@@ -327,58 +427,50 @@ class Tetrimino(Widget):
     placed: bool = False
 
     def __post_init__(self):
-        if self.size == "normal":
-            self.tile = tiles[self.color]
-            self.tile_size = TILE_SIZE
-        else:
-            self.tile = small_tiles[self.color]
-            self.tile_size = SMALL_TILE_SIZE
+        self.tile_size = TILE_SIZE if self.size == "normal" else SMALL_TILE_SIZE
         self.setup()
 
     def setup(self):
         self.bitboard = arrangement_to_bit(self.arrangement, self.columns)
-        self.tiles: Dict[int, Surface] = {}
         self.rotation: int = 0
-        for bit in decompose_bits(self.bitboard):
-            self.tiles[bit] = self.tile
 
     def move_to_start(self):
         self.bitboard = self.bitboard << (
             self.columns * (self.rows - 1) - self.columns // 2 - 2
         )
 
-        self.update_tiles()
-
     def render(self):
-        render(
-            self.screen,
-            self.tiles,
-            self.offset,
+        self.screen.blits(self.blits(), doreturn=False)
+
+    def blits(self) -> List[Tuple[Surface, Rect]]:
+        tile_size = layout.size(self.tile_size)
+        sprite, sprite_offset = piece_sprite(
+            self.shape, self.rotation, self.color, tile_size
+        )
+        return sprite_sequence(
+            sprite,
+            sprite_offset,
+            self.bitboard,
+            layout.point(self.offset),
             self.rows,
             self.columns,
-            tile_size=self.tile_size,
+            tile_size=tile_size,
         )
 
-    def update_tiles(self):
-        tiles: Dict[int, Surface] = {}
-        bits = decompose_bits(self.bitboard)
-        for bit, tile in zip(bits, self.tiles.values()):
-            tiles[bit] = tile
-        self.tiles = tiles
-
     def move_down(self):
         self.bitboard >>= self.columns
-        self.update_tiles()
 
     def move_left(self):
         self.bitboard <<= 1
-        self.update_tiles()
 
     def move_right(self):
         self.bitboard >>= 1
-        self.update_tiles()
 
-    def test_rotate(self, direction=1):
+    def test_rotate(self, direction=1) -> Optional[int]:
+        """
+        The bitboard after turning, or None when the turned piece would reach
+        below the floor row
+        """
         # Prepare tetrimino for comparison
         current_rotation = self.rotation
         arrangement = tetriminos[self.shape]
@@ -407,6 +499,9 @@ class Tetrimino(Widget):
                 bitboard <<= 1
                 shift -= 1
 
+        if shift < 0:
+            return None
+
         small_bitboard = rotate_bitboard(small_bitboard, tetrimino_width)
         rotated_bitboard = widen_bitboard_width(
             small_bitboard, tetrimino_width, self.columns
@@ -419,7 +514,6 @@ class Tetrimino(Widget):
         self.rotation += 1
         if self.rotation > 3:
             self.rotation = 0
-        self.update_tiles()
 
 
 @dataclass
@@ -427,20 +521,35 @@ class Ghost(Tetrimino):
     parent: Optional[Tetrimino] = None
 
     def __post_init__(self):
-        self.tile = ghost_tiles[self.color]
+        self.tile_size = TILE_SIZE
         self.setup()
 
     def reset(self):
         self.bitboard = self.parent.bitboard
-        self.update_tiles()
 
     def update(self, full_board: int):
+        if metrics.enabled:
+            metrics.count("ghost_updates")
         self.reset()
-        while (self.bitboard >> self.columns) & (full_board | bottom_border(self.columns)) == 0:
+        while (self.bitboard >> self.columns) & (
+            full_board | bottom_border(self.columns)
+        ) == 0:
             self.move_down()
 
-    def render(self):
-        render(self.screen, self.tiles, self.offset, self.rows, self.columns)
+    def blits(self) -> List[Tuple[Surface, Rect]]:
+        tile_size = layout.size(self.tile_size)
+        sprite, sprite_offset = piece_sprite(
+            self.shape, self.parent.rotation, self.color, tile_size, ghost=True
+        )
+        return sprite_sequence(
+            sprite,
+            sprite_offset,
+            self.bitboard,
+            layout.point(self.offset),
+            self.rows,
+            self.columns,
+            tile_size=tile_size,
+        )
 
 
 @dataclass
@@ -460,25 +569,18 @@ class TetriminoDisplay(Widget):
             widget_left_border |= 1 << (self.columns * i)
 
         widget_right_border = widget_left_border << (self.columns - 1)
-        borders = (
+        self.borders = (
             widget_bottom_border
             | widget_top_border
             | widget_left_border
             | widget_right_border
         )
 
-        self.tiles = {}
-        for bit in decompose_bits(borders):
-            self.tiles[bit] = black_tile
-
-        self.tetrimino = None
+        self.preview: Optional[Tuple[Shapes, str]] = None
+        self.preview_offset = self.offset
 
     def set_tetrimino(self, shape: Shapes, color: str):
-        if (
-            self.tetrimino
-            and self.tetrimino.color == color
-            and self.tetrimino.shape == shape
-        ):
+        if self.preview == (shape, color):
             return
 
         tetrimno_column = tetriminos_widths[shape]
@@ -488,38 +590,37 @@ class TetriminoDisplay(Widget):
             (self.columns - tetrimno_column) / 2 * tile_width + self.offset[0]
         )
         offset_y = int((self.rows - tetrimno_row) / 2 * tile_height + self.offset[1])
-        arrangement = trimmed_tetriminos[shape]
 
-        self.tetrimino = Tetrimino(
-            self.screen,
-            (offset_x, offset_y),
-            shape,
-            color,
-            arrangement,
-            columns=tetriminos_widths[shape],
-            rows=tetriminos_height[shape],
-            size="small",
-        )
+        self.preview = shape, color
+        self.preview_offset = offset_x, offset_y
 
     def render(self):
-        render(
-            self.screen,
-            self.tiles,
-            self.offset,
-            self.rows,
-            self.columns,
-            tile_size=self.tile_size,
+        self.screen.blits(self.blits(), doreturn=False)
+
+    def blits(self) -> List[Tuple[Surface, Rect]]:
+        tile_size = layout.size(self.tile_size)
+        rects = cell_rects(
+            layout.point(self.offset), self.rows, self.columns, tile_size
         )
-        if self.tetrimino:
-            self.tetrimino.render()
+        black_tile = atlas(tile_size).black_tile
+        sequence = [(black_tile, rects[index]) for index in bit_indices(self.borders)]
+        if self.preview:
+            shape, color = self.preview
+            sprite, _ = piece_sprite(shape, 0, color, tile_size)
+            sequence.append((sprite, layout.point(self.preview_offset)))
+        if metrics.enabled:
+            metrics.count("tiles_rendered", len(sequence))
+        return sequence
 
 
 @dataclass
 class Matrix(Widget):
     shape_generator: TetriminoQueue
+    board_type: Type[Board] = IntBoard
 
     def __post_init__(self):
-        self.tiles: Dict[int, Surface] = {}
+        # Locked cells, colored by their index into `COLORS` + 1
+        self.board = self.board_type()
         self.tetrimino: Optional[Tetrimino] = None
         self.stashed: Optional[Tuple[Shapes, str]] = None
 
@@ -569,90 +670,126 @@ class Matrix(Widget):
         return self.stashed
 
     def get_full_board(self, include_borders=False):
-        full_board = (right_border(COLUMNS, ROWS) | left_border(COLUMNS, ROWS)) if include_borders else 0
-        for tile in self.tiles:
-            full_board |= tile
-        return full_board
+        full_board = WALLS if include_borders else 0
+        return full_board | self.board.bitboard()
+
+    def lock(self, tetrimino: Tetrimino):
+        self.board.lock(tetrimino.bitboard, COLOR_INDICES[tetrimino.color])
+        tetrimino.placed = True
+
+    def collides(self, bitboard: int) -> bool:
+        if metrics.enabled:
+            metrics.count("collision_tests")
+        return self.board.collides(bitboard)
 
     @staticmethod
     def collide(bitboard: int, obj: int):
+        if metrics.enabled:
+            metrics.count("collision_tests")
         return bitboard & obj > 0
 
     @staticmethod
     def collide_left(tetrimino: Tetrimino, obj: int):
+        if metrics.enabled:
+            metrics.count("collision_tests")
         bitboard = tetrimino.bitboard
         collision_zone = bitboard << 1
         return collision_zone & obj > 0
 
     @staticmethod
     def collide_right(tetrimino: Tetrimino, obj: int):
+        if metrics.enabled:
+            metrics.count("collision_tests")
         bitboard = tetrimino.bitboard
         collision_zone = bitboard >> 1
         return collision_zone & obj > 0
 
     @staticmethod
     def collide_bottom(tetrimino: Tetrimino, obj: int):
+        if metrics.enabled:
+            metrics.count("collision_tests")
         bitboard = tetrimino.bitboard
         collision_zone = bitboard >> COLUMNS
         return collision_zone & obj > 0
 
     def clear_lines(self):
-        line_filters = []
-        for i in range(1, 5):
-            line_filter = 0
-            for j in range(i):
-                line_filter |= bottom_border(COLUMNS) << COLUMNS * j
-
-            line_filters.append(line_filter)
-        line_filters = reversed(line_filters)
-        lines_cleared = []
-
-        for line_filter in line_filters:
-            height = bitboard_height(line_filter, COLUMNS, ROWS)
-            while line_filter < top_border(COLUMNS, ROWS):
-                all_tiles = self.tiles
-                full_board = self.get_full_board(include_borders=True)
-
-                if (line_filter & full_board) != line_filter:
-                    line_filter <<= COLUMNS
-                    continue
-                lines_cleared.append(height)
-
-                for bit in decompose_bits(line_filter):
-                    if bit in all_tiles:
-                        del all_tiles[bit]
-
-                shift_tiles = {
-                    bit: tile for bit, tile in all_tiles.items() if bit > line_filter
-                }
-
-                shifted_tiles: Dict[int, Surface] = {}
-                for bit, tile in shift_tiles.items():
-                    bit >>= height * COLUMNS
-                    shifted_tiles[bit] = tile
-
-                static_tiles = {
-                    bit: tile for bit, tile in all_tiles.items() if bit < line_filter
-                }
-                self.tiles = shifted_tiles | static_tiles
-
+        lines_cleared = self.board.clear_lines()
+        if metrics.enabled and lines_cleared:
+            metrics.count("line_clears", len(lines_cleared))
+            metrics.count("lines_cleared", sum(lines_cleared))
         return lines_cleared
 
+    def push_garbage(self, holes: Sequence[int], color: int = GARBAGE_COLOR):
+        """
+        Pushes the stack up by a garbage row per hole column, bottom row first.
+        The falling piece goes up with it when the stack would run into it
+        """
+        self.board.push_garbage(garbage_rows(holes), len(holes), color)
+        tetrimino = self.tetrimino
+        if tetrimino and not tetrimino.placed:
+            for _ in holes:
+                if not self.collides(tetrimino.bitboard):
+                    break
+                tetrimino.bitboard <<= COLUMNS
+        self.refresh_ghost()
+
+    def load_board(self, board: Board):
+        """
+        Replaces every locked cell, for drills that start from a set up board
+        """
+        self.board = board
+        self.refresh_ghost()
+
+    def refresh_ghost(self):
+        if self.tetrimino and not self.tetrimino.placed:
+            self.ghost.update(self.get_full_board())
+
+    def full_row_cells(self) -> List[Tuple[int, int]]:
+        """
+        Bit index and color of every cell in a full row, before the rows are cleared
+        """
+        bitboard = self.board.bitboard()
+        full = 0
+        for row in range(ROWS):
+            if (bitboard >> (row * COLUMNS)) & ROW_MASK == FULL_ROW:
+                full |= FULL_ROW << (row * COLUMNS)
+        if not full:
+            return []
+        return [
+            (index, color) for index, color in self.board.cells() if full >> index & 1
+        ]
+
+    def cell_centers(self, indices: Iterable[int]) -> List[Tuple[float, float]]:
+        """
+        Centres of cells in base layout coordinates, matching `cell_rects`
+        """
+        tile_width, tile_height = TILE_SIZE
+        offset_x, offset_y = self.offset
+        centers = []
+        for index in indices:
+            row, column = divmod(index, COLUMNS)
+            centers.append(
+                (
+                    offset_x + (COLUMNS - 0.5 - column) * tile_width,
+                    offset_y + (ROWS - 0.5 - row) * tile_height,
+                )
+            )
+        return centers
+
+    def stack_height(self) -> int:
+        """
+        Row of the highest locked cell, 0 when the board is empty
+        """
+        return max(0, (self.board.bitboard().bit_length() - 1) // COLUMNS)
+
     def move_down(self):
         tetrimino = self.get_tetrimino()
         if self.collide_bottom(tetrimino, bottom_border(COLUMNS)):
-            self.tiles |= tetrimino.tiles
-            tetrimino.placed = True
+            self.lock(tetrimino)
             return
 
-        for bit in self.tiles:
-            if self.collide_bottom(tetrimino, bit) and not tetrimino.placed:
-                tetrimino.placed = True
-                break
-
-        if tetrimino.placed:
-            self.tiles |= tetrimino.tiles
-            tetrimino.placed = True
+        if self.collides(tetrimino.bitboard >> COLUMNS):
+            self.lock(tetrimino)
             return tetrimino
 
         tetrimino.move_down()
@@ -660,24 +797,22 @@ class Matrix(Widget):
 
     def move_left(self):
         active_tetrimino = self.get_tetrimino()
-        if self.collide_left(active_tetrimino, left_border(COLUMNS, ROWS)):
+        if self.collide_left(active_tetrimino, WALLS):
             return
 
-        for bit in self.tiles:
-            if self.collide_left(active_tetrimino, bit):
-                return
+        if self.collides(active_tetrimino.bitboard << 1):
+            return
 
         self.get_tetrimino().move_left()
         self.ghost.update(self.get_full_board())
 
     def move_right(self):
         active_tetrimino = self.get_tetrimino()
-        if self.collide_right(active_tetrimino, right_border(COLUMNS, ROWS)):
+        if self.collide_right(active_tetrimino, WALLS):
             return
 
-        for bit in self.tiles:
-            if self.collide_right(active_tetrimino, bit):
-                return
+        if self.collides(active_tetrimino.bitboard >> 1):
+            return
 
         self.get_tetrimino().move_right()
         self.ghost.update(self.get_full_board())
@@ -685,6 +820,8 @@ class Matrix(Widget):
     def rotate(self, direction: int = 1):
         active_tetrimino = self.get_tetrimino()
         test_bitboard = active_tetrimino.test_rotate(direction)
+        if test_bitboard is None:
+            return
 
         full_board = self.get_full_board(include_borders=True)
 
@@ -700,15 +837,27 @@ class Matrix(Widget):
         self.ghost.update(self.get_full_board())
 
     def render(self):
-        self.screen.blit(background, self.offset)
-        self.get_tetrimino().render()
-        self.ghost.render()
-        render(self.screen, self.tiles, self.offset)
+        self.screen.blits(self.blits(), doreturn=False)
+
+    def blits(self) -> List[Tuple[Surface, Rect]]:
+        tile_size = layout.size(TILE_SIZE)
+        offset = layout.point(self.offset)
+        tiles = atlas(tile_size)
+
+        sequence = [(tiles.background, offset)]
+        sequence += self.get_tetrimino().blits()
+        sequence += self.ghost.blits()
+        rects = cell_rects(offset, tile_size=tile_size)
+        palette = tiles.palette
+        sequence += [
+            (palette[color], rects[index]) for index, color in self.board.cells()
+        ]
+        if metrics.enabled:
+            metrics.count("tiles_rendered", len(sequence))
+        return sequence
 
     def is_game_over(self):
-        for bit in self.tiles:
-            if bit & top_border(COLUMNS, ROWS) > 0:
-                return True
+        return self.board.is_game_over()
 
 
 def game_over():
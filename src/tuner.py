@@ -0,0 +1,189 @@
+"""
+Tunes the autoplayer weights with an evolution strategy, playing seeded games
+across a pool of worker processes.
+
+Each generation samples candidates around the current mean, with a step size
+per weight, and moves the mean towards the best half. Every candidate of a
+generation plays the same game seeds, so differences in fitness come from the
+weights and not from kinder piece sequences. The state is saved after every
+generation and picked up again when the same checkpoint is passed.
+
+    python -m src.tuner --checkpoint tuning.json --generations 50 --workers 8
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Tuple
+
+from src.autoplay import Weights, play
+
+Task = Tuple[List[float], int, int]  # weights, game seed, most pieces per game
+
+
+@dataclass
+class TunerState:
+    mean: List[float]
+    sigma: List[float]
+    generation: int = 0
+    seed: int = 0
+    best: Optional[List[float]] = None
+    best_fitness: float = float("-inf")
+    # Mean and best fitness of every generation
+    history: List[Tuple[float, float]] = field(default_factory=list)
+
+    def save(self, path: str):
+        # Written next to the checkpoint first, so a crash never leaves half a file
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(asdict(self), f, indent=2)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TunerState":
+        with open(path) as f:
+            data = json.load(f)
+        data["history"] = [tuple(entry) for entry in data["history"]]
+        return cls(**data)
+
+
+def play_task(task: Task) -> int:
+    weights, seed, max_pieces = task
+    return play(Weights.from_list(weights), seed, max_pieces).lines
+
+
+def recombination_weights(parents: int) -> List[float]:
+    weights = [math.log(parents + 0.5) - math.log(rank + 1) for rank in range(parents)]
+    total = sum(weights)
+    return [weight / total for weight in weights]
+
+
+def sample(state: TunerState, rng: random.Random, population: int) -> List[List[float]]:
+    return [
+        [mean + sigma * rng.gauss(0, 1) for mean, sigma in zip(state.mean, state.sigma)]
+        for _ in range(population)
+    ]
+
+
+def update(
+    state: TunerState,
+    candidates: List[List[float]],
+    fitness: List[float],
+    learning_rate: float = 0.2,
+):
+    """
+    Moves the mean to a weighted average of the best half, and each step size
+    towards the spread of the best half along its weight
+    """
+    parents = len(candidates) // 2
+    ranked = sorted(
+        range(len(candidates)), key=lambda index: fitness[index], reverse=True
+    )
+    weights = recombination_weights(parents)
+    selected = [candidates[index] for index in ranked[:parents]]
+
+    mean = [
+        sum(weight * candidate[i] for weight, candidate in zip(weights, selected))
+        for i in range(len(state.mean))
+    ]
+    sigma = []
+    for i, (old_mean, old_sigma) in enumerate(zip(state.mean, state.sigma)):
+        spread = math.sqrt(
+            sum(
+                weight * (candidate[i] - old_mean) ** 2
+                for weight, candidate in zip(weights, selected)
+            )
+        )
+        sigma.append((1 - learning_rate) * old_sigma + learning_rate * spread)
+
+    best = ranked[0]
+    if fitness[best] > state.best_fitness:
+        state.best, state.best_fitness = candidates[best], fitness[best]
+    state.history.append((sum(fitness) / len(fitness), fitness[best]))
+    state.mean, state.sigma = mean, sigma
+    state.generation += 1
+
+
+def evaluate(
+    pool: ProcessPoolExecutor,
+    candidates: List[List[float]],
+    seeds: List[int],
+    max_pieces: int,
+) -> List[float]:
+    """
+    Mean lines cleared by each candidate over the same games
+    """
+    tasks = [
+        (candidate, seed, max_pieces) for candidate in candidates for seed in seeds
+    ]
+    # Games are long enough that one per task keeps every worker busy to the end
+    lines = list(pool.map(play_task, tasks))
+    return [
+        sum(lines[index * len(seeds) : (index + 1) * len(seeds)]) / len(seeds)
+        for index in range(len(candidates))
+    ]
+
+
+def generation_rng(state: TunerState) -> random.Random:
+    """
+    Randomness for one generation, so a resumed run samples what it would have
+    """
+    return random.Random(state.seed * 1_000_003 + state.generation)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--checkpoint", default="tuning.json")
+    parser.add_argument("--generations", type=int, default=20)
+    parser.add_argument("--population", type=int, default=16)
+    parser.add_argument("--games", type=int, default=8, help="games per candidate")
+    parser.add_argument("--pieces", type=int, default=500, help="most pieces per game")
+    parser.add_argument("--sigma", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.checkpoint):
+        state = TunerState.load(args.checkpoint)
+        print(f"resuming from generation {state.generation}")
+    else:
+        mean = Weights().as_list()
+        state = TunerState(mean, [args.sigma] * len(mean), seed=args.seed)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        if state.best is None or state.best_fitness == float("-inf"):
+            # The starting weights are the best known until a generation beats
+            # them, scored on the games the first generation plays
+            rng = generation_rng(state)
+            seeds = [rng.randrange(2 ** 32) for _ in range(args.games)]
+            state.best = list(state.mean)
+            state.best_fitness = evaluate(pool, [state.mean], seeds, args.pieces)[0]
+            state.save(args.checkpoint)
+
+        for done in range(1, args.generations + 1):
+            rng = generation_rng(state)
+            seeds = [rng.randrange(2 ** 32) for _ in range(args.games)]
+            candidates = sample(state, rng, args.population)
+            fitness = evaluate(pool, candidates, seeds, args.pieces)
+            update(state, candidates, fitness)
+            state.save(args.checkpoint)
+
+            per_hour = done / (time.perf_counter() - start) * 3600
+            mean_fitness, best_fitness = state.history[-1]
+            print(
+                f"generation {state.generation}: mean {mean_fitness:.1f} lines, "
+                f"best {best_fitness:.1f}, {per_hour:.0f} generations/hour"
+            )
+
+    print("best weights:", " ".join(f"{weight:.3f}" for weight in state.best))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+Two player versus matches over the network.
+
+Each client sends its board as the rows that changed since the last board it
+sent, so a locked piece costs a handful of bytes. The connection keeps messages
+in order, so the server applies every delta to the board before it. The server
+keeps a copy of both boards, relays each update to the opponent, and turns the
+lines a player clears into garbage rows for the other player. A player who
+joins is sent the whole board of the one already there, and the opponent of a
+player who joins or leaves is sent an empty board.
+
+    server = VersusServer()
+    await server.start("0.0.0.0", 8765)
+
+    client = VersusClient()
+    await client.connect("192.168.1.2", 8765)
+    await client.send_board(matrix.get_full_board())
+"""
+import asyncio
+import random
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.settings import COLUMNS
+
+ROW_MASK = (1 << COLUMNS) - 1
+
+# Message types
+BOARD = 1
+ACK = 2
+LINES = 3
+GARBAGE = 4
+PING = 5
+PONG = 6
+OPPONENT_BOARD = 7
+WELCOME = 8
+# The opponent's whole board, as a delta against the empty board
+OPPONENT_FULL_BOARD = 9
+
+HEADER = struct.Struct("!BH")  # type, payload length
+SEQUENCE = struct.Struct("!I")
+ROW = struct.Struct("!BH")  # row index, row bits
+GARBAGE_ROWS = struct.Struct("!BB")  # rows, hole column
+TIMESTAMP = struct.Struct("!d")
+
+# Garbage rows sent for the total number of lines in one clear
+GARBAGE_TABLE = {0: 0, 1: 0, 2: 1, 3: 2, 4: 4}
+
+
+def encode_delta(board: int, base: int) -> bytes:
+    """
+    The rows of `board` that differ from `base`
+    """
+    changed = board ^ base
+    rows = []
+    row = 0
+    while changed:
+        if changed & ROW_MASK:
+            rows.append(ROW.pack(row, (board >> (row * COLUMNS)) & ROW_MASK))
+        changed >>= COLUMNS
+        row += 1
+    return bytes([len(rows)]) + b"".join(rows)
+
+
+def apply_delta(board: int, payload: bytes) -> int:
+    count = payload[0]
+    for i in range(count):
+        row, bits = ROW.unpack_from(payload, 1 + i * ROW.size)
+        shift = row * COLUMNS
+        board = (board & ~(ROW_MASK << shift)) | (bits << shift)
+    return board
+
+
+def garbage_for(lines_cleared: List[int]) -> int:
+    return GARBAGE_TABLE.get(sum(lines_cleared), 4)
+
+
+def message(kind: int, payload: bytes = b"") -> bytes:
+    return HEADER.pack(kind, len(payload)) + payload
+
+
+async def read_message(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    payload = await reader.readexactly(length) if length else b""
+    return kind, payload
+
+
+class VersusServer:
+    def __init__(self, seed: Optional[int] = None):
+        self.random = random.Random(seed)
+        self.writers: Dict[int, asyncio.StreamWriter] = {}
+        self.boards: Dict[int, int] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def opponent(self, player: int) -> Optional[asyncio.StreamWriter]:
+        return self.writers.get(1 - player)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if len(self.writers) >= 2:
+            writer.close()
+            return
+
+        player = 0 if 0 not in self.writers else 1
+        self.writers[player] = writer
+        self.boards[player] = 0
+        writer.write(message(WELCOME, bytes([player])))
+        opponent = self.opponent(player)
+        if opponent:
+            full_board = encode_delta(self.boards[1 - player], 0)
+            writer.write(message(OPPONENT_FULL_BOARD, full_board))
+            opponent.write(message(OPPONENT_FULL_BOARD, encode_delta(0, 0)))
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                await self.dispatch(player, kind, payload)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            del self.writers[player]
+            del self.boards[player]
+            writer.close()
+            opponent = self.opponent(player)
+            if opponent:
+                opponent.write(message(OPPONENT_FULL_BOARD, encode_delta(0, 0)))
+
+    async def dispatch(self, player: int, kind: int, payload: bytes):
+        writer = self.writers[player]
+        opponent = self.opponent(player)
+
+        if kind == BOARD:
+            delta = payload[SEQUENCE.size :]
+            self.boards[player] = apply_delta(self.boards[player], delta)
+            writer.write(message(ACK, payload[: SEQUENCE.size]))
+            if opponent:
+                opponent.write(message(OPPONENT_BOARD, delta))
+        elif kind == LINES:
+            rows = garbage_for(list(payload))
+            if rows and opponent:
+                hole = self.random.randrange(1, COLUMNS - 1)
+                opponent.write(message(GARBAGE, GARBAGE_ROWS.pack(rows, hole)))
+        elif kind == PING:
+            writer.write(message(PONG, payload))
+        await writer.drain()
+
+
+class VersusClient:
+    def __init__(self):
+        self.player: Optional[int] = None
+        self.sequence = 0
+        # Last board update the server has applied
+        self.acked = 0
+        # The board the server has once every message sent so far arrives
+        self.sent_board = 0
+        self.opponent_board = 0
+        self.incoming_garbage: List[Tuple[int, int]] = []
+        self.latency: Optional[float] = None
+        self.bytes_sent = 0
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.listener: Optional[asyncio.Task] = None
+        self.welcomed = asyncio.Event()
+        self.updated = asyncio.Event()
+        self.pong = asyncio.Event()
+
+    async def connect(self, host: str, port: int):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.listener = asyncio.create_task(self.listen())
+        await self.welcomed.wait()
+
+    async def close(self):
+        if self.listener:
+            self.listener.cancel()
+        if self.writer:
+            self.writer.close()
+
+    async def send(self, kind: int, payload: bytes = b""):
+        data = message(kind, payload)
+        self.bytes_sent += len(data)
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def send_board(self, board: int):
+        """
+        Sends the rows that changed since the last board sent. A delta against
+        the acknowledged board would leave out a row that changed in a send
+        still in flight and then changed back
+        """
+        self.sequence += 1
+        delta = encode_delta(board, self.sent_board)
+        self.sent_board = board
+        await self.send(BOARD, SEQUENCE.pack(self.sequence) + delta)
+
+    async def send_lines(self, lines_cleared: List[int]):
+        await self.send(LINES, bytes(lines_cleared))
+
+    async def ping(self, timeout: float = 5.0) -> float:
+        """
+        Round trip time in seconds, raising `asyncio.TimeoutError` when no
+        answer comes within `timeout`
+        """
+        self.pong.clear()
+        await self.send(PING, TIMESTAMP.pack(time.perf_counter()))
+        await asyncio.wait_for(self.pong.wait(), timeout)
+        return self.latency
+
+    def take_garbage(self) -> List[Tuple[int, int]]:
+        garbage, self.incoming_garbage = self.incoming_garbage, []
+        return garbage
+
+    async def listen(self):
+        try:
+            while True:
+                kind, payload = await read_message(self.reader)
+                self.receive(kind, payload)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def receive(self, kind: int, payload: bytes):
+        if kind == WELCOME:
+            self.player = payload[0]
+            self.welcomed.set()
+        elif kind == ACK:
+            (self.acked,) = SEQUENCE.unpack(payload)
+        elif kind == OPPONENT_BOARD:
+            self.opponent_board = apply_delta(self.opponent_board, payload)
+        elif kind == OPPONENT_FULL_BOARD:
+            self.opponent_board = apply_delta(0, payload)
+        elif kind == GARBAGE:
+            self.incoming_garbage.append(GARBAGE_ROWS.unpack(payload))
+        elif kind == PONG:
+            (sent_at,) = TIMESTAMP.unpack(payload)
+            self.latency = time.perf_counter() - sent_at
+            self.pong.set()
+        self.updated.set()
@@ -0,0 +1,23 @@
+from utils.animation import Animator, EasingTable, PerimeterPath, Tween
+from utils.interpolation import incomplete_perimeter_points
+
+import pytest
+
+points = [(0, 0), (160, 0), (160, 60), (0, 60)]
+
+
+@pytest.mark.parametrize("weight", [0.1, 0.25, 0.5, 0.73, 0.99])
+def test_perimeter_path_matches_incomplete_perimeter_points(weight):
+    expected = incomplete_perimeter_points(points, weight)
+    assert PerimeterPath(points).partial(weight) == pytest.approx(expected)
+
+
+def test_animator_drops_finished_tweens():
+    animator = Animator()
+    tween = Tween(EasingTable(lambda weight: weight), 200)
+    animator.play(tween, 1000)
+    animator.update(1100)
+    assert tween.value == pytest.approx(0.5, abs=0.01)
+    animator.update(1200)
+    assert tween.finished and tween.value == 1
+    assert animator.tweens == []
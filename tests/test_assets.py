@@ -0,0 +1,45 @@
+import threading
+
+from utils.assets import AssetCache
+
+
+def test_loads_each_key_once():
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_square(n):
+        calls.append(n)
+        started.set()
+        release.wait()
+        return n * n
+
+    cache = AssetCache({"square": slow_square})
+    (future,) = cache.preload(("square", 3))
+    started.wait()
+    # A preload of the same key reuses the load that is in flight
+    assert cache.preload(("square", 3)) == [future]
+    release.set()
+
+    assert cache.get(("square", 3)) == 9
+    assert cache.get(("square", 4)) == 16
+    assert calls == [3, 4]
+
+
+def test_builds_on_the_calling_thread():
+    threads = []
+
+    def read(n):
+        threads.append(("read", threading.current_thread()))
+        return n
+
+    def build(n, _):
+        threads.append(("build", threading.current_thread()))
+        return n * n
+
+    cache = AssetCache({"square": read}, {"square": build})
+    cache.preload(("square", 3))[0].result()
+    assert cache.get(("square", 3)) == 9
+    assert cache.get(("square", 3)) == 9
+    assert threads[0][1] is not threading.current_thread()
+    assert threads[1:] == [("build", threading.current_thread())]
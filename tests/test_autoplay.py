@@ -0,0 +1,62 @@
+import json
+
+from src.autoplay import Weights, features, play
+from src.settings import COLUMNS
+from src.tuner import TunerState, main, update
+
+import pytest
+
+
+def cell(row: int, column: int) -> int:
+    return 1 << (row * COLUMNS + column)
+
+
+samples = [
+    (0, (0, 0, 0)),
+    (cell(1, 1), (0, 1, 1)),
+    # A cell on top of an empty one makes a hole, and the column two high
+    (cell(2, 5), (1, 2, 4)),
+    (cell(1, 1) | cell(1, 2) | cell(3, 2), (1, 4, 5)),
+]
+
+
+@pytest.mark.parametrize("board, expected", samples)
+def test_features(board, expected):
+    assert features(board) == expected
+
+
+def test_play_is_seeded():
+    first = play(Weights(), 3, 100)
+    assert first == play(Weights(), 3, 100)
+    assert first.pieces == 100
+    assert first.lines > 0
+
+
+def test_update_moves_towards_best(tmp_path):
+    state = TunerState([0.0, 0.0], [1.0, 1.0])
+    candidates = [[1.0, -1.0], [0.5, -0.5], [-1.0, 1.0], [-0.5, 0.5]]
+    update(state, candidates, [4.0, 3.0, 1.0, 2.0])
+    assert state.mean[0] > 0 > state.mean[1]
+    assert state.best == [1.0, -1.0]
+    assert state.generation == 1
+
+    path = str(tmp_path / "tuning.json")
+    state.save(path)
+    assert TunerState.load(path) == state
+
+
+def test_tuner_without_generations(tmp_path, capsys):
+    checkpoint = str(tmp_path / "tuning.json")
+    argv = ["--checkpoint", checkpoint, "--generations", "0", "--workers", "1"]
+    assert main(argv + ["--games", "1", "--pieces", "50"]) == 0
+    weights = " ".join(f"{weight:.3f}" for weight in Weights().as_list())
+    assert f"best weights: {weights}" in capsys.readouterr().out
+
+    # The starting weights are scored, so the checkpoint is plain JSON
+    def no_constants(name):
+        raise ValueError(name)
+
+    with open(checkpoint) as f:
+        saved = json.load(f, parse_constant=no_constants)
+    assert saved["best"] == Weights().as_list()
+    assert saved["best_fitness"] > 0
@@ -0,0 +1,58 @@
+from src.boards import BOARDS, CELLS_MASK
+from src.engine import clear_lines
+from src.perft import perft
+from src.settings import COLUMNS, ROWS
+
+import pytest
+
+
+def full_rows(*rows: int) -> int:
+    board = 0
+    for row in rows:
+        board |= 0b11111111110 << (row * COLUMNS)
+    return board
+
+
+samples = [
+    full_rows(1),
+    full_rows(1, 3) | 1 << (4 * COLUMNS + 5),
+    full_rows(1, 2, 3) | 1 << (5 * COLUMNS + 2),
+    full_rows(2, 3, 4, 5) | 1 << (6 * COLUMNS + 7) | 1 << (COLUMNS + 1),
+    full_rows(0, ROWS - 2) | 1 << (ROWS * COLUMNS + 4),
+]
+
+
+@pytest.mark.parametrize("backend", sorted(BOARDS))
+@pytest.mark.parametrize("bitboard", samples)
+def test_clear_lines(backend, bitboard):
+    board = BOARDS[backend]()
+    # Each row gets its own color, so moved cells can be traced
+    for row in range(ROWS + 2):
+        cells = bitboard & (((1 << COLUMNS) - 1) << (row * COLUMNS))
+        if cells:
+            board.lock(cells, row % 7 + 1)
+    assert board.bitboard() == bitboard
+
+    expected_board, expected_lines = clear_lines(bitboard)
+    assert board.clear_lines() == expected_lines
+    assert board.bitboard() == expected_board
+
+    cells = dict(board.cells())
+    assert sum(1 << index for index in cells) == expected_board & CELLS_MASK
+    assert all(color for color in cells.values())
+
+
+@pytest.mark.parametrize("backend", sorted(BOARDS))
+def test_collides(backend):
+    board = BOARDS[backend]()
+    board.lock(0b110 << COLUMNS, 1)
+    assert board.collides(0b10 << COLUMNS)
+    assert not board.collides(0b1000 << COLUMNS)
+    assert not board.collides(0b110)
+    assert board.copy().key() == board.key()
+    assert not board.is_game_over()
+
+
+@pytest.mark.parametrize("backend", sorted(BOARDS))
+def test_perft_matches_integers(backend):
+    assert perft(3, 2, board_type=BOARDS[backend]).counts() == perft(3, 2).counts()
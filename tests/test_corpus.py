@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+
+from src.corpus import (
+    MAX_PIECES,
+    PIECE,
+    Corpus,
+    CorpusWriter,
+    decode_placement,
+    encode_placement,
+    main,
+    record_game,
+)
+from src.engine import placements
+from src.levels import MODES
+from src.shapes import Shapes
+
+import pytest
+
+
+@pytest.mark.parametrize("shape", list(Shapes))
+def test_placements_round_trip(shape):
+    for placement in placements(shape, 0):
+        assert decode_placement(shape, *encode_placement(shape, placement)) == placement
+
+
+def test_append_and_query(tmp_path):
+    path = str(tmp_path / "corpus")
+    games = {
+        seed: record_game((seed, 60, [-0.36, -0.51, -0.18, 0.76], "snes"))
+        for seed in (1, 2, 3)
+    }
+
+    with CorpusWriter(path) as writer:
+        writer.add_game(1, games[1])
+        writer.add_game(2, games[2])
+    with CorpusWriter(path) as writer:
+        writer.add_game(3, games[3])
+
+    corpus = Corpus(path)
+    assert corpus.games == 3
+    assert len(corpus) == sum(len(records) for records in games.values())
+    assert isinstance(corpus.column("height"), np.memmap)
+
+    third = corpus.game_pieces(2)
+    assert (third["game"] == 2).all()
+    for name in PIECE.names:
+        if name != "game":
+            assert (third[name] == games[3][name]).all()
+
+    all_records = np.concatenate(list(games.values()))
+    by_level = corpus.line_clears_by_level()
+    assert by_level.sum() == len(corpus)
+    assert (by_level * np.arange(5)).sum() == all_records["lines"].sum()
+
+    heights = corpus.mean_height_by_piece()
+    assert len(heights) == 60
+    assert heights[0] == pytest.approx(
+        all_records["height"][all_records["piece"] == 0].mean()
+    )
+
+    chunks = list(corpus.chunks("lines", rows=50))
+    assert sum(len(chunk["lines"]) for chunk in chunks) == len(corpus)
+
+
+def test_unfinished_writes_are_dropped(tmp_path):
+    path = str(tmp_path / "corpus")
+    with CorpusWriter(path) as writer:
+        writer.add_game(1, record_game((1, 20, [-0.36, -0.51, -0.18, 0.76], "snes")))
+
+    with open(os.path.join(path, "height.bin"), "ab") as f:
+        f.write(b"\x07" * 5)
+    with CorpusWriter(path) as writer:
+        pass
+    assert os.path.getsize(os.path.join(path, "height.bin")) == len(Corpus(path))
+
+
+@pytest.mark.parametrize("mode", sorted(MODES))
+def test_scores_follow_mode(mode):
+    records = record_game((1, 200, [-0.36, -0.51, -0.18, 0.76], mode))
+    rules = MODES[mode]
+    total_lines = 0
+    for record in records:
+        level = rules.level(total_lines)
+        expected = rules.score(int(record["lines"]), 0, level) if record["lines"] else 0
+        assert record["score"] == expected
+        total_lines += int(record["lines"])
+    assert records["lines"].sum() > 0
+
+
+def test_pieces_fit_the_piece_column(tmp_path):
+    with pytest.raises(SystemExit):
+        main(["record", str(tmp_path), "--pieces", str(MAX_PIECES + 1)])
+    with pytest.raises(ValueError):
+        record_game((1, MAX_PIECES + 1, [-0.36, -0.51, -0.18, 0.76], "snes"))
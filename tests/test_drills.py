@@ -0,0 +1,83 @@
+import random
+
+from src.boards import BOARDS, GARBAGE_COLOR, IntBoard, garbage_rows
+from src.drills import (
+    cheese,
+    format_board,
+    pack_board,
+    parse_board,
+    random_holes,
+    unpack_board,
+)
+from src.fuzz import reference_matrix
+from src.settings import COLUMNS
+from src.shapes import Shapes
+
+import pytest
+
+samples = [
+    "XXXX.XXXXX",
+    """
+    ....1.....
+    ...1117...
+    XXXXX.XXXX
+    XXXXX.XXXX
+    """,
+    """
+    2.........
+    22........
+    .2........
+    ..........
+    """,
+]
+
+
+@pytest.mark.parametrize("backend", sorted(BOARDS))
+@pytest.mark.parametrize("text", samples)
+def test_formats_round_trip(backend, text):
+    board = parse_board(text, BOARDS[backend])
+    expected = "\n".join(line.strip() for line in text.strip().splitlines())
+    assert format_board(board) == expected
+
+    unpacked = unpack_board(pack_board(board), BOARDS[backend])
+    assert unpacked.bitboard() == board.bitboard()
+    assert list(unpacked.cells()) == list(board.cells())
+
+
+def test_parse_places_rows_above_floor():
+    board = parse_board("XXXX.XXXXX")
+    assert board.bitboard() == garbage_rows([6]) << COLUMNS
+    assert {color for _, color in board.cells()} == {GARBAGE_COLOR}
+
+    with pytest.raises(ValueError):
+        parse_board("XXX")
+
+
+@pytest.mark.parametrize("backend", sorted(BOARDS))
+def test_push_garbage(backend):
+    board = parse_board("...1......", BOARDS[backend])
+    board.push_garbage(garbage_rows([1, 2]), 2)
+    assert format_board(board) == "...1......\nXXXXXXXX.X\nXXXXXXXXX."
+    assert board.bitboard() == parse_board(format_board(board)).bitboard()
+
+
+def test_random_holes():
+    rng = random.Random(0)
+    assert len(set(random_holes(9, rng, messiness=0))) == 1
+    holes = random_holes(9, rng, messiness=1)
+    assert all(a != b for a, b in zip(holes, holes[1:]))
+    assert all(1 <= column <= COLUMNS - 2 for column in holes)
+
+    board = cheese(9, rng, board_type=IntBoard)
+    assert len(format_board(board).splitlines()) == 9
+
+
+def test_garbage_pushes_falling_piece():
+    # An O resting on the floor, where both garbage rows are filled
+    piece = 0b11 << (COLUMNS + 4) | 0b11 << (2 * COLUMNS + 4)
+    matrix = reference_matrix(0, Shapes.o, 0, piece)
+    matrix.push_garbage([1, 2])
+    tetrimino = matrix.tetrimino
+    assert not matrix.collides(tetrimino.bitboard)
+    assert tetrimino.bitboard == piece << (2 * COLUMNS)
+    assert matrix.ghost.bitboard == tetrimino.bitboard
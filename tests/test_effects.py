@@ -0,0 +1,41 @@
+import numpy as np
+
+from src.effects import ParticleSystem
+
+
+def test_burst_fills_pool():
+    particles = ParticleSystem(capacity=100, seed=1)
+    particles.burst([(10, 10)] * 10, [1] * 10, per_cell=6)
+    assert particles.count == 60
+    particles.burst([(10, 10)] * 10, [2] * 10, per_cell=6)
+    assert particles.count == 100
+    assert (particles.color[60:100] == 2).all()
+
+
+def test_step_moves_and_expires():
+    particles = ParticleSystem(capacity=64, seed=1)
+    particles.burst([(0, 0), (100, 100)], [3, 4], per_cell=4, lifetime=1.0)
+    start = particles.position[: particles.count].copy()
+
+    particles.step(0.1)
+    assert particles.count == 8
+    assert not np.allclose(particles.position[:8], start)
+
+    # The shortest lived go first, and the rest stay packed at the front
+    particles.life[:4] = 0.01
+    particles.step(0.05)
+    assert particles.count == 4
+    assert (particles.life[:4] > 0).all()
+
+    for _ in range(20):
+        particles.step(0.1)
+    assert particles.count == 0
+    assert particles.blits() == []
+
+
+def test_seeded():
+    first, second = ParticleSystem(seed=7), ParticleSystem(seed=7)
+    for particles in (first, second):
+        particles.burst([(5, 5)] * 3, [1, 2, 3])
+        particles.step(1 / 60)
+    assert np.array_equal(first.position, second.position)
@@ -0,0 +1,89 @@
+from src import engine
+from src.engine import FLOOR, clear_lines, hard_drop, move_left, placements, spawn
+from src.fuzz import engine_moves, reference_moves
+from src.perft import perft
+from src.settings import COLUMNS
+from src.shapes import Shapes
+
+import pytest
+
+
+def full_rows(*rows: int) -> int:
+    board = 0
+    for row in rows:
+        board |= 0b11111111110 << (row * COLUMNS)
+    return board
+
+
+samples = [
+    # board, (board after clearing, lines cleared)
+    (0, (0, [])),
+    (full_rows(1), (0, [1])),
+    (full_rows(1) | 1 << (2 * COLUMNS + 3), (1 << (COLUMNS + 3), [1])),
+    (full_rows(1, 3), (0, [1, 1])),
+    (full_rows(1, 2), (0, [2])),
+]
+
+
+@pytest.mark.parametrize("board,result", samples)
+def test_clear_lines(board, result):
+    assert clear_lines(board) == result
+
+
+def test_hard_drop_rests_above_floor():
+    bitboard, _ = spawn(Shapes.o)
+    dropped = hard_drop(bitboard, 0)
+    assert dropped & FLOOR == 0
+    assert (dropped >> COLUMNS) & FLOOR > 0
+
+
+def test_o_placements_on_empty_board():
+    assert len(placements(Shapes.o, 0)) == 9
+
+
+# Placements on the empty board, and those of them in the floor row, which
+# like in `Matrix` a piece only reaches by rotating into it
+empty_board_samples = [
+    (Shapes.i, 27, 10),
+    (Shapes.j, 60, 26),
+    (Shapes.l, 60, 26),
+    (Shapes.o, 9, 0),
+    (Shapes.s, 34, 17),
+    (Shapes.t, 60, 26),
+    (Shapes.z, 34, 17),
+]
+
+
+@pytest.mark.parametrize("shape, count, on_floor_row", empty_board_samples)
+def test_empty_board_placements(shape, count, on_floor_row):
+    locked = placements(shape, 0)
+    assert len(locked) == count
+    assert sum(1 for bitboard in locked if bitboard & FLOOR) == on_floor_row
+
+
+def test_perft_counts():
+    # Seed 1 starts O, Z, T
+    assert perft(1, 3).counts() == {
+        "seed": 1,
+        "stash": False,
+        "nodes": [9, 255, 11325],
+        "states": [9, 255, 11325],
+    }
+    assert perft(1, 2, stash=True).nodes == [43, 2740]
+
+
+@pytest.mark.parametrize("shape", list(Shapes))
+def test_walls_reach_over_spawn(shape):
+    # Against the left wall in the spawn rows, which stick out above the board
+    bitboard, rotation = spawn(shape)
+    while move_left(bitboard, 0) is not None:
+        bitboard = move_left(bitboard, 0)
+    case = (0, shape, rotation, bitboard)
+    assert reference_moves(case) == engine_moves(case)
+
+
+def test_full_rows_counts_a_tetris():
+    board = full_rows(1, 2, 3, 4)
+    # The rows above drop one short, so the drops are no count of rows
+    assert clear_lines(board) == (0, [3])
+    assert engine.full_rows(board) == 4
@@ -0,0 +1,19 @@
+from src.engine import Inputs, hard_drop, placements, spawn
+from src.finesse import finesse
+from src.shapes import Shapes
+
+import pytest
+
+
+@pytest.mark.parametrize("shape", list(Shapes))
+def test_finesse_reaches_every_placement(shape):
+    assert set(finesse(shape, 0)) == placements(shape, 0)
+
+
+def test_straight_drop_is_a_single_input():
+    bitboard, _ = spawn(Shapes.t)
+    assert finesse(Shapes.t, 0)[hard_drop(bitboard, 0)] == [Inputs.drop]
+
+
+def test_gravity_only_removes_placements():
+    assert set(finesse(Shapes.s, 0, frames_per_row=2)) <= placements(Shapes.s, 0)
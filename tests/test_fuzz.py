@@ -0,0 +1,55 @@
+from src.engine import Inputs
+from src.fuzz import (
+    CHECKS,
+    Check,
+    case_rng,
+    engine_clear,
+    random_piece,
+    reference_matrix,
+)
+from src.fuzz import run_check
+from src.settings import COLUMNS, ROWS
+from src.shapes import Shapes
+
+import pytest
+
+
+@pytest.mark.parametrize("name", sorted(CHECKS))
+def test_candidates_agree(name):
+    states, divergence = run_check(name, seed=1, start=0, end=300)
+    assert divergence is None, divergence.report()
+    assert states >= 300
+
+
+def test_reports_first_divergence():
+    def off_by_one(case):
+        board, lines_cleared = engine_clear(case)
+        return board, lines_cleared[1:]
+
+    clear = CHECKS["clear_lines"]
+    check = Check(clear.generate, clear.reference, {"broken": off_by_one})
+    _, divergence = run_check("clear_lines", 0, 0, 1000, check)
+    assert divergence.candidate == "broken"
+    assert divergence.expected[1] and divergence.actual == (
+        divergence.expected[0],
+        divergence.expected[1][1:],
+    )
+    # Every case before it agreed
+    _, earlier = run_check("clear_lines", 0, 0, divergence.case_index, check)
+    assert earlier is None
+
+
+def test_rotating_flat_i_on_the_floor_is_blocked():
+    matrix = reference_matrix(0, Shapes.i, 0, 0b1111 << 16)
+    matrix.rotate()
+    assert matrix.tetrimino.rotation == 0
+    assert CHECKS["play"].reference((0, Shapes.i, 0, 0b1111 << 16, (Inputs.rotate,)))
+
+
+def test_pieces_cover_spawn_rows():
+    pieces = [random_piece(case_rng(0, index))[3] for index in range(500)]
+    assert any(bitboard >> (ROWS * COLUMNS) for bitboard in pieces)
+
+
+def test_seeds_give_different_cases():
+    assert case_rng(1, 1_000_003).random() != case_rng(2, 0).random()
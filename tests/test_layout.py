@@ -0,0 +1,31 @@
+from src.layout import BASE_SIZE, Layout
+
+import pytest
+
+base_width, base_height = BASE_SIZE
+
+samples = [
+    # window size, scale, origin
+    (BASE_SIZE, 1.0, (0, 0)),
+    ((base_width // 2, base_height // 2), 0.5, (0, 0)),
+    ((base_width * 2, base_height), 1.0, (base_width // 2, 0)),
+    ((base_width, base_height * 3), 1.0, (0, base_height)),
+]
+
+
+@pytest.mark.parametrize("window_size,scale,origin", samples)
+def test_resize(window_size, scale, origin):
+    layout = Layout()
+    layout.resize(window_size)
+    assert layout.scale == scale
+    assert layout.origin == origin
+    assert layout.to_base(layout.point((400, 260))) == (400, 260)
+
+
+@pytest.mark.parametrize("window_size", [(0, 0), (0, 600), (800, 0)])
+def test_minimised_window_keeps_layout(window_size):
+    layout = Layout()
+    layout.resize((base_width // 2, base_height // 2))
+    layout.resize(window_size)
+    assert layout.scale == 0.5
+    assert layout.to_base(layout.point((400, 260))) == (400, 260)
@@ -0,0 +1,92 @@
+from src.drills import TEXT_COLUMNS, parse_board
+from src.engine import FLOOR, WALLS, TSpin, t_spin
+from src.levels import GUIDELINE, MODES, SNES
+from src.settings import COLUMNS, FPS
+
+import pytest
+
+
+def cells(*positions):
+    """
+    A bitboard of (row, character) positions, counted like text boards
+    """
+    return sum(1 << (row * COLUMNS + TEXT_COLUMNS[char]) for row, char in positions)
+
+
+def walk_back_ticks(level):
+    level = min(level, max(SNES.gravity))
+    while level not in SNES.gravity:
+        level -= 1
+    return SNES.gravity[level] / FPS * 1000
+
+
+@pytest.mark.parametrize("level", range(0, 40))
+def test_snes_ticks(level):
+    assert SNES.ticks(level) == walk_back_ticks(level)
+
+
+samples = [
+    (1, 0, 40),
+    (2, 5, 600),
+    (2, 1, 200),
+    (3, 300, 301 * 300),
+    (0, 3, 0),
+]
+
+
+@pytest.mark.parametrize("lines, level, score", samples)
+def test_snes_score(lines, level, score):
+    assert SNES.score(lines, 0, level) == score
+
+
+@pytest.mark.parametrize("mode", sorted(MODES))
+def test_modes_get_faster(mode):
+    ticks = [MODES[mode].ticks(level) for level in range(30)]
+    assert ticks == sorted(ticks, reverse=True)
+    assert ticks[0] > ticks[-1] > 0
+
+
+def test_guideline_score():
+    assert GUIDELINE.level(0) == 1
+    assert GUIDELINE.score(4, 0, 1) == 800
+    assert GUIDELINE.score(4, 0, 1, back_to_back=True) == 1200
+    assert GUIDELINE.score(2, 0, 2, tspin=TSpin.full) == 2400
+    assert GUIDELINE.score(0, 0, 1, tspin=TSpin.mini) == 100
+    assert GUIDELINE.score(1, 0, 1, combo=3) == 100 + 150
+    assert GUIDELINE.score(0, 4, 1, hard_drops=10) == 24
+
+
+def test_t_spin_double():
+    board = parse_board(
+        """
+        XXX.X.....
+        XX...XXXXX
+        XXX.XXXXXX
+        """
+    ).bitboard()
+    piece = cells((2, 2), (2, 3), (2, 4), (1, 3))
+    assert t_spin(piece, board | WALLS | FLOOR) is TSpin.full
+
+
+def test_t_spin_mini():
+    board = parse_board("X.........").bitboard() << COLUMNS
+    # Pointing up on the floor, with only one of the corners it points to filled
+    piece = cells((1, 0), (1, 1), (1, 2), (2, 1))
+    assert t_spin(piece, board | WALLS | FLOOR) is TSpin.mini
+    assert t_spin(piece, WALLS | FLOOR) is TSpin.none
+
+
+# A T standing in the middle of the board with its stem to one side, and the
+# corners beside its stem and away from it
+sideways_samples = [
+    # stem, corners beside the stem, corner away from the stem
+    ((2, 4), [(3, 4), (1, 4)], [(1, 6), (3, 6)]),
+    ((2, 6), [(3, 6), (1, 6)], [(1, 4), (3, 4)]),
+]
+
+
+@pytest.mark.parametrize("stem, front, back", sideways_samples)
+def test_sideways_t_spin(stem, front, back):
+    piece = cells((3, 5), (2, 5), (1, 5), stem)
+    assert t_spin(piece, cells(*front, back[0]) | WALLS | FLOOR) is TSpin.full
+    assert t_spin(piece, cells(front[0], *back) | WALLS | FLOOR) is TSpin.mini
@@ -0,0 +1,57 @@
+import urllib.request
+
+from utils.bitboard import decompose_bits
+from utils.metrics import Metrics, metrics
+
+
+def test_frames_and_games():
+    counts = Metrics()
+    counts.count("collision_tests", 3)
+    counts.end_frame(stack_height=4)
+    counts.count("collision_tests")
+    counts.end_frame(stack_height=5)
+    assert counts.last_frame["collision_tests"] == 1
+    assert counts.peak_frame["collision_tests"] == 3
+    assert counts.game["collision_tests"] == 4
+
+    counts.end_game()
+    counts.count("collision_tests", 2)
+    counts.end_frame()
+    text = counts.prometheus()
+    assert "tetris_collision_tests_total 6\n" in text
+    assert "tetris_collision_tests_game 2\n" in text
+    assert 'tetris_collision_tests_per_frame{frame="peak"} 2\n' in text
+    assert "tetris_stack_height 5\n" in text
+    assert "tetris_games_total 1\n" in text
+
+
+def test_disabled_counts_nothing():
+    assert not metrics.enabled
+    decompose_bits(0b1011)
+    assert not metrics.frame
+
+    metrics.enable()
+    try:
+        decompose_bits(0b1011)
+        assert metrics.frame["decompose_bits_calls"] == 1
+    finally:
+        metrics.disable()
+        metrics.frame.clear()
+
+
+def test_export(tmp_path):
+    counts = Metrics()
+    counts.count("lines_cleared", 2)
+    path = str(tmp_path / "tetris.prom")
+    counts.export_to(path)
+    counts.end_frame()
+    with open(path) as f:
+        assert "tetris_lines_cleared_total 2\n" in f.read()
+
+    server = counts.serve(0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.read().decode() == counts.prometheus()
+    finally:
+        counts.close()
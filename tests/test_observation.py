@@ -0,0 +1,61 @@
+from src.engine import hard_drop, spawn
+from src.observation import Observation
+from src.settings import COLUMNS, ROWS
+from src.shapes import Shapes
+
+import numpy as np
+import pytest
+
+
+def cell(row: int, column: int) -> int:
+    """
+    Bit of the cell at a row counted from the top and a column from the left
+    """
+    return 1 << ((ROWS - 1 - row) * COLUMNS + COLUMNS - 1 - column)
+
+
+samples = [
+    # cells, expected heights by column
+    ([], [0] * COLUMNS),
+    ([(ROWS - 1, 0)], [1] + [0] * (COLUMNS - 1)),
+    ([(ROWS - 3, 5), (ROWS - 1, 5)], [0] * 5 + [3] + [0] * 6),
+    ([(0, COLUMNS - 1)], [0] * (COLUMNS - 1) + [ROWS]),
+]
+
+
+@pytest.mark.parametrize("cells,heights", samples)
+def test_board_and_heights(cells, heights):
+    board = 0
+    for row, column in cells:
+        board |= cell(row, column)
+
+    observation = Observation()
+    planes = observation.observe(board)
+
+    expected = np.zeros((ROWS, COLUMNS), dtype=np.uint8)
+    for row, column in cells:
+        expected[row, column] = 1
+    assert (planes[0] == expected).all()
+    assert observation.heights[0].tolist() == heights
+
+
+def test_batch_reuses_buffers():
+    observation = Observation(games=3)
+    planes = observation.planes
+    piece, _ = spawn(Shapes.t)
+    board = hard_drop(spawn(Shapes.i)[0], 0)
+
+    observation.set(0, board, piece, Shapes.o)
+    observation.set(2, cell(ROWS - 1, 3))
+    observation.update()
+
+    assert observation.planes is planes
+    assert observation.board[0].sum() == 4
+    assert observation.board[1].sum() == 0
+    assert observation.board[2, ROWS - 1, 3] == 1
+    # The part of a freshly spawned piece above the board is dropped
+    assert 0 < observation.piece[0].sum() <= 4
+    assert observation.preview[0, :4].sum() == 4
+    filled = observation.board[0].any(axis=0)
+    tops = observation.board[0].argmax(axis=0)
+    assert (observation.heights[0] == np.where(filled, ROWS - tops, 0)).all()
@@ -0,0 +1,136 @@
+from itertools import islice
+
+from src.drills import parse_board
+from src.engine import clear_lines, placements
+from src.perfect_clear import PerfectClearSolver, region_mask, region_placements
+from src.settings import COLUMNS, FPS
+from src.shapes import Shapes, shape_generator
+
+import pytest
+
+
+def rows_with_gaps(*gaps: int, height: int = 4) -> int:
+    """
+    Full rows above the floor, with the given column left empty in each
+    """
+    board = region_mask(height)
+    for row, column in enumerate(gaps, 1):
+        board &= ~(1 << (row * COLUMNS + column))
+    return board
+
+
+samples = [
+    0,
+    rows_with_gaps(4, 4, 4, 4) & ~(0b111 << (4 * COLUMNS + 5)),
+    rows_with_gaps(1, 2, 8, 9, height=2),
+]
+
+
+@pytest.mark.parametrize("shape", list(Shapes))
+@pytest.mark.parametrize("board", samples)
+def test_region_placements_match_engine(shape, board):
+    region = region_mask(4)
+    expected = {
+        bitboard
+        for bitboard in placements(shape, board)
+        if bitboard & region == bitboard
+    }
+    assert {bitboard for bitboard, _ in region_placements(shape, board, 4)} == expected
+
+
+def play(steps, board: int = 0) -> int:
+    for step in steps:
+        board, _ = clear_lines(board | step.placement)
+    return board
+
+
+def test_solves_from_empty_board():
+    shapes = list(islice(shape_generator(1), 11))
+    steps = PerfectClearSolver().solve(0, shapes)
+    assert steps is not None
+    assert len(steps) == 10
+    assert play(steps) == 0
+
+
+@pytest.mark.parametrize(
+    "shapes, stashed, solvable",
+    [
+        ([Shapes.i], None, True),
+        ([Shapes.o], None, False),
+        ([Shapes.o, Shapes.i], None, True),
+        ([Shapes.o], Shapes.i, True),
+    ],
+)
+def test_last_piece(shapes, stashed, solvable):
+    board = rows_with_gaps(6, 6, 6, 6)
+    solver = PerfectClearSolver(use_stash=True)
+    steps = solver.solve(board, shapes, stashed)
+    assert (steps is not None) == solvable
+    if steps:
+        assert steps[-1].shape == Shapes.i
+        assert clear_lines(board | steps[-1].placement)[0] == 0
+
+
+def test_parity():
+    # The gaps are all in even columns, which only an upright I can make up
+    board = rows_with_gaps(2, 4, 2, 4)
+    solver = PerfectClearSolver()
+    assert solver.solve(board, [Shapes.o, Shapes.s, Shapes.z, Shapes.o]) is None
+    assert solver.nodes == 1
+
+
+# Halfway through a perfect clear, as the solver finds it from an empty board
+setup_samples = [
+    (
+        """
+        .......XXX
+        ......XXXX
+        .....XXXXX
+        ..XXXXXXXX
+        """,
+        [Shapes.s, Shapes.j, Shapes.j, Shapes.l, Shapes.i, Shapes.s],
+        None,
+    ),
+    (
+        """
+        ...XXXXX..
+        ....XXXXX.
+        ....XXXXX.
+        .....XXXXX
+        """,
+        [Shapes.z, Shapes.j, Shapes.i, Shapes.o, Shapes.s],
+        Shapes.t,
+    ),
+    (
+        """
+        ...XXXX...
+        ...XXXXX..
+        ...XXXX...
+        ...XXXXXXX
+        """,
+        [Shapes.j, Shapes.o, Shapes.l, Shapes.j, Shapes.z],
+        Shapes.s,
+    ),
+]
+
+
+@pytest.mark.parametrize("text, shapes, stashed", setup_samples)
+def test_solves_setup_within_a_frame(text, shapes, stashed):
+    board = parse_board(text).bitboard()
+    solver = PerfectClearSolver()
+    steps = solver.solve(board, shapes, stashed, budget=1 / FPS)
+    assert not solver.timed_out
+    assert steps is not None
+    assert play(steps, board) == 0
+
+
+def test_resumes_search():
+    shapes = list(islice(shape_generator(1), 11))
+    solver = PerfectClearSolver()
+    frames = 0
+    steps = solver.solve(0, shapes, budget=1e-9)
+    while steps is None and solver.timed_out:
+        frames += 1
+        steps = solver.solve(0, shapes, budget=1e-9)
+    assert frames > 1
+    assert steps == PerfectClearSolver().solve(0, shapes)
@@ -0,0 +1,52 @@
+from collections import Counter
+from itertools import islice
+
+from src.randomizers import RANDOMIZERS, BagRandomizer, ShapeQueue
+from src.shapes import Shapes, shape_generator
+
+import pytest
+
+
+def test_bag_matches_shape_generator():
+    assert BagRandomizer(5).take(50) == list(islice(shape_generator(5), 50))
+
+
+@pytest.mark.parametrize("name, size", [("7-bag", 7), ("14-bag", 14)])
+def test_bags_deal_every_shape(name, size):
+    shapes = RANDOMIZERS[name](1).take(size * 20)
+    for start in range(0, len(shapes), size):
+        counts = Counter(shapes[start : start + size])
+        assert set(counts.values()) == {size // 7}
+
+
+def test_history_randomizer():
+    randomizer = RANDOMIZERS["tgm"](1)
+    shapes = randomizer.take(2000)
+    assert shapes[0] not in {Shapes.s, Shapes.z, Shapes.o}
+    repeats = sum(1 for a, b in zip(shapes, shapes[1:]) if a == b)
+    # A repeat needs four rolls in a row to land in the history
+    assert repeats < len(shapes) * 0.05
+
+
+@pytest.mark.parametrize("name", sorted(RANDOMIZERS))
+def test_snapshot(name):
+    randomizer = RANDOMIZERS[name](9)
+    randomizer.take(10)
+    snapshot = randomizer.snapshot()
+    first = randomizer.take(100)
+    randomizer.restore(snapshot)
+    assert randomizer.take(100) == first
+
+
+def test_queue():
+    expected = BagRandomizer(2).take(100)
+    queue = ShapeQueue(BagRandomizer(2), preview=5)
+    assert queue.preview(5) == expected[:5]
+    assert queue.peek(3) == expected[3]
+
+    popped = [queue.pop() for _ in range(20)]
+    assert popped == expected[:20]
+    # Further than the buffer holds, which grows it
+    assert queue.preview(40) == expected[20:60]
+    assert list(islice(queue, 30)) == expected[20:50]
+    assert queue.peek() == expected[50]
@@ -0,0 +1,55 @@
+import os
+import random
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from src.engine import Inputs
+from src.headless import SCREEN_SIZE, render_frames
+from src.replay import Replay
+from src.scenes import GameScene
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def played():
+    pygame.font.init()
+    scene = GameScene(pygame.Surface(SCREEN_SIZE), seed=7)
+    rng = random.Random(7)
+    for frame in range(400):
+        actions = [rng.choice(list(Inputs))] if rng.random() < 0.4 else []
+        if frame % 8 == 0:
+            actions.append(Inputs.down)
+        if scene.step(actions)[0]:
+            break
+    return scene
+
+
+def test_replay_reproduces_game(played, tmp_path):
+    path = str(tmp_path / "replay.json")
+    played.replay.save(path)
+    replay = Replay.load(path)
+
+    scene = GameScene(pygame.Surface(SCREEN_SIZE), seed=replay.seed)
+    for actions in replay.frames:
+        scene.step([Inputs(action) for action in actions])
+
+    assert scene.matrix.get_full_board() == played.matrix.get_full_board()
+    assert scene.total_score == played.total_score
+
+
+def test_segments_match_full_render(played):
+    replay = played.replay
+    last = len(replay.frames) - 1
+    played.render()
+    expected = pygame.image.tostring(played.screen, "RGB")
+
+    frames = render_frames(replay, last - 2, last + 1, None)
+    assert len(frames) == 3
+    assert frames[-1] == expected
+    # Going on from the scene of the last segment draws the same frames
+    assert render_frames(replay, 0, 2, None) + render_frames(replay, 2, 3, None) == (
+        render_frames(replay, 0, 3, None)
+    )
@@ -0,0 +1,71 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from src.drills import parse_board
+from src.engine import Inputs
+from src.headless import SCREEN_SIZE
+from src.scenes import GameOverScene, GameScene
+from src.shapes import Shapes
+from src.tetriminos import TetriminoQueue
+
+import pytest
+
+TETRIS_READY = """
+XXXXXXXXX.
+XXXXXXXXX.
+XXXXXXXXX.
+XXXXXXXXX.
+"""
+
+
+def scene_starting_with(shape: Shapes, **kwargs) -> GameScene:
+    pygame.font.init()
+    seed = next(seed for seed in range(100) if TetriminoQueue(seed).peek()[0] is shape)
+    return GameScene(pygame.Surface(SCREEN_SIZE), seed=seed, **kwargs)
+
+
+def play_piece(scene: GameScene, actions):
+    """
+    Plays the actions one a frame, then hard drops the piece until it locks
+    """
+    scene.step([])
+    for action in actions:
+        scene.step([action])
+    scene.step([Inputs.drop])
+    while scene.locked:
+        scene.step([Inputs.down])
+
+
+def test_scores_tetris():
+    scene = scene_starting_with(Shapes.i, mode="guideline")
+    scene.matrix.load_board(parse_board(TETRIS_READY))
+    play_piece(scene, [Inputs.rotate] + [Inputs.right] * 6)
+
+    assert scene.matrix.get_full_board() == 0
+    assert scene.lines_cleared == 4
+    assert scene.back_to_back
+    # Plus two points for each of the rows the I was hard dropped
+    assert scene.total_score == 800 + 2 * 19
+
+
+@pytest.mark.parametrize("action, points", [(Inputs.down, 1), (Inputs.gravity, 0)])
+def test_soft_drops(action, points):
+    scene = scene_starting_with(Shapes.o)
+    play_piece(scene, [action] * 5)
+    assert scene.total_score == 5 * points
+
+
+def test_game_over_without_scores(monkeypatch):
+    def unsaved(self):
+        raise OSError("no home directory")
+
+    monkeypatch.setattr(GameOverScene, "save_score", unsaved)
+    pygame.font.init()
+    scene = GameOverScene(pygame.Surface(SCREEN_SIZE), score=100)
+    scene.saved.exception()
+    scene.show_scores()
+    assert scene.rank_text.text == "scores unavailable"
+    scene.render()
@@ -0,0 +1,39 @@
+from src.scores import Score, ScoreStore
+
+import pytest
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ScoreStore(str(tmp_path / "scores.sqlite3"), batch_size=4) as store:
+        yield store
+
+
+def test_top_and_rank(store):
+    points = [40, 1200, 300, 5600, 100, 1200, 40]
+    store.add_many(Score("bot", "snes", score) for score in points)
+    store.add(Score("human", "gameboy", 9999))
+    store.flush()
+
+    assert [score.score for score in store.top("snes", 3)] == [5600, 1200, 1200]
+    assert store.rank("snes", 5600) == 1
+    assert store.rank("snes", 1200) == 2
+    assert store.rank("snes", 1000) == 4
+    assert store.rank("snes", 0) == len(points) + 1
+    assert store.rank("gameboy", 0) == 2
+
+
+def test_personal_best(store):
+    store.add_many(
+        [Score("a", "snes", 100, date=1), Score("a", "snes", 300, date=2)]
+        + [Score("b", "snes", 900, date=3)]
+    )
+    assert store.personal_best("a", "snes").score == 300
+    assert store.personal_best("c", "snes") is None
+    assert [score.score for score in store.recent("a")] == [300, 100]
+
+
+def test_batches_are_written_when_full(store):
+    for score in range(5):
+        store.add(Score("a", "snes", score))
+    assert len(store.pending) == 1
@@ -0,0 +1,73 @@
+import pygame
+from pygame.event import Event
+from pygame.rect import Rect
+
+from src.layout import layout
+from src.tetriminos import MouseInteraction, WidgetRegistry
+from utils.spatial import SpatialHash
+
+import pytest
+
+samples = [
+    # point, expected items
+    ((10, 10), ["a"]),
+    ((70, 10), ["a"]),
+    ((150, 150), ["b"]),
+    ((130, 130), ["a", "b"]),
+    ((500, 500), []),
+]
+
+
+@pytest.mark.parametrize("point,expected", samples)
+def test_query(point, expected):
+    grid = SpatialHash(cell_size=64)
+    grid.insert("a", Rect(0, 0, 140, 140))
+    grid.insert("b", Rect(120, 120, 60, 60))
+    assert grid.query(point) == expected
+
+
+def test_remove():
+    grid = SpatialHash(cell_size=64)
+    grid.insert("a", Rect(0, 0, 140, 140))
+    grid.remove("a")
+    assert grid.query((10, 10)) == []
+    assert not grid.cells
+
+
+class Recorder(MouseInteraction):
+    def __init__(self, rect: Rect):
+        self.rect = rect
+        self.events = []
+
+    def on_move(self, event):
+        self.events.append("move")
+
+    def on_click(self, event):
+        self.events.append("click")
+
+    def on_release(self, event):
+        self.events.append("release")
+
+    def on_enter(self, event):
+        self.events.append("enter")
+
+    def on_leave(self, event):
+        self.events.append("leave")
+
+
+def test_enter_and_leave(monkeypatch):
+    monkeypatch.setattr(layout, "scale", 1.0)
+    monkeypatch.setattr(layout, "origin", (0, 0))
+    registry = WidgetRegistry()
+    widget = Recorder(Rect(100, 100, 50, 50))
+    registry.register(widget)
+
+    # Across the widget from left to right, clicking inside it
+    for x in (90, 110, 140, 160):
+        registry.dispatch(Event(pygame.MOUSEMOTION, pos=(x, 120)))
+        if x == 110:
+            registry.dispatch(Event(pygame.MOUSEBUTTONDOWN, pos=(x, 120), button=1))
+    registry.dispatch(Event(pygame.MOUSEBUTTONUP, pos=(160, 120), button=1))
+
+    assert widget.events == ["enter", "move", "click", "move", "leave"]
+    assert registry.hovered == []
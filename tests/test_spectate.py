@@ -0,0 +1,72 @@
+import asyncio
+
+from src.engine import spawn
+from src.settings import COLUMNS
+from src.shapes import Shapes
+from src.spectate import (
+    DELTA,
+    KEYFRAME,
+    GameState,
+    SpectatorBroadcast,
+    SpectatorView,
+    Subscriber,
+)
+
+
+def states(count: int):
+    board = 0
+    for tick in range(count):
+        if tick % 5 == 0:
+            board |= 1 << (COLUMNS * (tick // 5 + 1) + 1 + tick % 10)
+        piece, _ = spawn(Shapes.t)
+        yield GameState(board, Shapes.t, 0, piece >> COLUMNS, tick * 10, tick // 10)
+
+
+def test_slow_subscriber_catches_up_with_a_keyframe():
+    broadcast = SpectatorBroadcast(keyframe_interval=1000)
+    subscriber = Subscriber(writer=None)
+    broadcast.subscribers.append(subscriber)
+
+    sent = []
+    for tick, state in enumerate(states(6)):
+        broadcast.publish(state)
+        if tick in {0, 1, 4}:
+            sent.append(subscriber.pending)
+            subscriber.pending = None
+
+    kinds = [frame[2] for frame in sent]
+    assert kinds == [KEYFRAME, DELTA, KEYFRAME]
+    assert subscriber.dropped == 2
+
+    view = SpectatorView()
+    for frame in sent:
+        view.apply(frame[2:])
+    assert view.state == list(states(5))[-1]
+
+
+def test_fan_out_over_localhost():
+    async def stream():
+        broadcast = SpectatorBroadcast(keyframe_interval=4)
+        port = await broadcast.start()
+        connections = [
+            await asyncio.open_connection("127.0.0.1", port) for _ in range(3)
+        ]
+        while len(broadcast.subscribers) < 3:
+            await asyncio.sleep(0.01)
+
+        published = list(states(20))
+        for state in published:
+            broadcast.publish(state)
+            await asyncio.sleep(0)
+
+        for reader, _ in connections:
+            view = SpectatorView()
+            while view.tick < len(published):
+                await asyncio.wait_for(view.follow(reader), 5)
+            assert view.state == published[-1]
+
+        for _, writer in connections:
+            writer.close()
+        await broadcast.close()
+
+    asyncio.run(stream())
@@ -0,0 +1,124 @@
+import asyncio
+
+from src.settings import COLUMNS
+from src.versus import VersusClient, VersusServer, apply_delta, encode_delta
+
+import pytest
+
+
+async def until(client: VersusClient, condition):
+    while not condition():
+        await client.updated.wait()
+        client.updated.clear()
+
+
+def test_delta_round_trip():
+    base = 0b0111111110 << COLUMNS
+    board = base | 0b0000110000 << (COLUMNS * 2) | 0b1 << (COLUMNS * 5)
+    delta = encode_delta(board, base)
+    assert delta[0] == 2
+    assert apply_delta(base, delta) == board
+
+
+def test_match_over_localhost():
+    async def match():
+        server = VersusServer(seed=1)
+        port = await server.start()
+        first, second = VersusClient(), VersusClient()
+        await first.connect("127.0.0.1", port)
+        await second.connect("127.0.0.1", port)
+        assert {first.player, second.player} == {0, 1}
+
+        board = 0b0111111110 << COLUMNS
+        await first.send_board(board)
+        await asyncio.wait_for(until(second, lambda: second.opponent_board == board), 5)
+        await asyncio.wait_for(until(first, lambda: first.acked == first.sequence), 5)
+        sent = first.bytes_sent
+
+        board |= 0b11 << (COLUMNS * 2)
+        await first.send_board(board)
+        await asyncio.wait_for(until(second, lambda: second.opponent_board == board), 5)
+        assert first.bytes_sent - sent < 16
+
+        await first.send_lines([2])
+        await asyncio.wait_for(until(second, lambda: second.incoming_garbage), 5)
+        assert second.take_garbage()[0][0] == 1
+
+        assert await asyncio.wait_for(first.ping(), 5) > 0
+
+        await first.close()
+        await second.close()
+        await server.close()
+
+    asyncio.run(match())
+
+
+def test_sends_without_ack():
+    async def match():
+        server = VersusServer(seed=1)
+        port = await server.start()
+        first, second = VersusClient(), VersusClient()
+        await first.connect("127.0.0.1", port)
+        await second.connect("127.0.0.1", port)
+
+        # A row that changes and changes back before the first send is acked
+        await first.send_board(0b110 << COLUMNS)
+        await first.send_board(0)
+        await first.send_board(0b1 << (COLUMNS * 2))
+        await asyncio.wait_for(until(first, lambda: first.acked == 3), 5)
+        assert server.boards[first.player] == 0b1 << (COLUMNS * 2)
+        await asyncio.wait_for(
+            until(second, lambda: second.opponent_board == 0b1 << (COLUMNS * 2)), 5
+        )
+
+        await first.close()
+        await second.close()
+        await server.close()
+
+    asyncio.run(match())
+
+
+def test_late_join_gets_full_board():
+    async def match():
+        server = VersusServer(seed=1)
+        port = await server.start()
+        first = VersusClient()
+        await first.connect("127.0.0.1", port)
+        board = 0b0111111110 << COLUMNS | 0b11 << (COLUMNS * 2)
+        await first.send_board(board)
+        await asyncio.wait_for(until(first, lambda: first.acked == 1), 5)
+
+        # Joins after the board was sent, then leaves and comes back
+        for _ in range(2):
+            second = VersusClient()
+            await second.connect("127.0.0.1", port)
+            await asyncio.wait_for(
+                until(second, lambda: second.opponent_board == board), 5
+            )
+            await second.send_board(0b1 << COLUMNS)
+            await asyncio.wait_for(
+                until(first, lambda: first.opponent_board == 0b1 << COLUMNS), 5
+            )
+            await second.close()
+            await asyncio.wait_for(until(first, lambda: first.opponent_board == 0), 5)
+            assert list(server.boards) == [first.player]
+
+        await first.close()
+        await server.close()
+
+    asyncio.run(match())
+
+
+def test_ping_times_out():
+    async def match():
+        server = VersusServer(seed=1)
+        port = await server.start()
+        client = VersusClient()
+        await client.connect("127.0.0.1", port)
+        client.listener.cancel()
+        with pytest.raises(asyncio.TimeoutError):
+            await client.ping(timeout=0.1)
+        await client.close()
+        await server.close()
+
+    asyncio.run(match())
@@ -0,0 +1,92 @@
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import accumulate
+from typing import Callable, List
+
+from utils.interpolation import Point, clamp, distances, lerp2D
+
+
+class EasingTable:
+    """
+    An easing function sampled once over [0, 1], looked up by weight
+    """
+
+    def __init__(self, function: Callable[[float], float], samples: int = 256):
+        self.last = samples - 1
+        self.values = [function(i / self.last) for i in range(samples)]
+
+    def __call__(self, weight: float) -> float:
+        return self.values[int(clamp(weight, 0, 1) * self.last + 0.5)]
+
+
+@lru_cache(maxsize=None)
+def easing_table(function: Callable[[float], float], samples: int = 256) -> EasingTable:
+    return EasingTable(function, samples)
+
+
+class PerimeterPath:
+    """
+    A closed polygon with its cumulative edge lengths precomputed, giving the
+    same points as `incomplete_perimeter_points` without measuring every frame
+    """
+
+    def __init__(self, points: List[Point]):
+        self.points = points
+        self.ends = points[1:] + points[:1]
+        self.lengths = distances(points)
+        self.cumulative = list(accumulate(self.lengths))
+        self.total = self.cumulative[-1]
+
+    def partial(self, weight: float) -> List[Point]:
+        covered = weight * self.total
+        index = bisect_right(self.cumulative, covered)
+        if index >= len(self.lengths):
+            return [self.points[0]] + self.ends
+
+        final_points = [self.points[0]] + self.ends[:index]
+        remaining = (self.cumulative[index] - covered) / self.lengths[index]
+        final_points.append(lerp2D(self.points[index], self.ends[index], remaining))
+        return final_points
+
+
+@dataclass(eq=False)
+class Tween:
+    easing: EasingTable
+    duration: float
+    start: float = 0
+    value: float = 0
+    finished: bool = True
+
+    def update(self, now: float):
+        weight = (now - self.start) / self.duration
+        if weight >= 1:
+            weight = 1
+            self.finished = True
+        self.value = self.easing(weight)
+
+
+@dataclass
+class Animator:
+    tweens: List[Tween] = field(default_factory=list)
+
+    def play(self, tween: Tween, now: float):
+        tween.start = now
+        tween.finished = False
+        tween.update(now)
+        if tween not in self.tweens:
+            self.tweens.append(tween)
+
+    def update(self, now: float):
+        """
+        Advances every running tween, dropping the ones that have finished
+        """
+        running = []
+        for tween in self.tweens:
+            tween.update(now)
+            if not tween.finished:
+                running.append(tween)
+        self.tweens = running
+
+
+animator = Animator()
@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+AssetKey = Tuple[Hashable, ...]  # kind, then the arguments of its loader
+
+
+class AssetCache:
+    """
+    Assets loaded once by key and shared by everything that asks for them.
+    Keys can be preloaded on a worker thread, and asking for a key that is
+    still loading waits for it rather than loading it a second time.
+
+    A kind with a builder is loaded in two steps: the loader only reads what
+    it needs on the worker, and the builder turns that into the asset on the
+    thread that calls `get`, for libraries that must not be used from two
+    threads at once
+    """
+
+    def __init__(
+        self,
+        loaders: Dict[str, Callable[..., Any]],
+        builders: Optional[Dict[str, Callable[..., Any]]] = None,
+    ):
+        self.loaders = loaders
+        self.builders = builders or {}
+        self.futures: Dict[AssetKey, Future] = {}
+        self.built: Dict[AssetKey, Any] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="assets")
+
+    def load(self, key: AssetKey) -> Any:
+        kind, *args = key
+        return self.loaders[kind](*args)
+
+    def preload(self, *keys: AssetKey) -> List[Future]:
+        futures = []
+        with self.lock:
+            for key in keys:
+                if key not in self.futures:
+                    self.futures[key] = self.executor.submit(self.load, key)
+                futures.append(self.futures[key])
+        return futures
+
+    def get(self, key: AssetKey) -> Any:
+        kind, *args = key
+        if kind not in self.builders:
+            return self.loaded(key)
+        if key not in self.built:
+            self.built[key] = self.builders[kind](self.loaded(key), *args)
+        return self.built[key]
+
+    def loaded(self, key: AssetKey) -> Any:
+        with self.lock:
+            future = self.futures.get(key)
+            if future is None:
+                future = self.futures[key] = Future()
+                future.set_running_or_notify_cancel()
+                loading_here = True
+            else:
+                loading_here = False
+
+        if loading_here:
+            try:
+                future.set_result(self.load(key))
+            except Exception as error:
+                future.set_exception(error)
+        return future.result()
+
+    def submit(self, function: Callable[..., Any], *args) -> Future:
+        """
+        Runs other slow work, such as saving to disk, on the same worker
+        """
+        return self.executor.submit(function, *args)
@@ -1,5 +1,7 @@
 import textwrap
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
+
+from utils.metrics import metrics
 
 
 def print_board(name: str, board: int, columns: int, rows: int):
@@ -27,6 +29,8 @@ def arrangement_to_bit(arrangement: List[List[int]], columns: int) -> int:
 
 
 def decompose_bits(x: int) -> List[int]:
+    if metrics.enabled:
+        metrics.count("decompose_bits_calls")
     bits = []
     i = 1
     while i <= x:
@@ -36,6 +40,17 @@ def decompose_bits(x: int) -> List[int]:
     return bits
 
 
+def lowest_bit_index(bitboard: int) -> int:
+    return (bitboard & -bitboard).bit_length() - 1
+
+
+def bit_indices(bitboard: int) -> Iterator[int]:
+    while bitboard:
+        bit = bitboard & -bitboard
+        yield bit.bit_length() - 1
+        bitboard ^= bit
+
+
 def bottom_border(columns: int) -> int:
     border = 0
     for shift in range(columns):
@@ -0,0 +1,44 @@
+"""
+Fonts resolved once per process and shared between scenes.
+
+`pygame.font.SysFont` builds a new `Font` on every call, and its first call
+lists every font on the system, which means running fc-list on Linux. Here a
+font name is resolved to a file once, and each size of it is only loaded once.
+
+SDL_ttf must only be used from one thread, so the asset worker only reads
+font files with `read_font`, and `build_font` makes the `Font` from them on
+the thread that draws.
+"""
+import io
+from functools import lru_cache
+from typing import Optional
+
+import pygame
+
+
+@lru_cache(maxsize=None)
+def font_path(name: str) -> Optional[str]:
+    """
+    File of a font by name, or None for pygame's default font
+    """
+    return pygame.font.match_font(name)
+
+
+@lru_cache(maxsize=None)
+def get_font(name: str, size: int) -> pygame.font.Font:
+    return pygame.font.Font(font_path(name), size)
+
+
+def read_font(name: str, size: int) -> Optional[bytes]:
+    """
+    Contents of the font file, or None for pygame's default font
+    """
+    path = font_path(name)
+    if path is None:
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def build_font(data: Optional[bytes], name: str, size: int) -> pygame.font.Font:
+    return pygame.font.Font(io.BytesIO(data) if data is not None else None, size)
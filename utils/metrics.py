@@ -0,0 +1,167 @@
+"""
+Counts of the work done by the game, gathered per frame and per game and
+exported in the Prometheus text format.
+
+Counting is off until `metrics.enable()` is called, and every call site checks
+`metrics.enabled` before counting, so while it is off a counter costs a single
+attribute lookup:
+
+    if metrics.enabled:
+        metrics.count("collision_tests")
+
+Counts go into the current frame until `end_frame`, which also records gauges
+such as the stack height, so spikes can be lined up with the state of the game.
+
+    metrics.enable()
+    metrics.export_to("/var/lib/node_exporter/tetris.prom")
+    metrics.serve(9100)
+"""
+import os
+import threading
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    # Only needed once metrics are served, so it stays out of start up
+    from http.server import ThreadingHTTPServer
+
+PREFIX = "tetris"
+
+COUNTERS = {
+    "collision_tests": "Collision tests against the board and its borders",
+    "decompose_bits_calls": "Calls to utils.bitboard.decompose_bits",
+    "ghost_updates": "Times the ghost piece was dropped again",
+    "line_clears": "Blocks of full rows cleared",
+    "lines_cleared": "Rows cleared, as scored",
+    "tiles_rendered": "Tiles and sprites passed to blits",
+    "surfaces_allocated": "Surfaces created for tiles, sprites and text",
+}
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.frame: Counter = Counter()
+        self.last_frame: Counter = Counter()
+        self.peak_frame: Counter = Counter()
+        self.game: Counter = Counter()
+        self.total: Counter = Counter()
+        self.gauges: Dict[str, float] = {}
+        self.frames = 0
+        self.games = 0
+        # Taken by anything that reads counts from another thread
+        self.lock = threading.Lock()
+
+        self.export_path: Optional[str] = None
+        self.export_interval = 1.0
+        self.last_export = 0.0
+        self.server: Optional["ThreadingHTTPServer"] = None
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def count(self, name: str, amount: int = 1):
+        self.frame[name] += amount
+
+    def end_frame(self, **gauges: float):
+        with self.lock:
+            frame, self.frame = self.frame, Counter()
+            self.last_frame = frame
+            for name, amount in frame.items():
+                if amount > self.peak_frame[name]:
+                    self.peak_frame[name] = amount
+            self.game.update(frame)
+            self.gauges.update(gauges)
+            self.frames += 1
+
+        if self.export_path:
+            now = time.monotonic()
+            if now - self.last_export >= self.export_interval:
+                self.last_export = now
+                self.write(self.export_path)
+
+    def end_game(self):
+        with self.lock:
+            self.total.update(self.game)
+            self.game = Counter()
+            self.peak_frame = Counter()
+            self.games += 1
+
+    def prometheus(self) -> str:
+        with self.lock:
+            lines: List[str] = []
+            for name, description in COUNTERS.items():
+                metric = f"{PREFIX}_{name}"
+                lines.append(f"# HELP {metric}_total {description}")
+                lines.append(f"# TYPE {metric}_total counter")
+                lines.append(f"{metric}_total {self.total[name] + self.game[name]}")
+                lines.append(f"# HELP {metric}_per_frame {description}, per frame")
+                lines.append(f"# TYPE {metric}_per_frame gauge")
+                lines.append(
+                    f'{metric}_per_frame{{frame="last"}} {self.last_frame[name]}'
+                )
+                lines.append(
+                    f'{metric}_per_frame{{frame="peak"}} {self.peak_frame[name]}'
+                )
+                lines.append(f"# TYPE {metric}_game gauge")
+                lines.append(f"{metric}_game {self.game[name]}")
+
+            lines.append(f"# TYPE {PREFIX}_frames_total counter")
+            lines.append(f"{PREFIX}_frames_total {self.frames}")
+            lines.append(f"# TYPE {PREFIX}_games_total counter")
+            lines.append(f"{PREFIX}_games_total {self.games}")
+            for name, value in sorted(self.gauges.items()):
+                lines.append(f"# TYPE {PREFIX}_{name} gauge")
+                lines.append(f"{PREFIX}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        # Replaced in one go so a collector never reads half a file
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as f:
+            f.write(self.prometheus())
+        os.replace(temporary, path)
+
+    def export_to(self, path: str, interval: float = 1.0):
+        """
+        Writes the metrics to `path` at most every `interval` seconds, as frames end
+        """
+        self.export_path = path
+        self.export_interval = interval
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+        """
+        Serves the metrics over HTTP from a background thread, for scraping
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+
+    def close(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+metrics = Metrics()
@@ -0,0 +1,44 @@
+from collections import defaultdict
+from typing import Dict, Generic, Iterator, List, Tuple, TypeVar
+
+import pygame
+
+T = TypeVar("T")
+Cell = Tuple[int, int]
+
+
+class SpatialHash(Generic[T]):
+    """
+    Buckets rects into a uniform grid so that point queries only look at the
+    items sharing the point's cell
+    """
+
+    def __init__(self, cell_size: int = 64):
+        self.cell_size = cell_size
+        self.cells: Dict[Cell, List[Tuple[T, pygame.rect.Rect]]] = defaultdict(list)
+
+    def _cells(self, rect: pygame.rect.Rect) -> Iterator[Cell]:
+        left, top = rect.left // self.cell_size, rect.top // self.cell_size
+        right = (rect.right - 1) // self.cell_size
+        bottom = (rect.bottom - 1) // self.cell_size
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                yield x, y
+
+    def insert(self, item: T, rect: pygame.rect.Rect):
+        for cell in self._cells(rect):
+            self.cells[cell].append((item, rect))
+
+    def remove(self, item: T):
+        for cell, entries in list(self.cells.items()):
+            entries[:] = [entry for entry in entries if entry[0] is not item]
+            if not entries:
+                del self.cells[cell]
+
+    def query(self, point: Tuple[int, int]) -> List[T]:
+        x, y = point
+        cell = (x // self.cell_size, y // self.cell_size)
+        entries = self.cells.get(cell)
+        if not entries:
+            return []
+        return [item for item, rect in entries if rect.collidepoint(point)]